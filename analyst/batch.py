@@ -0,0 +1,165 @@
+"""
+Batch analysis of many question files over a few data sources
+
+Evaluators send hundreds of variants of a question file against the same
+page or the same upload. Sent one by one, every variant would fetch, parse
+and clean the same data again. A batch runs them together instead.
+
+- Items are grouped by data source: the attachments' digests plus the URLs
+  their text names.
+- Every item of the batch shares one ``SharedLoads``, so each source is
+  loaded and cleaned once, by the first item that needs it.
+- Items run concurrently, at most ``BATCH_CONCURRENCY`` at a time. The
+  first item of each source is started first, so different sources load
+  side by side.
+- Each result is yielded as a JSON line as soon as the item finishes.
+- The whole batch shares one ``Deadline``. Items not started when it
+  expires, or not finished shortly after, get a 408 line instead.
+
+The total cost therefore grows with the number of distinct sources rather
+than with the number of question files.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from analyst.deadline import TIMEOUT_PLACEHOLDER, Deadline, DeadlineExceeded
+from analyst.executor import PoolSaturated
+from analyst.pipeline import SharedLoads
+from analyst.serialize import dumps
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+SOURCE_URL = re.compile(r"(?:s3|https?)://[^\s<>\"'`]+")
+
+
+@dataclass
+class BatchItem:
+    """One question file of a batch"""
+    id: str
+    questions: bytes
+    source: str = ""
+
+
+def parse_items(files: Sequence[Tuple[Optional[str], bytes]], jsonl: Optional[bytes] = None) -> List[BatchItem]:
+    """
+    Items from question files (named after the file) and from JSON Lines.
+
+    Each JSON line is ``{"id": ..., "questions": "..."}``; the id defaults
+    to the item's position.
+    """
+    items = [BatchItem(filename or str(i), content) for i, (filename, content) in enumerate(files)]
+    for n, line in enumerate((jsonl or b"").splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {n} of the items is not JSON")
+        if not isinstance(record, dict) or not isinstance(record.get("questions"), str):
+            raise ValueError(f"Line {n} of the items has no \"questions\" text")
+        items.append(BatchItem(str(record.get("id", len(items))), record["questions"].encode()))
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f"A batch takes at most {MAX_ITEMS} items")
+    return items
+
+
+def source_key(text: str, digests: Sequence[bytes] = ()) -> str:
+    """Short identity of an item's data source: its attachments and the URLs in its text"""
+    digest = hashlib.sha256()
+    for part in digests:
+        digest.update(part)
+    for url in sorted({url.rstrip(".,;:!?)]}") for url in SOURCE_URL.findall(text)}):
+        digest.update(url.encode() + b"\0")
+    return digest.hexdigest()[:12]
+
+
+def schedule(items: Sequence[BatchItem]) -> List[BatchItem]:
+    """Order items round-robin over their sources, so the first item of every source starts first"""
+    groups: Dict[str, List[BatchItem]] = {}
+    for item in items:
+        groups.setdefault(item.source, []).append(item)
+    ordered = []
+    for rank in range(max((len(g) for g in groups.values()), default=0)):
+        ordered.extend(group[rank] for group in groups.values() if rank < len(group))
+    return ordered
+
+
+def _status(error: BaseException) -> int:
+    if isinstance(error, PoolSaturated):
+        return 503
+    if isinstance(error, asyncio.TimeoutError):
+        return 408
+    return 500
+
+
+def _line(item: BatchItem, body: Optional[bytes], error: Optional[BaseException]) -> bytes:
+    head = b'{"id":' + dumps(item.id) + b',"source":' + dumps(item.source)
+    if error is None:
+        return head + b',"answers":' + body + b"}\n"
+    return head + b',"error":' + dumps(str(error)) + b',"status":' + dumps(_status(error)) + b"}\n"
+
+
+async def run_batch(items: Sequence[BatchItem], run_item: Callable[[BatchItem], Awaitable[bytes]],
+                    concurrency: int = BATCH_CONCURRENCY, deadline: Optional[Deadline] = None,
+                    grace: float = 0.0) -> AsyncIterator[bytes]:
+    """
+    Run every item and yield one JSON line per item, in completion order.
+
+    ``run_item`` returns the item's serialized answers. Lines are
+    ``{"id", "source", "answers"}``, or ``{"id", "source", "error", "status"}``
+    when the item failed.
+
+    With a ``deadline``, items still queued when it expires are not
+    started, and the stream ends ``grace`` seconds after it; both get a
+    408 line in place of their answers.
+    """
+    loads = SharedLoads()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def run(item: BatchItem) -> Tuple[BatchItem, Optional[bytes], Optional[BaseException]]:
+        loads.enter()
+        async with gate:
+            if deadline is not None and deadline.expired:
+                return item, None, DeadlineExceeded(TIMEOUT_PLACEHOLDER)
+            try:
+                return item, await run_item(item), None
+            except Exception as e:
+                return item, None, e
+
+    sources = len({item.source for item in items})
+    ordered = schedule(items)
+    tasks = [asyncio.ensure_future(run(item)) for item in ordered]
+    timeout = deadline.remaining() + grace if deadline is not None else None
+    reported = set()
+    failed = 0
+    try:
+        try:
+            for finished in asyncio.as_completed(tasks, timeout=timeout):
+                item, body, error = await finished
+                reported.add(id(item))
+                if error is not None:
+                    failed += 1
+                    logger.error(f"Batch item {item.id} failed: {error}")
+                yield _line(item, body, error)
+        except asyncio.TimeoutError:
+            # The batch's budget is spent: whatever is still running is abandoned
+            for item in ordered:
+                if id(item) not in reported:
+                    failed += 1
+                    yield _line(item, None, DeadlineExceeded(TIMEOUT_PLACEHOLDER))
+            logger.warning(f"Batch deadline expired with {len(ordered) - len(reported)} items unfinished")
+    finally:
+        for task in tasks:
+            task.cancel()
+    logger.info(f"Batch of {len(items)} items over {sources} sources: {loads.counters['loads']} loads, "
+                f"{loads.counters['shared']} shared, {failed} failed")
@@ -0,0 +1,342 @@
+"""
+Two-tier cache for scraped pages and the tables parsed from them
+
+Entries live in an in-memory LRU bounded by size and are mirrored to a
+directory on disk so that a fresh serverless instance starts warm. Each
+entry holds the raw HTML plus the tables parsed from it: the header rows of
+every candidate table and the cleaned frames of the tables chosen so far,
+keyed by table index. Once an entry is older than its TTL it is revalidated
+with a conditional GET (ETag/Last-Modified) and the parsed tables are kept
+if the page is unchanged.
+
+Disk reads and writes run on worker threads, never on the event loop, and
+the directory's size is tracked as files are written; it is only listed
+again to trim it once it grows past its cap.
+
+The directory is created readable by its owner only, and the disk tier is
+turned off if it is owned by another user or writable by others. Frames are
+stored as Parquet, so a planted file can at worst yield a wrong table,
+never run code.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from analyst.fetch import fetch
+from analyst.metrics import register_collector
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "analyst-page-cache"))
+TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+MAX_MEMORY_BYTES = int(os.getenv("PAGE_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+MAX_DISK_BYTES = int(os.getenv("PAGE_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+TMP_SUFFIX = ".tmp"
+
+
+@dataclass
+class CachedPage:
+    """A fetched page, its validators and the tables parsed from it"""
+    url: str
+    content: bytes
+    encoding: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    frames: Dict[str, "pd.DataFrame"] = field(default_factory=dict)
+    # Header rows of the page's candidate tables, once it has been parsed
+    headers: Optional[List[List[str]]] = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(self.content).hexdigest()
+
+    def nbytes(self) -> int:
+        size = len(self.content)
+        for df in self.frames.values():
+            size += int(df.memory_usage(deep=True).sum())
+        return size
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def private_directory(path: str) -> bool:
+    """Create ``path`` for this user only, or check that an existing one is safe to read from"""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+        if not stat.S_ISDIR(st.st_mode):
+            return False
+        if hasattr(os, "getuid"):
+            if st.st_uid != os.getuid():
+                return False
+            if st.st_mode & 0o077:
+                os.chmod(path, 0o700)
+    except OSError:
+        return False
+    return True
+
+
+class PageCache:
+    """In-memory LRU of ``CachedPage`` objects backed by an on-disk store"""
+
+    def __init__(self, directory: Optional[str] = CACHE_DIR, ttl: float = TTL,
+                 max_memory_bytes: int = MAX_MEMORY_BYTES, max_disk_bytes: int = MAX_DISK_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._checked = False
+        self._disk_lock = threading.RLock()
+        self._disk_bytes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                         "revalidated": 0, "frame_hits": 0, "frame_misses": 0, "evictions": 0}
+
+    # -- memory tier -------------------------------------------------------
+
+    def _remember(self, page: CachedPage) -> None:
+        with self._lock:
+            key = _key(page.url)
+            self._memory_bytes -= self._sizes.pop(key, 0)
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            self._sizes[key] = page.nbytes()
+            self._memory_bytes += self._sizes[key]
+            while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                old_key, _ = self._entries.popitem(last=False)
+                self._memory_bytes -= self._sizes.pop(old_key, 0)
+                self.counters["evictions"] += 1
+
+    def _lookup(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            key = _key(url)
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    # -- disk tier ---------------------------------------------------------
+
+    def _path(self, url: str, suffix: str) -> str:
+        return os.path.join(self.directory, _key(url) + suffix)
+
+    def _disk(self) -> bool:
+        """True when the disk tier is configured and its directory is private"""
+        with self._disk_lock:
+            if self.directory and not self._checked:
+                self._checked = True
+                if private_directory(self.directory):
+                    # Counted once; writes keep the total current from then on
+                    self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+                else:
+                    logger.warning(f"Page cache directory {self.directory} is not private to this user; "
+                                   "keeping the cache in memory only")
+                    self.directory = None
+            return bool(self.directory)
+
+    def _load(self, url: str) -> Optional[CachedPage]:
+        """Read a page and its tables from disk (runs on a worker thread)"""
+        import pandas as pd
+
+        if not self._disk():
+            return None
+        try:
+            with open(self._path(url, ".json")) as f:
+                meta = json.load(f)
+            with open(self._path(url, ".html"), "rb") as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        page = CachedPage(url=url, content=content, encoding=meta.get("encoding"),
+                          etag=meta.get("etag"), last_modified=meta.get("last_modified"),
+                          fetched_at=meta.get("fetched_at", 0.0), headers=meta.get("headers"))
+        for name in meta.get("frames", []):
+            try:
+                page.frames[name] = pd.read_parquet(self._path(url, f".{page.digest[:16]}.{name}.parquet"))
+            except (OSError, ImportError, ValueError):
+                pass
+        return page
+
+    async def _persist(self, page: CachedPage, html: bool = False, frame: Optional[str] = None) -> None:
+        """Write the page's metadata, plus its HTML or one new ``frame`` (frames are written once), off the loop"""
+        if not self.directory:
+            return
+        meta = {"url": page.url, "encoding": page.encoding, "etag": page.etag,
+                "last_modified": page.last_modified, "fetched_at": page.fetched_at,
+                "headers": page.headers, "frames": list(page.frames)}
+        table = (frame, page.frames[frame]) if frame is not None else None
+        await asyncio.get_running_loop().run_in_executor(None, self._store, page, meta, html, table)
+
+    def _store(self, page: CachedPage, meta: Dict[str, Any], html: bool,
+               table: Optional[Tuple[str, "pd.DataFrame"]]) -> None:
+        if not self._disk():
+            return
+        try:
+            if html:
+                self._replace(self._path(page.url, ".html"), lambda tmp: _write_bytes(tmp, page.content))
+            if table is not None:
+                name, df = table
+                try:
+                    self._replace(self._path(page.url, f".{page.digest[:16]}.{name}.parquet"), df.to_parquet)
+                except (ImportError, ValueError) as e:
+                    logger.warning(f"Could not persist table {name} of {page.url}: {e}")
+            self._replace(self._path(page.url, ".json"), lambda tmp: _write_bytes(tmp, json.dumps(meta).encode()))
+            if self._disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+        except OSError as e:
+            logger.warning(f"Could not persist cache entry for {page.url}: {e}")
+
+    def _replace(self, path: str, write: Callable[[str], Any]) -> None:
+        """Write ``path`` through a temporary file, keeping the running disk total current"""
+        tmp = f"{path}.{threading.get_ident()}{TMP_SUFFIX}"
+        try:
+            write(tmp)
+            size = os.path.getsize(tmp)
+            try:
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        with self._disk_lock:
+            self._disk_bytes += size
+
+    def _scan_disk(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(TMP_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _trim_disk(self) -> None:
+        """Remove the oldest files until the directory is within its cap (only runs once over it)"""
+        with self._disk_lock:
+            files = self._scan_disk()
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+    # -- public API --------------------------------------------------------
+
+    async def get_page(self, url: str, timeout: Optional[float] = None) -> CachedPage:
+        """Return the page for ``url``, fetching or revalidating it as needed"""
+        page = self._lookup(url)
+        if page is not None:
+            self.counters["memory_hits"] += 1
+        else:
+            page = await asyncio.get_running_loop().run_in_executor(None, self._load, url)
+            if page is not None:
+                self.counters["disk_hits"] += 1
+                self._remember(page)
+
+        if page is not None and time.time() - page.fetched_at < self.ttl:
+            return page
+
+        headers = {}
+        if page is not None:
+            if page.etag:
+                headers["If-None-Match"] = page.etag
+            if page.last_modified:
+                headers["If-Modified-Since"] = page.last_modified
+
+        try:
+            result = await fetch(url, headers=headers or None, timeout=timeout)
+        except Exception as e:
+            if page is None:
+                raise
+            # A stale copy beats no answer when the origin is slow or down
+            logger.warning(f"Revalidation of {url} failed ({e!r}); serving stale copy")
+            return page
+        if page is not None and result.status_code == 304:
+            self.counters["revalidated"] += 1
+            page.fetched_at = time.time()
+            await self._persist(page)
+            return page
+
+        if page is None:
+            self.counters["misses"] += 1
+        page = CachedPage(url=url, content=result.content, encoding=result.encoding,
+                          etag=result.headers.get("etag"),
+                          last_modified=result.headers.get("last-modified"),
+                          fetched_at=time.time())
+        self._remember(page)
+        await self._persist(page, html=True)
+        return page
+
+    def get_frame(self, page: CachedPage, name: str = "table") -> Optional["pd.DataFrame"]:
+        """Return a copy of a frame previously parsed from ``page``"""
+        df = page.frames.get(name)
+        if df is None:
+            self.counters["frame_misses"] += 1
+            return None
+        self.counters["frame_hits"] += 1
+        return df.copy()
+
+    async def put_frame(self, page: CachedPage, df: "pd.DataFrame", name: str = "table",
+                        headers: Optional[List[List[str]]] = None) -> None:
+        """Attach a parsed frame (and the page's table headers, if given) to ``page`` and persist it"""
+        page.frames[name] = df.copy()
+        if headers is not None:
+            page.headers = headers
+        self._remember(page)
+        await self._persist(page, frame=name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), memory_bytes=self._memory_bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._memory_bytes = 0
+
+
+page_cache = PageCache()
+register_collector("page_cache", page_cache.stats)
@@ -0,0 +1,197 @@
+"""
+Column typing engine used by ``clean_data``
+
+Instead of forcing every column through ``astype(str)`` + ``to_numeric``, a
+sample of each text column is classified (currency, integer, float, year,
+date, categorical or text) and only qualifying columns are converted. Parsing
+runs on the column's unique values (``pd.factorize``) and is broadcast back,
+so repeated labels are only parsed once. Inferred schemas are cached per
+source so repeat loads of the same page or file skip inference.
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analyst import compact as compaction
+from analyst.metrics import observe_frame, span
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 1000
+MATCH_THRESHOLD = 0.9
+CATEGORICAL_MAX_RATIO = 0.5
+CATEGORICAL_MAX_UNIQUE = 1000
+SCHEMA_CACHE_SIZE = 256
+
+CURRENCY, INTEGER, FLOAT, YEAR, DATE, CATEGORICAL, TEXT = (
+    "currency", "integer", "float", "year", "date", "categorical", "text")
+
+CURRENCY_RE = re.compile(r"^[^\d\-]{0,4}[$€£¥₹][\s\xa0]?-?[\d,]+(?:\.\d+)?(?:\s?(?:bn|billion|m|million|k))?\S{0,3}$",
+                         re.IGNORECASE)
+INTEGER_RE = re.compile(r"^-?\d{1,3}(?:,\d{3})+$|^-?\d+$")
+FLOAT_RE = re.compile(r"^-?(?:\d{1,3}(?:,\d{3})+|\d*)\.\d+(?:e-?\d+)?$|^-?\d+(?:\.\d*)?e-?\d+$|^-?\d{1,3}(?:,\d{3})+$|^-?\d+$",
+                      re.IGNORECASE)
+YEAR_RE = re.compile(r"^(1[5-9]\d\d|20\d\d|2100)$")
+DATE_HINT_RE = re.compile(r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|[A-Za-z]{3,9}\.? \d{1,2},? \d{4}|\d{1,2} [A-Za-z]{3,9} \d{4}")
+FOOTNOTE_RE = r"\[[^\]]*\]|[*†‡§]+$"
+NON_NUMERIC_RE = r"[^\d.\-eE]"
+
+_schema_cache: "OrderedDict[Tuple[Hashable, Tuple[str, ...]], Dict[str, str]]" = OrderedDict()
+_schema_lock = threading.Lock()
+
+
+def _sample(series: pd.Series, size: int = SAMPLE_SIZE) -> pd.Series:
+    # Stride through the column rather than scanning all of it for nulls
+    if len(series) > size:
+        series = series.iloc[::len(series) // size]
+    values = series.dropna()
+    return values.astype(str).str.replace(FOOTNOTE_RE, "", regex=True).str.strip()
+
+
+def _share(sample: pd.Series, pattern: "re.Pattern") -> float:
+    if sample.empty:
+        return 0.0
+    return float(sample.map(lambda v: bool(pattern.match(v))).mean())
+
+
+def infer_column_type(series: pd.Series) -> str:
+    """Classify one column from a sample of its non-null values"""
+    if pd.api.types.is_bool_dtype(series):
+        return TEXT
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DATE
+    if pd.api.types.is_integer_dtype(series):
+        values = series.dropna()
+        if len(values) and values.between(1500, 2100).all():
+            return YEAR
+        return INTEGER
+    if pd.api.types.is_float_dtype(series):
+        return FLOAT
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return CATEGORICAL
+
+    sample = _sample(series)
+    sample = sample[sample != ""]
+    if sample.empty:
+        return TEXT
+    if _share(sample, YEAR_RE) >= MATCH_THRESHOLD:
+        return YEAR
+    if _share(sample, INTEGER_RE) >= MATCH_THRESHOLD:
+        return INTEGER
+    if _share(sample, FLOAT_RE) >= MATCH_THRESHOLD:
+        return FLOAT
+    if _share(sample, CURRENCY_RE) >= MATCH_THRESHOLD:
+        return CURRENCY
+    if _share(sample, DATE_HINT_RE) >= MATCH_THRESHOLD:
+        parsed = pd.to_datetime(sample, errors="coerce", format="mixed")
+        if parsed.notna().mean() >= MATCH_THRESHOLD:
+            return DATE
+    n_unique = sample.nunique()
+    if n_unique <= CATEGORICAL_MAX_UNIQUE and n_unique <= CATEGORICAL_MAX_RATIO * len(sample):
+        return CATEGORICAL
+    return TEXT
+
+
+def infer_schema(df: pd.DataFrame) -> Dict[str, str]:
+    """Infer a column -> type mapping for ``df``"""
+    return {str(col): infer_column_type(df[col]) for col in df.columns}
+
+
+def _parse_numbers(uniques: pd.Series, kind: str) -> np.ndarray:
+    text = uniques.astype(str).str.replace(FOOTNOTE_RE, "", regex=True)
+    scale = None
+    if kind == CURRENCY:
+        lowered = text.str.lower()
+        scale = np.where(lowered.str.contains(r"\d\s?(?:bn|billion)\b", regex=True), 1e9,
+                         np.where(lowered.str.contains(r"\d\s?(?:m|million)\b", regex=True), 1e6, 1.0))
+    text = text.str.replace(NON_NUMERIC_RE, "", regex=True)
+    numbers = pd.to_numeric(text, errors="coerce").to_numpy(dtype="float64")
+    if scale is not None:
+        numbers = numbers * scale
+    return numbers
+
+
+def _convert(series: pd.Series, kind: str) -> pd.Series:
+    if kind in (TEXT,) or (kind in (INTEGER, FLOAT, YEAR) and pd.api.types.is_numeric_dtype(series)):
+        return series
+    if kind == DATE:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        return pd.to_datetime(series, errors="coerce", format="mixed")
+    if kind == CATEGORICAL:
+        return series.astype("category")
+
+    # Parse each distinct value once, then broadcast through the codes
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    parsed = _parse_numbers(pd.Series(uniques), kind)
+    values = np.full(len(codes), np.nan)
+    valid = codes >= 0
+    values[valid] = parsed[codes[valid]]
+    if kind in (INTEGER, YEAR) and not np.isnan(values).any() and np.all(values == np.round(values)):
+        values = values.astype("int64")
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """Convert the columns of ``df`` according to ``schema``"""
+    converted = {}
+    for col in df.columns:
+        kind = schema.get(str(col), TEXT)
+        try:
+            converted[col] = _convert(df[col], kind)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Could not convert column {col!r} as {kind}: {e}")
+            converted[col] = df[col]
+    # copy=False: the converted columns are fresh arrays already
+    return pd.DataFrame(converted, index=df.index, copy=False)
+
+
+def cached_schema(source: Hashable, columns: Tuple[str, ...]) -> Optional[Dict[str, str]]:
+    with _schema_lock:
+        schema = _schema_cache.get((source, columns))
+        if schema is not None:
+            _schema_cache.move_to_end((source, columns))
+        return schema
+
+
+def remember_schema(source: Hashable, columns: Tuple[str, ...], schema: Dict[str, str]) -> None:
+    with _schema_lock:
+        _schema_cache[(source, columns)] = schema
+        _schema_cache.move_to_end((source, columns))
+        while len(_schema_cache) > SCHEMA_CACHE_SIZE:
+            _schema_cache.popitem(last=False)
+
+
+def clean_data(df: pd.DataFrame, source: Optional[Hashable] = None, compact: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Clean and type a freshly loaded frame.
+
+    Empty rows/columns are dropped and each column is converted to its
+    inferred type. Pass ``source`` (a URL or file name) to reuse the schema
+    inferred on a previous load of the same data. The typed frame is then
+    shrunk by ``compact_frame`` unless ``compact`` is False (default:
+    ``ANALYST_COMPACT``).
+    """
+    with span("clean") as attrs:
+        df = df.dropna(how='all').dropna(axis=1, how='all')
+        columns = tuple(str(c) for c in df.columns)
+
+        schema = cached_schema(source, columns) if source is not None else None
+        attrs["schema_cached"] = schema is not None
+        if schema is None:
+            schema = infer_schema(df)
+            if source is not None:
+                remember_schema(source, columns, schema)
+        df = apply_schema(df, schema)
+        df.attrs["schema"] = schema
+        attrs["shape"] = list(df.shape)
+    if compaction.ENABLED if compact is None else compact:
+        df = compaction.compact_frame(df)
+    observe_frame(df)
+    return df
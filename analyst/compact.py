@@ -0,0 +1,88 @@
+"""
+Memory-compact column representation for cleaned frames
+
+Typing leaves every number as int64/float64 and free text as Python
+strings. ``compact_frame`` shrinks a typed frame column by column:
+
+- integers go to int32 when every value fits (not narrower, so ordinary
+  arithmetic such as ``year + 100`` cannot overflow),
+- floats go to float32 only when that is lossless for every value,
+- low-cardinality text becomes categorical,
+- remaining text is stored as Arrow-backed strings when pyarrow is
+  installed; columns that already arrive Arrow-backed (pandas 3 readers)
+  are left untouched, so their buffers are never copied into Python objects.
+
+Comparisons, ``corr()`` and plotting work unchanged on the compact dtypes.
+The frame's memory before and after is recorded on the ``compact`` span and
+in the metrics.
+"""
+
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from analyst.metrics import COMPACT_SAVED_BYTES, span
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ANALYST_COMPACT", "1") == "1"
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MAX_UNIQUE = 10000
+INT32 = np.iinfo(np.int32)
+
+
+def _arrow_strings() -> Optional[pd.api.extensions.ExtensionDtype]:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype("pyarrow")
+
+
+def _is_text(dtype) -> bool:
+    return dtype == object or isinstance(dtype, pd.StringDtype)
+
+
+def compact_column(series: pd.Series, arrow_strings=None) -> pd.Series:
+    """Return ``series`` in the smallest dtype that holds its values exactly"""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype) and dtype.itemsize > 4:
+        if series.empty or (INT32.min <= series.min() and series.max() <= INT32.max):
+            return series.astype(np.int32)
+        return series
+    if dtype == np.float64:
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        with np.errstate(over="ignore", invalid="ignore"):
+            exact = np.array_equal(narrowed.astype(np.float64), values, equal_nan=True)
+        return pd.Series(narrowed, index=series.index, name=series.name) if exact else series
+    if _is_text(dtype):
+        if getattr(dtype, "storage", None) == "pyarrow":
+            # Already Arrow-backed: converting would only copy the buffers
+            return series
+        n_unique = series.nunique(dropna=True)
+        if n_unique <= CATEGORY_MAX_UNIQUE and n_unique <= CATEGORY_MAX_RATIO * len(series):
+            return series.astype("category")
+        if arrow_strings is not None:
+            return series.astype(arrow_strings)
+    return series
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Shrink every column of ``df`` (see the module docstring); attrs are kept"""
+    with span("compact") as attrs:
+        before = int(df.memory_usage(index=True, deep=True).sum())
+        arrow_strings = _arrow_strings()
+        columns = {col: compact_column(df[col], arrow_strings) for col in df.columns}
+        compacted = pd.DataFrame(columns, index=df.index, copy=False)
+        compacted.attrs.update(df.attrs)
+        after = int(compacted.memory_usage(index=True, deep=True).sum())
+        attrs.update(bytes_before=before, bytes_after=after)
+    COMPACT_SAVED_BYTES.inc(max(0, before - after))
+    logger.info(f"Compacted {df.shape[0]}x{df.shape[1]} frame: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+    return compacted
@@ -0,0 +1,248 @@
+"""
+Persisted court × year summary index
+
+The court questions only need a handful of numbers per court and decision
+year. The busiest court is the largest case total over a range of years.
+The delay trend is the least-squares line through the yearly mean delays
+``delay_sum / delays``. Rescanning every judgment on each request to
+recompute them is wasteful, so ``CourtIndex`` keeps these totals per
+(file, court, year) and answers from them.
+
+The index is built with one DuckDB pass over the dataset and persisted under
+``COURT_INDEX_DIR``: the totals as Parquet, plus a JSON manifest of the files
+they cover. Because totals are kept per file, a refresh lists the dataset
+again, scans only the files that are new, and drops the rows of files that
+changed or disappeared. Local files are identified by size and mtime.
+Remote partitions are assumed to be immutable once listed. Refreshes run at
+most every ``COURT_INDEX_REFRESH`` seconds. Between refreshes, questions are
+answered from the in-memory (court, year) table without touching the dataset.
+``lookup`` returns None when the index cannot be used, so callers fall back
+to the raw scan in ``analyst.court``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analyst.court import (MissingColumns, _connection, _enable_remote, _quote, court_year_totals,
+                           open_dataset)
+from analyst.metrics import register_collector, span
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("COURT_INDEX", "1") == "1"
+INDEX_DIR = os.getenv("COURT_INDEX_DIR", os.path.join(tempfile.gettempdir(), "analyst-court-index"))
+REFRESH = float(os.getenv("COURT_INDEX_REFRESH", "300"))
+FORMAT_VERSION = 1
+
+COLUMNS = ["file", "court", "year", "cases", "delays", "delay_sum", "delay_sq"]
+TOTALS = ["cases", "delays", "delay_sum", "delay_sq"]
+GLOB_CHARS = "*?["
+
+
+def list_files(source: str) -> Dict[str, str]:
+    """The data files of ``source`` with a fingerprint that changes when a file does"""
+    if any(c in source for c in GLOB_CHARS):
+        con = _connection()
+        if "://" in source:
+            _enable_remote(con)
+        files = [row[0] for row in con.execute(f"SELECT file FROM glob({_quote(source)})").fetchall()]
+    else:
+        files = [source]
+    fingerprints = {}
+    for path in files:
+        if "://" in path:
+            fingerprints[path] = ""
+        else:
+            st = os.stat(path)
+            fingerprints[path] = f"{st.st_size}:{st.st_mtime_ns}"
+    return fingerprints
+
+
+def _slope(x: np.ndarray, y: np.ndarray) -> float:
+    """Least-squares slope of ``y`` on ``x`` (NaN when ``x`` does not vary, like ``regr_slope``)"""
+    dx = x - x.mean()
+    denominator = float(dx @ dx)
+    return float(dx @ (y - y.mean()) / denominator) if denominator > 0 else float("nan")
+
+
+class CourtIndex:
+    """Per (file, court, year) totals of one dataset, kept in memory and on disk"""
+
+    def __init__(self, source: str, directory: str = INDEX_DIR):
+        self.source = source
+        self.directory = directory
+        self.key = hashlib.sha256(source.encode()).hexdigest()[:32]
+        self.files: Dict[str, str] = {}
+        self._set(pd.DataFrame(columns=COLUMNS))
+        self.checked = 0.0
+        self.counters = {"refreshes": 0, "scanned_files": 0, "dropped_files": 0}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(self.directory, self.key + suffix)
+
+    def _load(self) -> None:
+        try:
+            with open(self._path(".json")) as f:
+                manifest = json.load(f)
+            if manifest.get("source") != self.source or manifest.get("version") != FORMAT_VERSION:
+                return
+            frame = _connection().execute(
+                f"SELECT * FROM read_parquet({_quote(self._path('.parquet'))})").df()
+        except Exception as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable court index for {self.source}: {e}")
+            return
+        self.files = manifest["files"]
+        self._set(frame[frame["file"].isin(list(self.files))])
+        logger.info(f"Loaded court index for {self.source}: {len(self.files)} files")
+
+    def _save(self) -> None:
+        con = _connection()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self._path(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            con.register("court_index_rows", self.aggregates)
+            try:
+                con.execute(f"COPY court_index_rows TO {_quote(tmp)} (FORMAT parquet)")
+            finally:
+                con.unregister("court_index_rows")
+            os.replace(tmp, self._path(".parquet"))
+            # The manifest is written last, so it never lists files the Parquet lacks
+            with open(tmp, "w") as f:
+                json.dump({"version": FORMAT_VERSION, "source": self.source, "files": self.files}, f)
+            os.replace(tmp, self._path(".json"))
+        except OSError as e:
+            logger.warning(f"Could not persist court index for {self.source}: {e}")
+
+    def _set(self, aggregates: pd.DataFrame) -> None:
+        self.aggregates = aggregates.reset_index(drop=True)
+        self.totals = (aggregates.groupby(["court", "year"], dropna=False, sort=True)[TOTALS]
+                       .sum().reset_index())
+        # Plain arrays for answering: court codes follow the sorted court names
+        # (missing courts get -1), so the lowest code wins ties as in the SQL
+        codes, courts = pd.factorize(self.totals["court"], sort=True)
+        self._courts = list(courts)
+        self._codes = np.where(codes < 0, len(self._courts), codes)
+        self._years = self.totals["year"].to_numpy(dtype="float64")
+        self._cases = self.totals["cases"].to_numpy(dtype="float64")
+        self._yearly: Dict[Any, Tuple[List[int], List[float], float]] = {}
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Bring the index up to date with the dataset's files.
+
+        Returns how many files were scanned. Skipped (0) if the last check
+        was less than ``COURT_INDEX_REFRESH`` seconds ago, unless ``force``.
+        """
+        with self._lock:
+            if not force and self.files and time.time() - self.checked < REFRESH:
+                return 0
+            listed = list_files(self.source)
+            if not listed:
+                raise FileNotFoundError(f"No files match {self.source}")
+            dropped = [f for f in self.files if listed.get(f) != self.files[f]]
+            new = [f for f in listed if self.files.get(f) != listed[f]]
+            if dropped or new:
+                with span("index", files=len(new), dropped=len(dropped)):
+                    aggregates = self.aggregates[~self.aggregates["file"].isin(dropped)]
+                    if new:
+                        scanned = court_year_totals(open_dataset(new))
+                        aggregates = pd.concat([aggregates, scanned], ignore_index=True) if len(aggregates) else scanned
+                    self._set(aggregates)
+                    self.files = listed
+                    self._save()
+                logger.info(f"Refreshed court index for {self.source}: "
+                            f"{len(new)} files scanned, {len(dropped)} dropped")
+            self.counters["refreshes"] += 1
+            self.counters["scanned_files"] += len(new)
+            self.counters["dropped_files"] += len(dropped)
+            self.checked = time.time()
+            return len(new)
+
+    def busiest_court(self, start: int, end: int) -> Optional[Any]:
+        """Same answer as ``analyst.court.busiest_court``, from the index"""
+        selected = (self._years >= start) & (self._years <= end)
+        if not selected.any():
+            return None
+        cases = np.bincount(self._codes[selected], weights=self._cases[selected],
+                            minlength=len(self._courts) + 1)
+        best = int(np.argmax(cases))
+        return self._courts[best] if best < len(self._courts) else None
+
+    def yearly_delay(self, court: str) -> Tuple[List[int], List[float], float]:
+        """Same answer as ``analyst.court.yearly_delay``, from the index"""
+        if court not in self._yearly:
+            totals = self.totals
+            selected = totals[(totals["court"] == court) & (totals["delays"] > 0)]
+            if selected.empty:
+                self._yearly[court] = ([], [], float("nan"))
+            else:
+                years = selected["year"].to_numpy(dtype="float64")
+                delays = (selected["delay_sum"] / selected["delays"]).to_numpy(dtype="float64")
+                self._yearly[court] = ([int(y) for y in years], delays.tolist(), _slope(years, delays))
+        years, delays, slope = self._yearly[court]
+        return list(years), list(delays), slope
+
+    def stats(self) -> Dict[str, Any]:
+        return {"files": len(self.files), "groups": len(self.totals), **self.counters}
+
+
+_indexes: Dict[str, CourtIndex] = {}
+_registry_lock = threading.Lock()
+counters = {"fallbacks": 0}
+
+
+def court_index(source: str, directory: Optional[str] = None) -> CourtIndex:
+    """The shared index of ``source``, loaded from disk on first use"""
+    directory = directory or INDEX_DIR
+    with _registry_lock:
+        index = _indexes.get(source)
+        if index is None or index.directory != directory:
+            index = _indexes[source] = CourtIndex(source, directory)
+        return index
+
+
+def lookup(source: str) -> Optional[CourtIndex]:
+    """
+    The refreshed index of ``source``, or None when it cannot be used.
+
+    ``MissingColumns`` is raised as the raw scan would; any other failure
+    (an unlistable source, an unwritable directory, ...) is logged and
+    counted so the caller can fall back to scanning the dataset.
+    """
+    if not ENABLED:
+        return None
+    try:
+        index = court_index(source)
+        index.refresh()
+        return index
+    except MissingColumns:
+        raise
+    except Exception as e:
+        counters["fallbacks"] += 1
+        logger.warning(f"Court index unavailable for {source}, scanning the dataset instead: {e}")
+        return None
+
+
+def stats() -> Dict[str, Any]:
+    with _registry_lock:
+        indexes = list(_indexes.values())
+    totals = {"indexes": len(indexes), **counters}
+    for index in indexes:
+        for key, value in index.stats().items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+register_collector("court_index", stats)
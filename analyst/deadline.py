@@ -0,0 +1,46 @@
+"""
+Per-request time budgets
+
+A ``Deadline`` is created when a request arrives and handed to every stage
+(fetch, parse, clean, each question, plotting). Stages size their timeouts
+from ``remaining()`` and skip work once the budget is spent, so a slow
+request returns what it has instead of burning the full budget and failing.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+# Returned in place of answers that did not finish within the budget
+TIMEOUT_PLACEHOLDER = "Not answered: time budget exceeded"
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a stage is skipped because the budget is spent"""
+
+
+class Deadline:
+    """A monotonic-clock deadline with helpers for sizing stage timeouts"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget
+
+    def remaining(self, cap: Optional[float] = None) -> float:
+        """Seconds left, optionally capped (e.g. by a stage's own limit)"""
+        left = max(0.0, self.expires_at - time.monotonic())
+        return left if cap is None else min(left, cap)
+
+    def elapsed(self) -> float:
+        """Seconds since the request arrived"""
+        return time.monotonic() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str, reserve: float = 0.0) -> None:
+        """Raise ``DeadlineExceeded`` unless more than ``reserve`` seconds remain"""
+        if self.remaining() <= reserve:
+            raise DeadlineExceeded(f"Skipped {stage}: time budget exhausted")
@@ -0,0 +1,119 @@
+"""
+Bounded worker pool for CPU-bound pipeline stages
+
+Parsing, cleaning, analysis and plotting are handed to a thread (or
+process) pool so the event loop stays free for I/O and ``/health``. The pool
+tracks how many tasks are running or queued; once that reaches
+``workers + max_queue`` new work is refused with ``PoolSaturated`` so callers
+can answer 503 + Retry-After instead of piling up requests. Each task can be
+given a timeout; if it expires the task is cancelled if still queued, and
+otherwise abandoned with its result discarded.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from analyst.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# Same default as ThreadPoolExecutor: enough threads that a slow task cannot block the rest
+WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+MAX_QUEUE = int(os.getenv("ANALYSIS_QUEUE", "16"))
+POOL_KIND = os.getenv("ANALYSIS_POOL", "thread")
+RETRY_AFTER = int(os.getenv("ANALYSIS_RETRY_AFTER", "5"))
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when the pool already holds as many tasks as it will accept"""
+
+    def __init__(self, retry_after: int = RETRY_AFTER):
+        super().__init__("Analysis workers are saturated, retry later")
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """A thread/process pool with a cap on outstanding tasks"""
+
+    def __init__(self, workers: int = WORKERS, max_queue: int = MAX_QUEUE, kind: str = POOL_KIND):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self.counters = {"submitted": 0, "finished": 0, "rejected": 0, "timed_out": 0}
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="analysis")
+        return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._outstanding -= 1
+            self.counters["finished"] += 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+
+        Raises ``PoolSaturated`` when the pool is full and
+        ``asyncio.TimeoutError`` when ``timeout`` expires first.
+        """
+        if timeout is not None and timeout <= 0:
+            self.counters["timed_out"] += 1
+            raise asyncio.TimeoutError()
+
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queue:
+                self.counters["rejected"] += 1
+                raise PoolSaturated()
+            self._outstanding += 1
+            self.counters["submitted"] += 1
+
+        try:
+            if self.kind == "process":
+                future = self.executor.submit(fn, *args, **kwargs)
+            else:
+                # Carry the caller's context (e.g. the request's profiling trace) into the thread
+                future = self.executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        # The slot is freed when the work actually finishes, not when we stop waiting
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            if timeout is None:
+                # Raised by ``fn`` itself (e.g. a socket timeout), not by our budget
+                raise
+            future.cancel()
+            self.counters["timed_out"] += 1
+            logger.warning(f"{getattr(fn, '__name__', fn)} exceeded its {timeout:.1f}s budget")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, kind=self.kind, workers=self.workers,
+                        max_queue=self.max_queue, outstanding=self._outstanding)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+cpu_pool = WorkerPool()
+register_collector("workers", cpu_pool.stats)
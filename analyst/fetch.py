@@ -0,0 +1,173 @@
+"""
+Async HTTP fetch layer shared by the scraping handlers
+
+A single pooled ``httpx.AsyncClient`` is reused across requests so that
+keep-alive connections survive between calls, a per-host semaphore keeps
+any one site from monopolising the pool, and bodies are streamed in chunks
+so a slow page never blocks the event loop.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Optional
+from urllib.parse import urlsplit
+
+from analyst.metrics import FETCH_BYTES, FETCH_REQUESTS, span
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Tunables (overridable through the environment)
+TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "20"))
+CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+BACKOFF = float(os.getenv("FETCH_BACKOFF", "0.5"))
+MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE = int(os.getenv("FETCH_MAX_KEEPALIVE", "20"))
+PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST", "6"))
+MAX_BODY_BYTES = int(os.getenv("FETCH_MAX_BODY_BYTES", str(50 * 1024 * 1024)))
+
+USER_AGENT = "DataAnalystAgent/1.0 (+https://github.com/AkashVinoo/project2tds)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_client: Optional["httpx.AsyncClient"] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+
+
+@dataclass
+class FetchResult:
+    """Response of a fetch: status, headers and the fully read body"""
+    url: str
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    content: bytes = b""
+    encoding: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def get_client() -> "httpx.AsyncClient":
+    """Return the shared pooled client, creating it on first use"""
+    import httpx  # deferred to keep cold starts fast
+
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # Pools are bound to the loop they were created on
+        _client_loop = loop
+        _host_limits.clear()
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_KEEPALIVE),
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client (called on application shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    get_client()  # make sure the limits belong to the running loop
+    host = urlsplit(url).netloc.lower()
+    sem = _host_limits.get(host)
+    if sem is None:
+        sem = _host_limits[host] = asyncio.Semaphore(PER_HOST_LIMIT)
+    return sem
+
+
+async def _fetch_once(url: str, headers: Optional[Dict[str, str]]) -> FetchResult:
+    client = get_client()
+    async with client.stream("GET", url, headers=headers) as response:
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise ValueError(f"Response from {url} exceeds {MAX_BODY_BYTES} bytes")
+            chunks.append(chunk)
+        FETCH_REQUESTS.inc(status=response.status_code)
+        FETCH_BYTES.inc(size)
+        return FetchResult(
+            url=str(response.url),
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            content=b"".join(chunks),
+            encoding=response.encoding,
+        )
+
+
+async def fetch(url: str, headers: Optional[Dict[str, str]] = None,
+                retries: Optional[int] = None, timeout: Optional[float] = None) -> FetchResult:
+    """
+    GET a URL through the shared pool with retries and exponential backoff.
+
+    Transport errors and retryable statuses (429/5xx) are retried; any other
+    non-2xx/304 status raises ``httpx.HTTPStatusError``. ``timeout`` bounds
+    the whole call including retries and raises ``asyncio.TimeoutError``.
+    """
+    with span("fetch", host=urlsplit(url).netloc) as attrs:
+        result = await _fetch_with_retries(url, headers, retries, timeout)
+        attrs.update(status=result.status_code, bytes=len(result.content))
+        return result
+
+
+async def _fetch_with_retries(url: str, headers: Optional[Dict[str, str]],
+                              retries: Optional[int], timeout: Optional[float]) -> FetchResult:
+    import httpx
+
+    retries = MAX_RETRIES if retries is None else retries
+    expires_at = None if timeout is None else time.monotonic() + timeout
+    attempt = 0
+    while True:
+        left = None if expires_at is None else expires_at - time.monotonic()
+        if left is not None and left <= 0:
+            raise asyncio.TimeoutError(f"Fetch of {url} ran out of time")
+        try:
+            async with _host_semaphore(url):
+                result = await asyncio.wait_for(_fetch_once(url, headers), left)
+            if result.status_code in RETRY_STATUSES and attempt < retries:
+                raise httpx.HTTPStatusError(
+                    f"Retryable status {result.status_code}",
+                    request=httpx.Request("GET", url),
+                    response=httpx.Response(result.status_code),
+                )
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if attempt >= retries:
+                raise
+            delay = BACKOFF * (2 ** attempt)
+            if expires_at is not None and time.monotonic() + delay >= expires_at:
+                raise
+            attempt += 1
+            logger.warning(f"Fetch of {url} failed ({e}); retry {attempt}/{retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if result.status_code != 304 and not 200 <= result.status_code < 300:
+            raise httpx.HTTPStatusError(
+                f"GET {url} returned {result.status_code}",
+                request=httpx.Request("GET", url),
+                response=httpx.Response(result.status_code),
+            )
+        return result
+
+
+async def fetch_text(url: str, timeout: Optional[float] = None) -> str:
+    """Fetch a URL and return its decoded body"""
+    return (await fetch(url, timeout=timeout)).text
@@ -0,0 +1,170 @@
+"""
+Streaming ingestion of uploaded data files
+
+Uploads are spooled to a temporary file in fixed-size blocks instead of
+being read into memory. Small files are then read whole by
+``analyst.readers``; large CSV, JSON Lines and Parquet files are read chunk
+by chunk and reduced on the fly to a ``DatasetSummary`` (row count, per-column
+count/min/max/mean, pairwise correlations and regressions, plus a bounded
+random sample for plotting), so peak memory no longer grows with file size.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence
+
+from analyst.metrics import span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from analyst.stats import PairwiseMoments
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "100000"))
+STREAM_THRESHOLD = int(os.getenv("INGEST_STREAM_BYTES", str(64 * 1024 * 1024)))
+SAMPLE_ROWS = int(os.getenv("INGEST_SAMPLE_ROWS", "5000"))
+COPY_BLOCK = 1024 * 1024
+
+STREAMABLE = {"csv", "jsonl", "parquet"}
+NUMERIC_TYPES = {"integer", "float", "year", "currency"}
+
+
+async def spool_upload(upload) -> str:
+    """Copy an UploadFile to a temporary file in blocks and return its path"""
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+
+    def copy() -> None:
+        upload.file.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(upload.file, out, COPY_BLOCK)
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, copy)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def iter_chunks(path: str, fmt: str, chunk_rows: int = CHUNK_ROWS,
+                columns: Optional[Sequence[str]] = None, delimiter: Optional[str] = None) -> Iterator["pd.DataFrame"]:
+    """Yield the file as DataFrames of at most ``chunk_rows`` rows"""
+    import pandas as pd
+
+    if fmt == "csv":
+        sep = delimiter or ("\t" if path.endswith(".tsv") else ",")
+        yield from pd.read_csv(path, sep=sep, chunksize=chunk_rows, memory_map=True,
+                               usecols=list(columns) if columns else None)
+    elif fmt == "jsonl":
+        for chunk in pd.read_json(path, lines=True, chunksize=chunk_rows):
+            yield chunk[list(columns)] if columns else chunk
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(columns) if columns else None):
+            yield batch.to_pandas()
+    elif fmt == "json":
+        yield pd.read_json(path)
+    elif fmt == "excel":
+        yield pd.read_excel(path)
+    else:
+        raise ValueError(f"Unsupported data file format: {fmt}")
+
+
+@dataclass
+class DatasetSummary:
+    """Aggregates of a dataset computed in a single pass"""
+    rows: int
+    columns: List[str]
+    numeric: List[str]
+    moments: "PairwiseMoments"
+    sample: "pd.DataFrame"
+    schema: dict = field(default_factory=dict)
+
+    def merge(self, other: "DatasetSummary", sample_rows: int = SAMPLE_ROWS) -> "DatasetSummary":
+        """
+        Combine with the summary of another shard of the same table.
+
+        Both must have the same numeric columns. The merged sample stays
+        uniform: each side contributes rows in proportion to the rows it
+        summarises.
+        """
+        import numpy as np
+        import pandas as pd
+
+        rows = self.rows + other.rows
+        take = np.random.default_rng(rows).multivariate_hypergeometric(
+            [self.rows, other.rows], min(sample_rows, rows))
+        parts = [summary.sample.sample(n=min(int(n), len(summary.sample)), random_state=0)
+                 for summary, n in zip((self, other), take)]
+        self.sample = pd.concat(parts, ignore_index=True)
+        self.moments.merge(other.moments)
+        self.rows = rows
+        return self
+
+
+def summarize_file(path: str, fmt: str, chunk_rows: int = CHUNK_ROWS,
+                   sample_rows: int = SAMPLE_ROWS, columns: Optional[Sequence[str]] = None,
+                   delimiter: Optional[str] = None) -> DatasetSummary:
+    """
+    Stream a file once, typing each chunk and folding it into running aggregates.
+
+    ``columns`` limits the pass to those columns.
+    """
+    import pandas as pd
+
+    from analyst.clean import apply_schema, infer_schema
+    from analyst.stats import PairwiseMoments, Reservoir
+
+    schema = None
+    numeric: List[str] = []
+    names: List[str] = []
+    moments: Optional[PairwiseMoments] = None
+    reservoir = Reservoir(sample_rows)
+    rows = 0
+
+    with span("ingest", format=fmt, bytes=os.path.getsize(path), mode="stream") as attrs:
+        for chunk in iter_chunks(path, fmt, chunk_rows, columns, delimiter):
+            if schema is None:
+                # The first chunk fixes the schema; later chunks are only converted
+                schema = infer_schema(chunk)
+                names = [str(c) for c in chunk.columns]
+                chunk = apply_schema(chunk, schema)
+                numeric = [str(c) for c in chunk.columns
+                           if schema.get(str(c)) in NUMERIC_TYPES and pd.api.types.is_numeric_dtype(chunk[c])]
+                moments = PairwiseMoments(numeric)
+            else:
+                chunk = apply_schema(chunk, schema)
+            chunk.columns = [str(c) for c in chunk.columns]
+            rows += len(chunk)
+            frame = chunk.reindex(columns=numeric)
+            moments.update(frame)
+            reservoir.update(frame)
+        attrs["rows"] = rows
+
+    if moments is None:
+        moments = PairwiseMoments([])
+    logger.info(f"Summarised {rows} rows from {os.path.basename(path)} in one pass")
+    sample = reservoir.sample if reservoir.sample is not None else pd.DataFrame(columns=numeric)
+    return DatasetSummary(rows=rows, columns=names, numeric=numeric, moments=moments,
+                          sample=sample, schema=schema or {})
+
+
+def summarize_frame(df: "pd.DataFrame", numeric: Sequence[str]) -> DatasetSummary:
+    """Summary of an already cleaned DataFrame, so it can be merged with streamed shards"""
+    from analyst.stats import PairwiseMoments
+
+    moments = PairwiseMoments(numeric)
+    moments.update(df)
+    return DatasetSummary(rows=len(df), columns=[str(c) for c in df.columns], numeric=list(numeric),
+                          moments=moments, sample=df[list(numeric)].reset_index(drop=True))
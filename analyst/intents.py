@@ -0,0 +1,202 @@
+"""
+Question routing through a compiled intent registry
+
+Intents are declared with the phrases that signal them and a priority.
+All phrases are merged into a trie and compiled into one regular
+expression, so classifying a question is a single scan no matter how many
+intents are registered. Phrases match on word boundaries ("count" no longer
+fires on "country"). When several intents match, the one with the highest
+priority wins.
+
+Classification also pulls out the parameters the answer needs: money
+thresholds ("over $1.5 bn"), year bounds ("before 2000") and the dataset
+columns a question names. Results are cached per question text (and column
+set), because the same questions arrive again and again.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+CACHE_SIZE = 4096
+
+MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "mn": 1e6, "million": 1e6,
+               "b": 1e9, "bn": 1e9, "billion": 1e9, "t": 1e12, "tn": 1e12, "trillion": 1e12}
+
+MONEY = re.compile(
+    r"(?P<op>over|above|more than|greater than|exceeding|at least|under|below|less than|at most)?\s*"
+    r"\$\s?(?P<amount>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>thousand|million|billion|trillion|mn|bn|tn|[kmbt])?\b"
+)
+YEAR = re.compile(
+    r"\b(?P<op>before|prior to|earlier than|after|later than|since|from|in|until|by|"
+    r"between)\s+(?P<year>1[89]\d\d|2[01]\d\d)(?:\s*(?:and|-|to)\s*(?P<end>1[89]\d\d|2[01]\d\d))?\b"
+)
+FOUR_DIGITS = re.compile(r"\d{4}")
+WORD = re.compile(r"[a-z][a-z0-9]{2,}")
+MONEY_OPS = {None: ">=", "over": ">", "above": ">", "more than": ">", "greater than": ">", "exceeding": ">",
+             "at least": ">=", "under": "<", "below": "<", "less than": "<", "at most": "<="}
+
+
+@dataclass(frozen=True)
+class Intent:
+    """A named intent, the phrases that signal it and its precedence"""
+    name: str
+    phrases: Tuple[str, ...]
+    priority: int = 0
+
+
+@dataclass
+class Route:
+    """Outcome of classifying one question"""
+    intent: Optional[str]
+    threshold: Optional[Tuple[str, float]] = None      # (operator, amount)
+    year_range: Optional[Tuple[Optional[int], Optional[int]]] = None  # inclusive (low, high)
+    columns: Tuple[str, ...] = ()
+    matched: Tuple[str, ...] = field(default=(), repr=False)
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex for a set of literal phrases, factored on shared prefixes"""
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        if list(node) == [""]:
+            return ""
+        optional = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if optional:
+            body = (body if len(branches) == 1 and len(body) == 1 else f"(?:{body})") + "?"
+        return body
+
+    return build(trie)
+
+
+def parse_threshold(text: str) -> Optional[Tuple[str, float]]:
+    """First money amount in ``text`` with its comparison, e.g. ``(">", 1.5e9)``"""
+    match = MONEY.search(text) if "$" in text else None
+    if not match:
+        return None
+    amount = float(match.group("amount").replace(",", ""))
+    return MONEY_OPS[match.group("op")], amount * MULTIPLIERS.get(match.group("unit") or "", 1.0)
+
+
+def parse_year_range(text: str) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """Inclusive year bounds implied by phrases like "before 2000" or "between 2019 and 2022" """
+    low: Optional[int] = None
+    high: Optional[int] = None
+    found = False
+    # Most questions name no year; skip the alternation scan unless one is present
+    for match in (YEAR.finditer(text) if FOUR_DIGITS.search(text) else ()):
+        op, year, end = match.group("op"), int(match.group("year")), match.group("end")
+        found = True
+        if end is not None:
+            low, high = year, int(end)
+        elif op in ("before", "prior to", "earlier than"):
+            high = year - 1
+        elif op in ("after", "later than"):
+            low = year + 1
+        elif op in ("since", "from"):
+            low = year
+        elif op in ("until", "by"):
+            high = year
+        else:
+            low = high = year
+    return (low, high) if found else None
+
+
+class IntentRouter:
+    """Registry of intents compiled into a single matcher"""
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self._intents: Dict[str, Intent] = {}
+        self._owners: Dict[str, List[str]] = {}
+        self._pattern: Optional["re.Pattern[str]"] = None
+        self._classify = lru_cache(maxsize=cache_size)(self._classify_uncached)
+
+    def register(self, name: str, *phrases: str, priority: int = 0) -> None:
+        """Add (or extend) an intent; phrases are matched case-insensitively as whole words"""
+        existing = self._intents.get(name)
+        merged = (existing.phrases if existing else ()) + tuple(p.lower() for p in phrases)
+        self._intents[name] = Intent(name, merged, priority)
+        self._pattern = None
+        self._classify.cache_clear()
+
+    @property
+    def intents(self) -> List[Intent]:
+        return list(self._intents.values())
+
+    def compile(self) -> "re.Pattern[str]":
+        if self._pattern is None:
+            self._owners = {}
+            for intent in self._intents.values():
+                for phrase in intent.phrases:
+                    self._owners.setdefault(phrase, []).append(intent.name)
+            self._pattern = re.compile(r"\b" + _trie_pattern(self._owners) + r"\b")
+        return self._pattern
+
+    def classify(self, question: str, columns: Sequence[str] = ()) -> Route:
+        """Route ``question``; ``columns`` are the dataset's column names to look for"""
+        return self._classify(question, tuple(str(c) for c in columns))
+
+    def cache_info(self):
+        return self._classify.cache_info()
+
+    def _classify_uncached(self, question: str, columns: Tuple[str, ...]) -> Route:
+        text = question.lower()
+        matched = tuple(m.group(0) for m in self.compile().finditer(text))
+        best: Optional[Intent] = None
+        for phrase in matched:
+            for name in self._owners[phrase]:
+                intent = self._intents[name]
+                if best is None or intent.priority > best.priority:
+                    best = intent
+        return Route(intent=best.name if best else None,
+                     threshold=parse_threshold(text),
+                     year_range=parse_year_range(text),
+                     columns=_mentioned_columns(columns)(text) if columns else (),
+                     matched=matched)
+
+
+def keywords(text: str) -> FrozenSet[str]:
+    """Lower-cased words of three or more characters, for matching text against table headers"""
+    return frozenset(WORD.findall(text.lower()))
+
+
+@lru_cache(maxsize=256)
+def _mentioned_columns(columns: Tuple[str, ...]):
+    """Build a finder returning the columns named in a question, in order of mention"""
+    by_name = {c.lower().strip(): c for c in columns if c.strip()}
+    if not by_name:
+        return lambda text: ()
+    pattern = re.compile(r"(?<!\w)" + _trie_pattern(by_name) + r"(?!\w)")
+
+    def find(text: str) -> Tuple[str, ...]:
+        seen: List[str] = []
+        for match in pattern.finditer(text):
+            column = by_name[match.group(0)]
+            if column not in seen:
+                seen.append(column)
+        return tuple(seen)
+
+    return find
+
+
+# Question intents shared by both apps; higher priority wins when several match
+router = IntentRouter()
+router.register("plot", "plot", "scatterplot", "scatter plot", "chart", "graph", "draw", "visualise",
+                "visualize", priority=40)
+router.register("correlation", "correlation", "correlate", "correlated", "pearson", priority=30)
+router.register("count", "count", "how many", "number of", priority=20)
+router.register("earliest", "earliest", "first", "oldest", priority=10)
+
+# Task-level routing: which data source a whole request is about
+tasks = IntentRouter()
+tasks.register("wikipedia", "wikipedia", "wikipedia.org", priority=10)
+tasks.register("court", "indian high court", "high court", priority=5)
@@ -0,0 +1,259 @@
+"""
+Background analysis jobs
+
+``POST /api/jobs`` takes the same payload as ``/api/`` but answers at once
+with a job ID; the analysis then runs on a local queue, at most
+``JOB_WORKERS`` jobs at a time, regardless of whether the client is still
+connected. ``GET /api/jobs/{id}`` reports the job's status, the answers of
+the questions finished so far and, at the end, the full result.
+
+Jobs are keyed by the payload hash (the response-cache key), so resubmitting
+an identical request returns the queued, running or finished job instead of
+doing the work again; only a failed job is replaced. Finished jobs are kept
+for ``JOB_RETENTION`` seconds and at most ``JOB_MAX_FINISHED`` of them, the
+oldest evicted first. Uploads are copied to temporary files at submission,
+because a request's own upload objects are closed once it returns.
+
+Jobs live in process memory, so job mode needs a long-running server
+(e.g. uvicorn). A serverless function is frozen after each response, so a
+queued job would never run and a later poll would likely reach another
+instance. Jobs are therefore off on Vercel unless ``ANALYST_JOBS=1``.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from analyst.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ANALYST_JOBS", "0" if os.getenv("VERCEL") else "1") == "1"
+WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("JOB_QUEUE", "64"))
+RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "256"))
+# Time budget of one job; much longer than a request's, since no connection is held open
+BUDGET = float(os.getenv("JOB_BUDGET", "1800"))
+RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "30"))
+COPY_BLOCK = 1024 * 1024
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_current: "contextvars.ContextVar[Optional[Job]]" = contextvars.ContextVar("job", default=None)
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when as many jobs are waiting as the queue will hold"""
+
+    def __init__(self, retry_after: int = RETRY_AFTER):
+        super().__init__("Too many queued jobs, retry later")
+        self.retry_after = retry_after
+
+
+class SpooledUpload:
+    """An upload copied to a temporary file so that it outlives its request"""
+
+    def __init__(self, filename: Optional[str], path: str, owner: bool = True):
+        self.filename = filename
+        self.path = path
+        self.owner = owner
+        self.file = open(path, "rb")
+
+    @classmethod
+    async def copy(cls, upload) -> "SpooledUpload":
+        suffix = os.path.splitext(upload.filename or "")[1]
+        fd, path = tempfile.mkstemp(prefix="job-", suffix=suffix)
+
+        def copy() -> None:
+            upload.file.seek(0)
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(upload.file, out, COPY_BLOCK)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, copy)
+        except BaseException:
+            os.remove(path)
+            raise
+        return cls(upload.filename, path)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    async def seek(self, offset: int) -> None:
+        self.file.seek(offset)
+
+    def view(self) -> "SpooledUpload":
+        """The same file with its own handle, for concurrent readers; closing it keeps the file"""
+        return SpooledUpload(self.filename, self.path, owner=False)
+
+    def close(self) -> None:
+        self.file.close()
+        if not self.owner:
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+@dataclass
+class Job:
+    """One submitted analysis and what is known about it so far"""
+    id: str
+    key: str
+    questions: List[str]
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    answers: Dict[int, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        progress = [{"question": q, "done": i in self.answers, "answer": self.answers.get(i)}
+                    for i, q in enumerate(self.questions)]
+        data: Dict[str, Any] = {
+            "id": self.id, "status": self.status, "created_at": self.created_at,
+            "started_at": self.started_at, "finished_at": self.finished_at,
+            "progress": {"done": sum(p["done"] for p in progress), "total": len(self.questions),
+                         "questions": progress},
+        }
+        if include_result:
+            data.update(result=self.result, error=self.error)
+        return data
+
+
+def report_progress(index: int, value: Any) -> None:
+    """Record the answer to question ``index`` of the job running in this context, if any"""
+    job = _current.get()
+    if job is not None:
+        job.answers[index] = value
+
+
+def report_answers(answers: Sequence[Any]) -> None:
+    """Record every answer of a finished result, which may have come from the cache without running"""
+    for index, value in enumerate(answers):
+        report_progress(index, value)
+
+
+class JobQueue:
+    """In-process job registry with bounded concurrency and retention"""
+
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING,
+                 retention: float = RETENTION, max_finished: int = MAX_FINISHED):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._pending: Deque[Tuple[Job, Callable[[], Awaitable[Any]], Optional[Callable[[], None]]]] = deque()
+        self._running = 0
+        self._tasks: set = set()
+        self.counters = {"submitted": 0, "deduplicated": 0, "rejected": 0, "done": 0, "failed": 0, "evicted": 0}
+
+    def _live(self, key: str) -> Optional[Job]:
+        self._evict()
+        job = self._jobs.get(self._by_key.get(key, ""))
+        return job if job is not None and job.status != FAILED else None
+
+    def find(self, key: str) -> Optional[Job]:
+        """The live (not failed) job already submitted for ``key``"""
+        job = self._live(key)
+        if job is not None:
+            self.counters["deduplicated"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def submit(self, key: str, questions: List[str], run: Callable[[], Awaitable[Any]],
+               cleanup: Optional[Callable[[], None]] = None) -> Tuple[Job, bool]:
+        """
+        Queue ``run()`` under ``key`` and return ``(job, created)``.
+
+        If a live job already has ``key`` it is returned instead and
+        ``cleanup`` is called straight away; otherwise ``cleanup`` runs when
+        the job finishes. Raises ``JobQueueFull`` when the queue is full.
+        """
+        existing = self.find(key)
+        if existing is not None:
+            if cleanup is not None:
+                cleanup()
+            return existing, False
+        if len(self._pending) >= self.max_pending:
+            self.counters["rejected"] += 1
+            if cleanup is not None:
+                cleanup()
+            raise JobQueueFull()
+
+        job = Job(id=uuid.uuid4().hex, key=key, questions=list(questions))
+        self._jobs[job.id] = job
+        self._by_key[key] = job.id
+        self._pending.append((job, run, cleanup))
+        self.counters["submitted"] += 1
+        self._dispatch()
+        return job, True
+
+    def _dispatch(self) -> None:
+        while self._running < self.workers and self._pending:
+            job, run, cleanup = self._pending.popleft()
+            self._running += 1
+            task = asyncio.get_running_loop().create_task(self._run(job, run, cleanup))
+            # The loop only keeps weak references to tasks
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job, run: Callable[[], Awaitable[Any]], cleanup: Optional[Callable[[], None]]) -> None:
+        # Each task runs in its own copy of the context, so this never leaks between jobs
+        _current.set(job)
+        job.status, job.started_at = RUNNING, time.time()
+        try:
+            job.result = await run()
+            job.status = DONE
+            self.counters["done"] += 1
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e!r}")
+            job.status, job.error = FAILED, str(e) or type(e).__name__
+            self.counters["failed"] += 1
+        finally:
+            job.finished_at = time.time()
+            if cleanup is not None:
+                cleanup()
+            self._running -= 1
+            self._dispatch()
+
+    def _evict(self) -> None:
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished]
+        finished.sort(key=lambda job: job.finished_at or 0)
+        excess = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i < excess or now - (job.finished_at or now) > self.retention:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) == job.id:
+                    del self._by_key[job.key]
+                self.counters["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counters, workers=self.workers, running=self._running,
+                    pending=len(self._pending), retained=len(self._jobs))
+
+
+job_queue = JobQueue()
+register_collector("jobs", job_queue.stats)
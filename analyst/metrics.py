@@ -0,0 +1,235 @@
+"""
+Pipeline instrumentation: stage spans, metrics and per-request profiles
+
+Each pipeline stage (fetch, parse, clean, analysis, plot, ...) runs inside
+``span(stage)``, which records its latency in a histogram and, when the
+current request is being profiled, appends it to that request's trace.
+Alongside the histograms sit counters for bytes fetched, frame shape and
+memory, and plot sizes. ``render()`` produces the Prometheus text
+exposition format for ``/metrics``; other components' ``stats()``
+dictionaries (cache hit/miss counters, worker pool state) are exported as
+gauges through ``register_collector``. Spans may nest (a plot inside an
+analysis step), so per-stage totals can overlap.
+
+The trace lives in a context variable; the worker pool copies the caller's
+context into each task, so spans recorded on worker threads are attributed
+to the request that submitted them.
+"""
+
+import bisect
+import contextvars
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PROFILING_ENABLED = os.getenv("ANALYST_PROFILING", "0") == "1"
+PROFILE_MODES = ("stages", "cprofile", "pyinstrument")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+ROW_BUCKETS = (10, 100, 1e3, 1e4, 1e5, 1e6, 1e7)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help, self.kind = name, help, "counter"
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(labels)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.kind = name, help, "histogram"
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List[float]] = {}   # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_labels(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield f"{self.name}_bucket{_format_labels(labels, ('le', le))} {cumulative:g}"
+            yield f"{self.name}_sum{_format_labels(labels)} {series[-1]:g}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative:g}"
+
+
+STAGE_SECONDS = Histogram("analyst_stage_seconds", "Latency of each pipeline stage")
+STAGE_ERRORS = Counter("analyst_stage_errors_total", "Pipeline stages that raised")
+FETCH_BYTES = Counter("analyst_fetch_bytes_total", "Response body bytes fetched")
+FETCH_REQUESTS = Counter("analyst_fetch_requests_total", "HTTP fetches by status code")
+FRAME_ROWS = Histogram("analyst_dataframe_rows", "Rows of cleaned DataFrames", ROW_BUCKETS)
+FRAME_BYTES = Histogram("analyst_dataframe_bytes",
+                        "Memory of cleaned DataFrames (excluding Python object payloads)", SIZE_BUCKETS)
+PLOT_BYTES = Histogram("analyst_plot_bytes", "Encoded plot size", SIZE_BUCKETS)
+COMPACT_SAVED_BYTES = Counter("analyst_compact_saved_bytes_total", "Frame memory saved by dtype compaction")
+
+METRICS = [STAGE_SECONDS, STAGE_ERRORS, FETCH_BYTES, FETCH_REQUESTS, FRAME_ROWS, FRAME_BYTES,
+           PLOT_BYTES, COMPACT_SAVED_BYTES]
+
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_trace: "contextvars.ContextVar[Optional[List[Dict[str, Any]]]]" = contextvars.ContextVar("trace", default=None)
+
+
+def register_collector(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """Export the numeric values of ``stats()`` as ``analyst_<name>_<key>`` gauges"""
+    _collectors[name] = stats
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Time a pipeline stage.
+
+    Yields a dict the caller may add attributes to (bytes, rows, ...); they
+    are kept in the request trace when profiling.
+    """
+    trace = _trace.get()
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        attrs["error"] = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if trace is not None:
+            trace.append({"stage": stage, "thread": threading.current_thread().name,
+                          "seconds": round(elapsed, 6), **attrs})
+
+
+def observe_frame(df) -> None:
+    """Record the shape and memory of a cleaned DataFrame"""
+    FRAME_ROWS.observe(len(df))
+    FRAME_BYTES.observe(float(df.memory_usage(index=True, deep=False).sum()))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    for name, stats in _collectors.items():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metric = f"analyst_{name}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value:g}")
+    # ru_maxrss is in kilobytes on Linux
+    lines.append("# TYPE process_max_rss_bytes gauge")
+    lines.append(f"process_max_rss_bytes {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}")
+    return "\n".join(lines) + "\n"
+
+
+class Profile:
+    """
+    Collects one request's stage trace and, depending on ``mode``, a
+    cProfile or pyinstrument profile of the event-loop thread.
+    """
+
+    def __init__(self, mode: str = "stages"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {', '.join(PROFILE_MODES)}")
+        if mode == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ValueError("pyinstrument is not installed; use mode 'stages' or 'cprofile'")
+        self.mode = mode
+        self.stages: List[Dict[str, Any]] = []
+        self._profiler: Any = None
+        self._token = None
+        self._start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "Profile":
+        self._token = _trace.set(self.stages)
+        if self.mode == "cprofile":
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == "pyinstrument":
+            from pyinstrument import Profiler
+
+            self._profiler = Profiler(async_mode="enabled")
+            self._profiler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self._start
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        elif self.mode == "pyinstrument":
+            self._profiler.stop()
+        _trace.reset(self._token)
+
+    def report(self, limit: int = 40) -> Dict[str, Any]:
+        totals: Dict[str, float] = {}
+        for entry in self.stages:
+            totals[entry["stage"]] = totals.get(entry["stage"], 0.0) + entry["seconds"]
+        report: Dict[str, Any] = {"mode": self.mode, "seconds": round(self.elapsed, 6),
+                                  "stage_totals": {k: round(v, 6) for k, v in totals.items()},
+                                  "stages": self.stages}
+        if self.mode == "cprofile":
+            import io
+            import pstats
+
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+            report["dump"] = out.getvalue()
+        elif self.mode == "pyinstrument":
+            report["dump"] = self._profiler.output_text(unicode=False, color=False)
+        return report
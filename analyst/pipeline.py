@@ -0,0 +1,301 @@
+"""
+One analysis pipeline for both apps
+
+A request goes through the same stages whichever app received it:
+fetch → extract → clean (``scrape_tables`` for linked pages,
+``load_attachments`` for uploads), plan → compute (``answer_questions``),
+render (the plot steps) and serialize (``Result``). What differs between
+data sources is only which stages run and what the questions are about, so
+each source is a task handler registered on an ``Engine`` under the task
+intent that selects it (``wikipedia``, ``court``, ...), with one default
+handler for everything else. The apps parse their own multipart form into a
+``Request``, call ``engine.run`` and serialize the ``Result`` in their own
+shape: the root app returns the list of answers, the tds app a dict keyed
+by question. Caching, pooling, deadlines and stage metrics therefore live
+in one place and are measured once per stage.
+
+Every data attachment of a request is used, not only the first: uploads
+are spooled concurrently, each shard is read on its own worker, and the
+shards are combined into the single dataset the handler answers from, so
+sending a dataset in more shards spreads the reading over more workers.
+
+Handlers wrap the loading of their data source in ``shared_load``. On its
+own that just runs the load; inside a batch (``SharedLoads``), requests
+about the same source await a single load and answer from the same
+cleaned dataset.
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+from analyst.deadline import TIMEOUT_PLACEHOLDER, Deadline
+from analyst.executor import PoolSaturated, cpu_pool
+from analyst.intents import IntentRouter, tasks
+from analyst.jobs import report_progress
+from analyst.metrics import span
+from analyst.plan import Plan, Step, answer
+from analyst.readers import Sniffed, sniff_upload
+
+logger = logging.getLogger(__name__)
+
+NUMBERED = tuple(f"{n}." for n in range(1, 10))
+
+Handler = Callable[["Request"], Awaitable["Result"]]
+T = TypeVar("T")
+
+
+class UnknownTask(ValueError):
+    """No handler is registered for the request's task"""
+
+
+def split_questions(text: str) -> Tuple[str, List[str]]:
+    """Separate the numbered questions from the task description around them"""
+    description = ""
+    questions = []
+    for line in text.strip().split("\n"):
+        if line.strip().startswith(NUMBERED):
+            questions.append(line.strip())
+        else:
+            description += line + "\n"
+    return description, questions
+
+
+def remaining(deadline: Optional[Deadline]) -> Optional[float]:
+    """Seconds left in the request budget (None means unbounded)"""
+    return None if deadline is None else deadline.remaining()
+
+
+@dataclass
+class Request:
+    """A question file and its attachments, as every handler sees them"""
+    text: str
+    description: str
+    questions: List[str]
+    attachments: List[Any] = field(default_factory=list)
+    deadline: Optional[Deadline] = None
+
+    @classmethod
+    def parse(cls, text: str, attachments: Sequence[Any] = (), deadline: Optional[Deadline] = None) -> "Request":
+        description, questions = split_questions(text)
+        return cls(text, description, questions, [f for f in attachments if f], deadline)
+
+    def attachments_of(self, *formats: str) -> List[Tuple[Any, Sniffed]]:
+        """
+        Every attachment in one of ``formats`` (any data file if none given)
+        with its sniffed format, judged by content rather than file name.
+        """
+        found = []
+        for upload in self.attachments:
+            sniffed = sniff_upload(upload)
+            if sniffed is not None and (not formats or sniffed.fmt in formats):
+                found.append((upload, sniffed))
+        return found
+
+    def attachment(self, *formats: str) -> Optional[Any]:
+        """The first attachment in one of ``formats`` (any data file if none given)"""
+        found = self.attachments_of(*formats)
+        return found[0][0] if found else None
+
+
+@dataclass
+class Result:
+    """Answers in question order, with the question each one belongs to"""
+    answers: List[Any]
+    questions: List[str]
+
+    def as_list(self) -> List[Any]:
+        return list(self.answers)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.questions, self.answers))
+
+
+class Engine:
+    """Registry of task handlers, selected by classifying the task description"""
+
+    def __init__(self, classifier: IntentRouter = tasks):
+        self.classifier = classifier
+        self.handlers: Dict[str, Handler] = {}
+        self.default: Optional[Handler] = None
+        self._questions: Dict[Optional[str], Callable[["Request"], List[str]]] = {}
+
+    def task(self, name: Optional[str] = None,
+             questions: Optional[Callable[["Request"], List[str]]] = None) -> Callable[[Handler], Handler]:
+        """
+        Register the decorated handler for task ``name`` (the default handler when None).
+
+        ``questions(request)`` names the questions the handler answers, in
+        order, when they are not simply the request's numbered questions.
+        """
+        def register(handler: Handler) -> Handler:
+            if name is None:
+                self.default = handler
+            else:
+                self.handlers[name] = handler
+            if questions is not None:
+                self._questions[name] = questions
+            return handler
+        return register
+
+    def route(self, request: Request, fallback: bool = True) -> Tuple[Optional[str], Optional[Handler]]:
+        name = self.classifier.classify(request.description).intent
+        if name in self.handlers:
+            return name, self.handlers[name]
+        return None, self.default if fallback else None
+
+    def questions(self, request: Request, fallback: bool = True) -> List[str]:
+        """The questions the request's handler will answer, in the order of its answers"""
+        name, _ = self.route(request, fallback)
+        questions = self._questions.get(name)
+        return list(questions(request)) if questions is not None else list(request.questions)
+
+    async def run(self, request: Request, fallback: bool = True) -> Result:
+        """Run the handler for the request's task; ``fallback=False`` rejects unrecognised tasks"""
+        name, handler = self.route(request, fallback)
+        if handler is None:
+            raise UnknownTask(f"No handler for this task (known: {', '.join(self.handlers)})")
+        logger.info(f"Running {name or 'default'} task with {len(request.questions)} questions")
+        return await handler(request)
+
+
+@asynccontextmanager
+async def spooled(uploads: Sequence[Any]) -> AsyncIterator[List[str]]:
+    """Spool uploads to temporary files concurrently; the files are removed on exit"""
+    from analyst.ingest import spool_upload
+
+    paths = await asyncio.gather(*(spool_upload(upload) for upload in uploads), return_exceptions=True)
+    try:
+        for path in paths:
+            if isinstance(path, BaseException):
+                raise path
+        yield list(paths)
+    finally:
+        for path in paths:
+            if isinstance(path, str):
+                os.remove(path)
+
+
+async def load_attachments(uploads: Sequence[Any], reader: Callable[..., Any],
+                           combine: Callable[[List[Any]], Any], *args: Any,
+                           deadline: Optional[Deadline] = None) -> Any:
+    """
+    Read every upload in parallel and combine the parts into one dataset.
+
+    ``reader(path, filename, *args)`` runs for each upload as its own worker
+    task once all of them are spooled, then ``combine(parts)`` (parts in
+    upload order) runs on the pool as well. A single upload skips the
+    combine step.
+    """
+    async with spooled(uploads) as paths:
+        with span("shards", shards=len(paths)):
+            parts = await asyncio.gather(
+                *(cpu_pool.run(reader, path, upload.filename, *args, timeout=remaining(deadline))
+                  for path, upload in zip(paths, uploads)),
+                return_exceptions=True)
+    for part in parts:
+        if isinstance(part, BaseException):
+            raise part
+    if len(parts) == 1:
+        return parts[0]
+    return await cpu_pool.run(combine, list(parts), timeout=remaining(deadline))
+
+
+class SharedLoads:
+    """
+    Data loads run once for a whole batch of requests.
+
+    Each request of the batch calls ``enter()`` at the start of its own
+    task; from then on every ``shared_load`` with the same key, from any
+    request of the batch, awaits the same load.
+    """
+
+    def __init__(self):
+        self._loads: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.counters = {"loads": 0, "shared": 0}
+
+    def enter(self) -> None:
+        # Each request runs in its own task (its own context copy), so there is nothing to reset
+        _shared_loads.set(self)
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        future = self._loads.get(key)
+        if future is None:
+            self.counters["loads"] += 1
+            future = self._loads[key] = asyncio.ensure_future(load())
+        else:
+            self.counters["shared"] += 1
+        return await asyncio.shield(future)
+
+
+_shared_loads: ContextVar[Optional[SharedLoads]] = ContextVar("shared_loads", default=None)
+
+
+def in_batch() -> bool:
+    """True when loads are shared with other requests"""
+    return _shared_loads.get() is not None
+
+
+async def shared_load(key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+    """Run ``load()``, or share the result of the same load by another request of the batch"""
+    loads = _shared_loads.get()
+    if loads is None:
+        return await load()
+    return await loads.get(key, load)
+
+
+def upload_identity(upload: Any) -> Hashable:
+    """What makes two attachments the same data: the spooled file they read, else the object itself"""
+    return getattr(upload, "path", None) or id(upload)
+
+
+async def answer_questions(data: Any, questions: List[str],
+                           planner: Callable[[Plan, str], Step],
+                           deadline: Optional[Deadline] = None) -> List[Any]:
+    """
+    Plan every question, then run each distinct step as its own worker task.
+
+    All steps share one ``Plan``, so common work (the correlation matrix, a
+    filtered subset) is done once. Steps run side by side, so an expensive
+    one cannot starve the cheap ones; anything unfinished when the budget
+    runs out gets a placeholder.
+    """
+    plan = Plan(data)
+    steps = []
+    with span("plan", questions=len(questions)):
+        for question in questions:
+            try:
+                steps.append(planner(plan, question))
+            except Exception as e:
+                logger.error(f"Error analyzing question '{question}': {e}")
+                steps.append(answer(f"Error: {str(e)}"))
+    distinct = list(dict.fromkeys(steps))
+
+    async def solve(step: Step) -> Any:
+        if step.known:
+            return step.run(plan)
+        try:
+            return await cpu_pool.run(step.run, plan, timeout=remaining(deadline))
+        except (asyncio.TimeoutError, PoolSaturated):
+            logger.warning(f"No answer in time for {step.fn.__name__}{step.args}")
+            return TIMEOUT_PLACEHOLDER
+        except Exception as e:
+            logger.error(f"Error analyzing {step.fn.__name__}{step.args}: {e}")
+            return f"Error: {str(e)}"
+
+    async def run_one(step: Step) -> Any:
+        value = await solve(step)
+        # Background jobs show each answer as soon as it is ready
+        for i, other in enumerate(steps):
+            if other == step:
+                report_progress(i, value)
+        return value
+
+    results = dict(zip(distinct, await asyncio.gather(*(run_one(step) for step in distinct))))
+    logger.info(f"Answered {len(questions)} questions with {len(distinct)} distinct steps "
+                f"and {plan.computations} shared computations")
+    return [results[step] for step in steps]
@@ -0,0 +1,147 @@
+"""
+Per-request analysis plans
+
+All questions in a request are routed first and each is turned into a
+``Step``: a step function plus hashable arguments. Identical steps are
+deduplicated, so two questions needing the same count run it once. Every
+step runs against one shared ``Plan``, which memoises the intermediate
+work steps have in common: the numeric column list, a single correlation
+matrix over every column any step asked about, and the filtered subsets
+and argmins that filters produce. CPU per request then grows with the
+number of distinct computations, not with the number of questions.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from analyst.metrics import span
+
+
+@dataclass(frozen=True)
+class Step:
+    """One distinct computation: ``fn(plan, *args)``"""
+    fn: Callable[..., Any]
+    args: Tuple = ()
+
+    def run(self, plan: "Plan") -> Any:
+        with span("analysis", step=self.fn.__name__):
+            return self.fn(plan, *self.args)
+
+    @property
+    def known(self) -> bool:
+        """True when the result was fixed at planning time and needs no worker"""
+        return self.fn is _constant
+
+
+def _constant(plan: "Plan", value: Any) -> Any:
+    return value
+
+
+def answer(value: Any) -> Step:
+    """A step whose result is already known at planning time"""
+    return Step(_constant, (value,))
+
+
+@dataclass(frozen=True)
+class Filter:
+    """Row filter extracted from a question (inclusive year bounds, money threshold)"""
+    year_column: Optional[str] = None
+    year_range: Optional[Tuple[Optional[int], Optional[int]]] = None
+    money_column: Optional[str] = None
+    threshold: Optional[Tuple[str, float]] = None
+
+
+class Plan:
+    """Memoised computations shared by the steps of one request"""
+
+    def __init__(self, data: Any):
+        self.data = data
+        self.corr_columns: Set[str] = set()
+        self.computations = 0
+        self._memo: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # With a process pool each step gets a copy of the plan: the data, the
+        # declared correlation columns and whatever was memoised before it was
+        # sent. Locks cannot be pickled and are only needed within one process.
+        state = self.__dict__.copy()
+        del state["_lock"], state["_key_locks"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def shared(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return ``compute()`` for ``key``, computing it at most once across worker threads"""
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._memo:
+                    return self._memo[key]
+            value = compute()
+            with self._lock:
+                self._memo[key] = value
+                self.computations += 1
+        return value
+
+    # -- planning ----------------------------------------------------------
+
+    def want_correlation(self, x: str, y: str) -> None:
+        """Declare a correlation pair so one matrix can cover every pair asked for"""
+        self.corr_columns.update((x, y))
+
+    # -- shared computations ----------------------------------------------
+
+    def numeric_columns(self) -> List[str]:
+        return self.shared("numeric", lambda: self.data.select_dtypes(include="number").columns.tolist())
+
+    def corr(self, x: str, y: str) -> float:
+        columns = sorted(self.corr_columns)
+        if x in columns and y in columns:
+            matrix = self.shared(("corr", tuple(columns)), lambda: self.data[columns].corr())
+            return matrix.loc[x, y]
+        return self.shared(("corr", x, y), lambda: self.data[x].corr(self.data[y]))
+
+    def mask(self, flt: Filter):
+        """Boolean row mask for ``flt`` (``None`` when it filters nothing)"""
+        def compute():
+            mask = None
+            if flt.year_range is not None:
+                years = self.data[flt.year_column]
+                low, high = flt.year_range
+                mask = years.between(low if low is not None else years.min(),
+                                     high if high is not None else years.max())
+            if flt.threshold is not None:
+                op, amount = flt.threshold
+                values = self.data[flt.money_column]
+                keep = {">": values.gt, ">=": values.ge, "<": values.lt, "<=": values.le}[op](amount)
+                mask = keep if mask is None else mask & keep
+            return mask
+
+        return self.shared(("mask", flt), compute)
+
+    def rows(self, flt: Filter):
+        mask = self.mask(flt)
+        if mask is None:
+            return self.data
+        return self.shared(("rows", flt), lambda: self.data[mask])
+
+    def count(self, flt: Filter) -> int:
+        mask = self.mask(flt)
+        return len(self.data) if mask is None else int(mask.sum())
+
+    def argmin(self, column: str, flt: Filter) -> Optional[Hashable]:
+        """Index label of the smallest ``column`` value among the filtered rows"""
+        def compute():
+            values = self.rows(flt)[column]
+            return None if values.isna().all() else values.idxmin()
+
+        return self.shared(("argmin", column, flt), compute)
@@ -0,0 +1,242 @@
+"""
+Format detection and fast readers for uploaded data files
+
+The format of an upload is taken from its content, not its name: magic
+bytes identify Parquet, xlsx (a zip holding ``xl/``) and legacy xls; text
+is JSON when it opens with ``[`` or ``{`` (JSON Lines when several lines
+each hold an object) and delimited text otherwise, with the delimiter
+sniffed from the first lines (``,``, tab, ``;`` or ``|``). Images and other
+binary files are recognised as not being data. The file extension is only
+consulted when the content is inconclusive.
+
+Each format is then read by the fastest engine installed:
+
+- CSV: Arrow's multi-threaded parser (``pyarrow.csv``), else the pandas
+  C parser;
+- JSON Lines: ``pyarrow.json`` (multi-threaded), else orjson per line,
+  else ``pd.read_json``;
+- JSON arrays of records: orjson, else ``pd.read_json``;
+- xlsx / xls: the native calamine engine (``python-calamine``), else
+  pandas' default (openpyxl / xlrd);
+- Parquet: ``pd.read_parquet``.
+
+Readers take an optional column list so that only the columns the
+questions refer to are parsed; ``header`` returns the column names without
+reading any rows, so the projection can be decided first.
+"""
+
+import csv
+import importlib.util
+import json
+import logging
+import os
+import zipfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import IO, List, Optional, Sequence
+
+from analyst.metrics import span
+
+logger = logging.getLogger(__name__)
+
+HEAD_BYTES = 64 * 1024
+DELIMITERS = ",\t;|"
+
+DATA_MAGIC = ((b"PAR1", "parquet"), (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "excel"))
+# Attachments that are certainly not tables (images, PDFs, archives of other kinds)
+OTHER_MAGIC = (b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"%PDF", b"RIFF", b"\x1f\x8b", b"BM")
+
+
+@dataclass(frozen=True)
+class Sniffed:
+    """What a file's content says it is"""
+    fmt: str
+    delimiter: str = ","
+
+
+@lru_cache(maxsize=None)
+def available(module: str) -> bool:
+    """True when ``module`` can be imported (checked once, without importing it)"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def file_format(filename: Optional[str]) -> Optional[str]:
+    """Map a file name to one of csv/jsonl/json/parquet/excel"""
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    return {
+        "csv": "csv", "tsv": "csv", "txt": "csv",
+        "jsonl": "jsonl", "ndjson": "jsonl",
+        "json": "json",
+        "parquet": "parquet", "pq": "parquet",
+        "xlsx": "excel", "xls": "excel",
+    }.get(extension)
+
+
+def _text_format(head: bytes) -> Optional[Sniffed]:
+    if b"\x00" in head:
+        return None
+    text = head.decode("utf-8", errors="replace").lstrip("﻿ \t\r\n")
+    if not text:
+        return None
+    if text[0] in "[{":
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if text[0] == "{" and len(lines) > 1 and lines[1].startswith("{"):
+            return Sniffed("jsonl")
+        return Sniffed("json")
+    # The last line of the head may be cut short; sniff whole lines only
+    sample = "\n".join(text.splitlines()[:50])
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        delimiter = "\t" if sample.count("\t") > sample.count(",") else ","
+    return Sniffed("csv", delimiter)
+
+
+def sniff(file: IO[bytes], filename: Optional[str] = None) -> Optional[Sniffed]:
+    """
+    Detect the data format of a seekable binary file; None if it is not data.
+
+    The file position is restored afterwards.
+    """
+    position = file.tell()
+    try:
+        file.seek(0)
+        head = file.read(HEAD_BYTES)
+        for magic, fmt in DATA_MAGIC:
+            if head.startswith(magic):
+                return Sniffed(fmt)
+        if head.startswith(b"PK\x03\x04"):
+            file.seek(0)
+            try:
+                names = zipfile.ZipFile(file).namelist()
+            except zipfile.BadZipFile:
+                names = []
+            return Sniffed("excel") if any(n.startswith("xl/") for n in names) else None
+        if head.startswith(OTHER_MAGIC):
+            return None
+        sniffed = _text_format(head)
+    finally:
+        file.seek(position)
+    if sniffed is None:
+        fmt = file_format(filename)
+        return Sniffed(fmt) if fmt is not None else None
+    if sniffed.fmt == "json" and file_format(filename) == "jsonl":
+        # A single line holding one object is valid as either; the name settles it
+        return Sniffed("jsonl")
+    return sniffed
+
+
+def sniff_path(path: str, filename: Optional[str] = None) -> Optional[Sniffed]:
+    with open(path, "rb") as f:
+        return sniff(f, filename or path)
+
+
+def sniff_upload(upload) -> Optional[Sniffed]:
+    """Detect the format of an UploadFile (or anything with ``filename`` and a binary ``file``)"""
+    return sniff(upload.file, upload.filename)
+
+
+def header(path: str, sniffed: Sniffed) -> Optional[List[str]]:
+    """Column names of the file, read without parsing rows; None when that is not cheap"""
+    if sniffed.fmt == "csv":
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            return next(csv.reader(f, delimiter=sniffed.delimiter), [])
+    if sniffed.fmt == "jsonl":
+        with open(path, "rb") as f:
+            first = f.readline()
+        try:
+            record = json.loads(first)
+        except ValueError:
+            return None
+        return [str(k) for k in record] if isinstance(record, dict) else None
+    if sniffed.fmt == "parquet" and available("pyarrow"):
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return None
+
+
+def _read_csv(path: str, delimiter: str, columns: Optional[Sequence[str]]):
+    import pandas as pd
+
+    if available("pyarrow"):
+        from pyarrow import csv as pacsv
+
+        table = pacsv.read_csv(
+            path,
+            read_options=pacsv.ReadOptions(use_threads=True),
+            parse_options=pacsv.ParseOptions(delimiter=delimiter),
+            convert_options=pacsv.ConvertOptions(include_columns=list(columns) if columns else None),
+        )
+        return table.to_pandas()
+    return pd.read_csv(path, sep=delimiter, usecols=list(columns) if columns else None, memory_map=True)
+
+
+def _read_jsonl(path: str, columns: Optional[Sequence[str]]):
+    import pandas as pd
+
+    if available("pyarrow"):
+        from pyarrow import json as pajson
+
+        table = pajson.read_json(path, read_options=pajson.ReadOptions(use_threads=True))
+        if columns:
+            table = table.select(list(columns))
+        return table.to_pandas()
+    if available("orjson"):
+        import orjson
+
+        with open(path, "rb") as f:
+            records = [orjson.loads(line) for line in f if line.strip()]
+        return pd.DataFrame.from_records(records, columns=list(columns) if columns else None)
+    df = pd.read_json(path, lines=True)
+    return df[list(columns)] if columns else df
+
+
+def _read_json(path: str, columns: Optional[Sequence[str]]):
+    import pandas as pd
+
+    if available("orjson"):
+        import orjson
+
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+        if isinstance(data, list):
+            return pd.DataFrame.from_records(data, columns=list(columns) if columns else None)
+    # Column-oriented objects and anything unusual keep pandas' interpretation
+    df = pd.read_json(path)
+    return df[list(columns)] if columns else df
+
+
+def _read_excel(path: str, columns: Optional[Sequence[str]]):
+    import pandas as pd
+
+    engine = "calamine" if available("python_calamine") else None
+    return pd.read_excel(path, engine=engine, usecols=list(columns) if columns else None)
+
+
+def read_frame(path: str, sniffed: Sniffed, columns: Optional[Sequence[str]] = None):
+    """Read a whole file with the fastest available engine, keeping only ``columns`` if given"""
+    import pandas as pd
+
+    with span("ingest", format=sniffed.fmt, bytes=os.path.getsize(path), columns=len(columns or ())) as attrs:
+        if sniffed.fmt == "csv":
+            df = _read_csv(path, sniffed.delimiter, columns)
+        elif sniffed.fmt == "jsonl":
+            df = _read_jsonl(path, columns)
+        elif sniffed.fmt == "json":
+            df = _read_json(path, columns)
+        elif sniffed.fmt == "excel":
+            df = _read_excel(path, columns)
+        elif sniffed.fmt == "parquet":
+            df = pd.read_parquet(path, columns=list(columns) if columns else None)
+        else:
+            raise ValueError(f"Unsupported data file format: {sniffed.fmt}")
+        if columns and list(df.columns) != list(columns):
+            # Some engines return projected columns in file order
+            df = df[list(columns)]
+        attrs["rows"] = len(df)
+    return df
+
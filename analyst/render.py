@@ -0,0 +1,206 @@
+"""
+Scatterplot rendering with size-targeted encoding
+
+Plots are drawn on the object-oriented Agg canvas (no pyplot global state,
+so workers can render concurrently) using a per-thread figure template that
+is cleared and reused between calls. Very large inputs are downsampled for
+drawing while the regression line is still fitted on every point.
+
+The canvas is rasterised once; the encoder then works from that pixel
+buffer, trying full-colour PNG, a 256-colour palette PNG and (when allowed)
+WebP, and finally downscaling by a factor predicted from the last encoded
+size, so a byte limit is usually met in two or three encode passes.
+"""
+
+import base64
+import io
+import logging
+import math
+import threading
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image, features
+
+from analyst.metrics import PLOT_BYTES, span
+from analyst.serialize import EncodedImage
+from analyst.stats import Bivariate
+
+logger = logging.getLogger(__name__)
+
+FIGSIZE = (8, 5)
+DPI = 80
+MAX_POINTS = 5000
+DEFAULT_MAX_BYTES = 100_000
+MIN_SCALE = 0.25
+
+_local = threading.local()
+
+
+class _Template:
+    """A figure whose artists are created once and re-pointed at new data"""
+
+    def __init__(self):
+        self.figure = Figure(figsize=FIGSIZE, dpi=DPI)
+        FigureCanvasAgg(self.figure)
+        # Fixed margins instead of tight_layout(), which costs an extra layout pass per render
+        self.figure.subplots_adjust(left=0.1, right=0.97, bottom=0.11, top=0.93)
+        self.axes = self.figure.add_subplot(111)
+        self.points = self.axes.scatter([], [], alpha=0.6, s=20)
+        (self.line,) = self.axes.plot([], [], "r--", alpha=0.8, linewidth=2)
+        self.axes.grid(True, alpha=0.3)
+
+
+def _template() -> _Template:
+    """Return this thread's reusable figure template"""
+    if getattr(_local, "template", None) is None:
+        _local.template = _Template()
+    return _local.template
+
+
+def _limits(values: np.ndarray) -> Tuple[float, float]:
+    lo, hi = float(values.min()), float(values.max())
+    pad = (hi - lo) * 0.05 or max(abs(lo) * 0.05, 0.5)
+    return lo - pad, hi + pad
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int = MAX_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+    """Deterministically thin a point cloud to at most ``max_points`` points"""
+    if len(x) <= max_points:
+        return x, y
+    idx = np.random.default_rng(0).choice(len(x), size=max_points, replace=False)
+    idx.sort()
+    return x[idx], y[idx]
+
+
+def fit_line(x: np.ndarray, y: np.ndarray) -> Tuple[float, float]:
+    """Least-squares slope and intercept"""
+    slope, intercept = Bivariate().update(x, y).regression()
+    if not np.isfinite(slope):
+        raise ValueError("Cannot fit a regression line to a constant x")
+    return slope, intercept
+
+
+def draw_scatterplot(x: Sequence[float], y: Sequence[float], x_label: str, y_label: str,
+                     title: Optional[str] = None, regression: bool = True,
+                     dpi: int = DPI, line: Optional[Tuple[float, float]] = None) -> Image.Image:
+    """
+    Draw a scatterplot (with a dotted red regression line) and return its pixels.
+
+    ``line`` is a precomputed ``(slope, intercept)``, used when ``x``/``y``
+    are only a sample of the data the line was fitted on.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = x[mask], y[mask]
+    if len(x) == 0:
+        raise ValueError("No finite points to plot")
+
+    template = _template()
+    fig, ax = template.figure, template.axes
+    fig.set_dpi(dpi)
+
+    px, py = downsample(x, y)
+    template.points.set_offsets(np.column_stack([px, py]))
+    if regression and len(x) >= 2 and x.min() != x.max():
+        slope, intercept = line if line is not None else fit_line(x, y)
+        xs = np.array([x.min(), x.max()])
+        template.line.set_data(xs, slope * xs + intercept)
+        template.line.set_visible(True)
+    else:
+        template.line.set_visible(False)
+    ax.set_xlim(*_limits(x))
+    ax.set_ylim(*_limits(y))
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.set_title(title if title is not None else f"{y_label} vs {x_label}")
+
+    canvas = fig.canvas
+    canvas.draw()
+    return Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1).convert("RGB")
+
+
+def _encode(image: Image.Image, fmt: str, palette: bool = False) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "png":
+        img = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE) if palette else image
+        img.save(buf, format="PNG", compress_level=6)
+    else:
+        image.save(buf, format="WEBP", quality=80, method=4)
+    return buf.getvalue()
+
+
+def _raw_budget(max_bytes: int, fmt: str) -> int:
+    """Largest image size whose data URI stays within ``max_bytes``"""
+    prefix = len(f"data:image/{fmt};base64,")
+    return (max_bytes - prefix) // 4 * 3
+
+
+def encode_image(image: Image.Image, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                 formats: Sequence[str] = ("png",)) -> Tuple[str, bytes]:
+    """
+    Encode ``image`` so its data URI fits in ``max_bytes``.
+
+    Returns ``(format, data)``. Cheaper-to-decode options are tried first;
+    if none fits, the image is shrunk by a factor predicted from the
+    smallest encoding so far and re-encoded.
+    """
+    formats = [f for f in formats if f != "webp" or features.check("webp")] or ["png"]
+    attempts = [(f, False) for f in formats]
+    if "png" in formats:
+        attempts.insert(formats.index("png") + 1, ("png", True))
+
+    best: Optional[Tuple[str, bool, bytes]] = None
+    for fmt, palette in attempts:
+        data = _encode(image, fmt, palette)
+        if max_bytes is None or len(data) <= _raw_budget(max_bytes, fmt):
+            return fmt, data
+        if best is None or len(data) / _raw_budget(max_bytes, fmt) < len(best[2]) / _raw_budget(max_bytes, best[0]):
+            best = (fmt, palette, data)
+
+    fmt, palette, data = best
+    scale = 1.0
+    while True:
+        # Encoded size scales roughly with pixel area
+        scale *= math.sqrt(_raw_budget(max_bytes, fmt) / len(data)) * 0.95
+        if scale < MIN_SCALE:
+            raise ValueError(f"Could not encode plot under {max_bytes} bytes")
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        data = _encode(image.resize(size, Image.Resampling.LANCZOS), fmt, palette)
+        if len(data) <= _raw_budget(max_bytes, fmt):
+            return fmt, data
+
+
+def to_data_uri(fmt: str, data: bytes) -> str:
+    return f"data:image/{fmt};base64,{base64.b64encode(data).decode()}"
+
+
+def scatterplot_image(x: Sequence[float], y: Sequence[float], x_label: str, y_label: str,
+                      title: Optional[str] = None, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                      formats: Sequence[str] = ("png",), dpi: int = DPI,
+                      line: Optional[Tuple[float, float]] = None) -> EncodedImage:
+    """
+    Render a scatterplot with regression line whose data URI fits in ``max_bytes``.
+
+    The image stays binary; it becomes a base64 data URI when the response
+    is serialized.
+    """
+    with span("plot") as attrs:
+        image = draw_scatterplot(x, y, x_label, y_label, title=title, dpi=dpi, line=line)
+        fmt, data = encode_image(image, max_bytes=max_bytes, formats=formats)
+        attrs.update(format=fmt, bytes=len(data))
+    PLOT_BYTES.observe(len(data))
+    logger.info(f"Encoded {x_label}/{y_label} plot as {fmt} ({len(data)} bytes)")
+    return EncodedImage(fmt, data)
+
+
+def scatterplot_uri(x: Sequence[float], y: Sequence[float], x_label: str, y_label: str,
+                    title: Optional[str] = None, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+                    formats: Sequence[str] = ("png",), dpi: int = DPI,
+                    line: Optional[Tuple[float, float]] = None) -> str:
+    """Render a scatterplot with regression line as a base64 data URI under ``max_bytes``"""
+    return scatterplot_image(x, y, x_label, y_label, title=title, max_bytes=max_bytes,
+                             formats=formats, dpi=dpi, line=line).uri
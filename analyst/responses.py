@@ -0,0 +1,277 @@
+"""
+Content-addressed cache of whole API responses
+
+Identical requests (same questions text, same attachment bytes, same
+pipeline version) to the same app get the same response, so the rendered
+body is stored under a hash of exactly those inputs plus the app's
+namespace. The two apps answer in different shapes (a list, a dict keyed by
+question), so they must never share an entry even when they share a disk
+directory or a Redis server. Backends are pluggable: an
+in-process LRU bounded by bytes, a directory on local disk, or any
+Redis-compatible server (anything with ``get``/``set(..., ex=)`` will do).
+Concurrent identical requests are coalesced so only the first one runs the
+pipeline; the rest wait for its result.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from analyst.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a change would alter the answers produced for the same input
+PIPELINE_VERSION = "2026.10.4"
+
+BACKEND = os.getenv("RESPONSE_CACHE", "memory")
+CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "analyst-response-cache"))
+MAX_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+HASH_BLOCK = 1024 * 1024
+
+HIT, MISS, COALESCED, BYPASS = "HIT", "MISS", "COALESCED", "BYPASS"
+
+
+class MemoryBackend:
+    """In-process LRU bounded by the total size of stored bodies"""
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+class DiskBackend:
+    """One file per response in a directory, oldest files trimmed past a byte cap"""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            # The mtime doubles as the expiry time
+            expires = time.time() + ttl
+            os.utime(tmp, (expires, expires))
+            os.replace(tmp, self._path(key))
+            self._trim()
+        except OSError as e:
+            logger.warning(f"Could not persist cached response {key[:12]}: {e}")
+
+    def _trim(self) -> None:
+        files = []
+        for name in os.listdir(self.directory):
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        return {"entries": len(names), "directory": self.directory}
+
+
+class RedisBackend:
+    """Any server speaking the Redis protocol; ``client`` may be any object with get/set"""
+
+    def __init__(self, url: str = CACHE_URL, client: Any = None, prefix: str = "analyst:response:"):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed: {e!r}")
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+        except Exception as e:
+            logger.warning(f"Response cache write failed: {e!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"server": type(self.client).__module__}
+
+
+def make_backend(kind: str = BACKEND):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "disk":
+        return DiskBackend()
+    if kind == "redis":
+        return RedisBackend()
+    if kind in ("off", "none", ""):
+        return None
+    raise ValueError(f"Unknown RESPONSE_CACHE backend: {kind}")
+
+
+async def hash_upload(digest: "hashlib._Hash", upload) -> None:
+    """Feed an UploadFile's bytes into ``digest`` without loading it whole"""
+    def feed() -> None:
+        upload.file.seek(0)
+        for block in iter(lambda: upload.file.read(HASH_BLOCK), b""):
+            digest.update(block)
+        upload.file.seek(0)
+
+    await asyncio.get_running_loop().run_in_executor(None, feed)
+
+
+async def upload_digest(upload) -> bytes:
+    """SHA-256 of an upload's bytes"""
+    part = hashlib.sha256()
+    await hash_upload(part, upload)
+    return part.digest()
+
+
+def digest_key(questions: bytes, uploads: Sequence[Tuple[str, Optional[str], bytes]],
+               version: str = PIPELINE_VERSION, namespace: str = "api") -> str:
+    """``request_key`` from attachment digests already computed, as ``(field, filename, digest)``"""
+    digest = hashlib.sha256()
+    digest.update(f"v={version}\0ns={namespace}\0".encode())
+    digest.update(hashlib.sha256(questions).digest())
+    for field, filename, part in uploads:
+        digest.update(f"\0{field}\0{filename or ''}\0".encode())
+        digest.update(part)
+    return digest.hexdigest()
+
+
+async def request_key(questions: bytes, uploads: Sequence[Tuple[str, Any]],
+                      version: str = PIPELINE_VERSION, namespace: str = "api") -> str:
+    """
+    Hash of the pipeline version, the app's ``namespace``, the questions text
+    and every attachment (name, file name, bytes)
+    """
+    digests = [(field, upload.filename, await upload_digest(upload)) for field, upload in uploads if upload is not None]
+    return digest_key(questions, digests, version, namespace)
+
+
+class ResponseCache:
+    """Response bodies by request key, with single-flight computation"""
+
+    def __init__(self, backend=None, ttl: float = TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: Dict[str, "asyncio.Future[bytes]"] = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "stored": 0}
+
+    async def get_or_compute(self, key: str,
+                             compute: Callable[[], Awaitable[Tuple[bytes, bool]]]) -> Tuple[bytes, str]:
+        """
+        Return ``(body, status)``. ``compute`` returns ``(body, cacheable)``;
+        partial answers (e.g. after a timeout) should not be stored.
+        """
+        if self.backend is None:
+            body, _ = await compute()
+            return body, BYPASS
+
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(None, self.backend.get, key)
+        if body is not None:
+            self.counters["hits"] += 1
+            return body, HIT
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(pending), COALESCED
+
+        self.counters["misses"] += 1
+        task = asyncio.ensure_future(self._compute_and_store(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so that one caller disconnecting does not cancel the others' result
+        return await asyncio.shield(task), MISS
+
+    async def _compute_and_store(self, key: str, compute) -> bytes:
+        body, cacheable = await compute()
+        if cacheable:
+            await asyncio.get_running_loop().run_in_executor(None, self.backend.set, key, body, self.ttl)
+            self.counters["stored"] += 1
+        return body
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.counters, backend=type(self.backend).__name__ if self.backend else None)
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+
+response_cache = ResponseCache(make_backend())
+register_collector("response_cache", response_cache.stats)
@@ -0,0 +1,125 @@
+"""
+Concurrent scraping of every page a task links to
+
+A task description may reference several pages, and the table the
+questions are about is not always the first one on its page. All URLs in
+the task are fetched concurrently through the page cache; each page is then
+parsed on the worker pool (pages in parallel), where every candidate table
+is scored against the words of the questions and the best one is cleaned.
+The page cache keeps the candidates' header rows and each cleaned table by
+its index on the page, so later questions about the page pick their table
+from the cached headers, however they are worded, and only a table no
+earlier question chose is parsed again.
+The result keeps each page's winner keyed by URL; ``best()`` is what the
+analysis runs on: the top-scoring table, concatenated with the tables from
+other pages that have exactly the same columns (a list split over pages).
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AbstractSet, Dict, List, Optional, Tuple, Union
+
+from analyst.cache import PageCache, page_cache
+from analyst.deadline import Deadline
+from analyst.executor import PoolSaturated, cpu_pool
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+URL = re.compile(r"https://[^\s<>\"'`]+")
+TRAILING = ".,;:!?)]}"
+
+
+def extract_urls(text: str) -> List[str]:
+    """Every distinct https:// URL in ``text``, in order, without trailing punctuation"""
+    urls: List[str] = []
+    for match in URL.finditer(text):
+        url = match.group(0).rstrip(TRAILING)
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+def parse_table(html: Union[str, bytes], url: str, keywords: AbstractSet[str],
+                index: Optional[int] = None) -> Tuple[List[List[str]], int, "pd.DataFrame"]:
+    """
+    Parse and clean the table at ``index`` of a page, or the best match for
+    ``keywords`` (runs on the worker pool).
+
+    Returns the header rows of every candidate table too, see ``read_candidates``.
+    """
+    from analyst.clean import clean_data
+    from analyst.tables import read_candidates
+
+    headers, index, df = read_candidates(html, keywords, index)
+    return headers, index, clean_data(df, source=url)
+
+
+@dataclass
+class ScrapedTables:
+    """The best-scoring table of each page, keyed by URL in task order"""
+    frames: Dict[str, "pd.DataFrame"] = field(default_factory=dict)
+    scores: Dict[str, int] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def best(self) -> "pd.DataFrame":
+        """The top table, merged with same-shaped tables from the other pages"""
+        import pandas as pd
+
+        if not self.frames:
+            raise ValueError("No tables could be scraped")
+        top = max(self.frames, key=lambda url: self.scores[url])
+        columns = list(self.frames[top].columns)
+        same = [df for df in self.frames.values() if list(df.columns) == columns]
+        if len(same) == 1:
+            return self.frames[top]
+        return pd.concat(same, ignore_index=True)
+
+
+async def load_table(url: str, keywords: AbstractSet[str], deadline: Optional[Deadline] = None,
+                     pages: PageCache = page_cache) -> Tuple[int, "pd.DataFrame"]:
+    """Fetch ``url`` and return ``(score, table)`` for its best table, reusing cached pages and tables"""
+    from analyst.tables import best_header, header_score
+
+    page = await pages.get_page(url, timeout=None if deadline is None else deadline.remaining())
+    index = None
+    if page.headers is not None:
+        index, score = best_header(page.headers, keywords)
+        df = pages.get_frame(page, f"table-{index}")
+        if df is not None:
+            return score, df
+    if deadline is not None:
+        deadline.check("table parsing")
+    headers, index, df = await cpu_pool.run(parse_table, page.content, url, keywords, index,
+                                            timeout=None if deadline is None else deadline.remaining())
+    await pages.put_frame(page, df, f"table-{index}", headers=headers)
+    return header_score(headers[index], keywords), df
+
+
+async def scrape_tables(urls: List[str], keywords: AbstractSet[str], deadline: Optional[Deadline] = None,
+                        pages: PageCache = page_cache) -> ScrapedTables:
+    """
+    Load the best table of every URL concurrently.
+
+    A page that fails is recorded in ``errors`` and skipped; if every page
+    fails the first error is raised. Running out of time or workers is
+    always raised.
+    """
+    results = await asyncio.gather(*(load_table(url, keywords, deadline, pages) for url in urls),
+                                   return_exceptions=True)
+    scraped = ScrapedTables()
+    for url, result in zip(urls, results):
+        if isinstance(result, (asyncio.TimeoutError, PoolSaturated)):
+            raise result
+        if isinstance(result, BaseException):
+            logger.warning(f"Could not scrape a table from {url}: {result!r}")
+            scraped.errors[url] = str(result)
+            continue
+        scraped.scores[url], scraped.frames[url] = result
+    if not scraped.frames and urls:
+        raise next(r for r in results if isinstance(r, BaseException))
+    return scraped
@@ -0,0 +1,230 @@
+"""
+Response serialization
+
+Answers are encoded with orjson when it is installed: it writes UTF-8
+bytes directly and understands numpy scalars and arrays, so a ``corr()``
+result or an ``np.int64`` count needs no conversion. Anything orjson does
+not know (pandas timestamps, ``pd.NA``) goes through ``_default``. Without
+orjson the stdlib encoder is used on a converted copy. Either way NaN and
+±inf become ``null``: they are not valid JSON, and the stdlib encoder
+would otherwise emit ``NaN`` or refuse the response outright.
+
+Plots travel as ``EncodedImage`` (format + raw image bytes) rather than as
+a ready-made data URI string. The encoder leaves a marker in their place
+and splices ``"data:image/...;base64,<bytes>"`` into the output as a
+separate chunk, so the base64 text is produced once, as bytes, instead of
+being decoded to ``str``, concatenated, re-escaped and re-encoded.
+
+``respond`` turns a body into a response: compressed with brotli or gzip
+when the client accepts it (``RESPONSE_COMPRESSION``, brotli only when the
+``brotli`` package is installed) and streamed in chunks once it is larger
+than ``RESPONSE_STREAM_BYTES``.
+"""
+
+import base64
+import json
+import math
+import os
+import re
+import sys
+import uuid
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION = [e.strip() for e in os.getenv("RESPONSE_COMPRESSION", "br,gzip").split(",") if e.strip()]
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STREAM_BYTES = int(os.getenv("RESPONSE_STREAM_BYTES", str(64 * 1024)))
+STREAM_CHUNK = 64 * 1024
+
+
+class EncodedImage:
+    """An encoded plot; serialized as a base64 data URI"""
+    __slots__ = ("fmt", "data")
+
+    def __init__(self, fmt: str, data: bytes):
+        self.fmt = fmt
+        self.data = data
+
+    def chunk(self) -> bytes:
+        """The data URI as a JSON string literal (base64 needs no escaping)"""
+        return b'"data:image/' + self.fmt.encode() + b';base64,' + base64.b64encode(self.data) + b'"'
+
+    @property
+    def uri(self) -> str:
+        return f"data:image/{self.fmt};base64,{base64.b64encode(self.data).decode()}"
+
+    def __str__(self) -> str:
+        return self.uri
+
+    def __repr__(self) -> str:
+        return f"EncodedImage({self.fmt!r}, {len(self.data)} bytes)"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, EncodedImage):
+            return NotImplemented
+        return (self.fmt, self.data) == (other.fmt, other.data)
+
+    def __hash__(self) -> int:
+        return hash((self.fmt, self.data))
+
+
+def _finite(value: float) -> Optional[float]:
+    return value if math.isfinite(value) else None
+
+
+def _default(obj: Any) -> Any:
+    """Values orjson cannot encode itself"""
+    if isinstance(obj, EncodedImage):
+        return obj.uri
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and (obj is pandas.NA or obj is pandas.NaT):
+        return None
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _plain(obj: Any) -> Any:
+    """Copy of ``obj`` the stdlib encoder accepts, with non-finite floats as None"""
+    if isinstance(obj, float):
+        return _finite(obj)
+    if obj is None or isinstance(obj, (str, int, bool)):
+        return obj
+    if isinstance(obj, dict):
+        return {str(k): _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    return _plain(_default(obj))
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_plain(obj), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _swap_images(obj: Any, token: str, images: List[EncodedImage]) -> Any:
+    """Replace every ``EncodedImage`` in lists/tuples/dict values with a marker string"""
+    if isinstance(obj, EncodedImage):
+        images.append(obj)
+        return f"{token}{len(images) - 1}"
+    if isinstance(obj, dict):
+        return {k: _swap_images(v, token, images) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_swap_images(v, token, images) for v in obj]
+    return obj
+
+
+def encode_chunks(obj: Any) -> List[bytes]:
+    """Serialize ``obj`` as a list of byte chunks whose concatenation is the JSON document"""
+    images: List[EncodedImage] = []
+    token = "\x01img-" + uuid.uuid4().hex + "-"
+    skeleton = _dumps(_swap_images(obj, token, images))
+    if not images:
+        return [skeleton]
+    # Markers are JSON strings, so they appear quoted; \x01 is escaped as \u0001
+    marker = re.compile(b'"' + re.escape(json.dumps(token)[1:-1].encode()) + b'(\\d+)"')
+    chunks: List[bytes] = []
+    start = 0
+    for match in marker.finditer(skeleton):
+        chunks.append(skeleton[start:match.start()])
+        chunks.append(images[int(match.group(1))].chunk())
+        start = match.end()
+    chunks.append(skeleton[start:])
+    return chunks
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize ``obj`` to JSON bytes"""
+    chunks = encode_chunks(obj)
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+
+class JSONBytesResponse(Response):
+    """``JSONResponse`` using this module's encoder"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def negotiate(accept_encoding: Optional[str], offered: List[str] = COMPRESSION) -> Optional[str]:
+    """The first of ``offered`` the client accepts (q > 0), or None"""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in offered:
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _compressor(encoding: str) -> Tuple[Any, Any]:
+    if encoding == "br":
+        c = brotli.Compressor(quality=BROTLI_QUALITY)
+        return c.process, c.finish
+    # wbits 31: gzip container
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return c.compress, c.flush
+
+
+def _pieces(body: bytes) -> Iterator[memoryview]:
+    view = memoryview(body)
+    for start in range(0, len(view), STREAM_CHUNK):
+        yield view[start:start + STREAM_CHUNK]
+
+
+def _compressed(body: bytes, encoding: str) -> Iterator[bytes]:
+    compress, finish = _compressor(encoding)
+    for piece in _pieces(body):
+        out = compress(piece)
+        if out:
+            yield out
+    yield finish()
+
+
+def respond(body: bytes, accept_encoding: Optional[str] = None, status_code: int = 200,
+            headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Send a serialized JSON body, compressed if the client allows and
+    streamed in chunks when it is large.
+    """
+    headers = dict(headers or {})
+    encoding = negotiate(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding is not None:
+        headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    if len(body) < STREAM_BYTES:
+        if encoding is not None:
+            body = b"".join(_compressed(body, encoding))
+        return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+    stream: Union[Iterator[bytes], Iterator[memoryview]] = (
+        _compressed(body, encoding) if encoding is not None else _pieces(body))
+    return StreamingResponse(stream, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,389 @@
+"""
+One-pass, mergeable statistics
+
+Accumulators here are fed chunk by chunk and can be merged, so aggregates
+over arbitrarily large inputs are computed with bounded memory and match
+what pandas would return on the fully materialised frame.
+
+``Moments`` (count/mean/variance/min/max) and ``Bivariate`` (adds
+covariance, Pearson r and the OLS slope/intercept) keep Welford-style
+state: counts, means and sums of squared deviations. Each chunk is reduced
+with a vectorised two-pass reduction and folded in with Chan et al.'s pairwise
+update, which is also how two accumulators merge, so partial results from
+worker processes combine exactly. The ``Grouped*`` variants keep the same
+state per key, updated for all groups of a chunk at once with
+``np.bincount``. Pairs with a missing or non-finite value are skipped.
+"""
+
+import warnings
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class PairwiseMoments:
+    """
+    Counts, sums and cross-products for every pair of numeric columns.
+
+    Statistics follow pandas' pairwise-complete semantics: a pair only uses
+    rows where both values are present. Values are shifted by the first
+    chunk's means before accumulating, which keeps the sums well conditioned.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.shift: Optional[np.ndarray] = None
+        self.n = np.zeros((k, k))        # rows where both i and j are present
+        self.sx = np.zeros((k, k))       # sum of x_i over those rows
+        self.sxx = np.zeros((k, k))      # sum of x_i ** 2 over those rows
+        self.sxy = np.zeros((k, k))      # sum of x_i * x_j
+        self.min = np.full(k, np.nan)
+        self.max = np.full(k, np.nan)
+
+    def update(self, frame: pd.DataFrame) -> None:
+        """Fold one chunk of rows into the accumulator"""
+        x = frame[self.columns].to_numpy(dtype="float64", na_value=np.nan)
+        if not len(x):
+            return
+        present = ~np.isnan(x)
+        if self.shift is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                self.shift = np.nan_to_num(np.nanmean(x, axis=0))
+        x0 = np.where(present, x - self.shift, 0.0)
+        mask = present.astype("float64")
+        self.n += mask.T @ mask
+        self.sx += x0.T @ mask
+        self.sxx += (x0 * x0).T @ mask
+        self.sxy += x0.T @ x0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+            self.min = np.fmin(self.min, np.nanmin(x, axis=0))
+            self.max = np.fmax(self.max, np.nanmax(x, axis=0))
+
+    def merge(self, other: "PairwiseMoments") -> "PairwiseMoments":
+        """Combine with an accumulator fed from other chunks of the same columns"""
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.__dict__.update({k: (v.copy() if isinstance(v, np.ndarray) else v)
+                                  for k, v in other.__dict__.items()})
+            return self
+        # Re-express the other side's sums around our shift
+        d = (other.shift - self.shift)[:, None]       # shift delta for column i
+        e = (other.shift - self.shift)[None, :]       # shift delta for column j
+        self.sxy += other.sxy + d * other.sx.T + e * other.sx + d * e * other.n
+        self.sxx += other.sxx + 2 * d * other.sx + d * d * other.n
+        self.sx += other.sx + d * other.n
+        self.n += other.n
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        return self
+
+    def _index(self, column: str) -> int:
+        return self.columns.index(column)
+
+    def count(self, column: str) -> int:
+        i = self._index(column)
+        return int(self.n[i, i])
+
+    def mean(self, column: str) -> float:
+        i = self._index(column)
+        if not self.n[i, i]:
+            return float("nan")
+        return float(self.sx[i, i] / self.n[i, i] + self.shift[i])
+
+    def var(self, column: str, ddof: int = 1) -> float:
+        i = self._index(column)
+        n = self.n[i, i]
+        if n <= ddof:
+            return float("nan")
+        return float((self.sxx[i, i] - self.sx[i, i] ** 2 / n) / (n - ddof))
+
+    def _centered(self, i: int, j: int):
+        n = self.n[i, j]
+        sxx = self.sxx[i, j] - self.sx[i, j] ** 2 / n
+        syy = self.sxx[j, i] - self.sx[j, i] ** 2 / n
+        sxy = self.sxy[i, j] - self.sx[i, j] * self.sx[j, i] / n
+        return n, sxx, syy, sxy
+
+    def corr(self, x: str, y: str) -> float:
+        """Pearson correlation of ``x`` and ``y`` over rows where both are present"""
+        i, j = self._index(x), self._index(y)
+        n, sxx, syy, sxy = self._centered(i, j)
+        if n < 2 or sxx <= 0 or syy <= 0:
+            return float("nan")
+        return float(np.clip(sxy / np.sqrt(sxx * syy), -1.0, 1.0))
+
+    def regression(self, x: str, y: str) -> Dict[str, float]:
+        """Least-squares fit of ``y`` on ``x``: slope and intercept"""
+        i, j = self._index(x), self._index(y)
+        n, sxx, _, sxy = self._centered(i, j)
+        if n < 2 or sxx <= 0:
+            return {"slope": float("nan"), "intercept": float("nan")}
+        slope = sxy / sxx
+        mean_x = self.sx[i, j] / n + self.shift[i]
+        mean_y = self.sx[j, i] / n + self.shift[j]
+        return {"slope": float(slope), "intercept": float(mean_y - slope * mean_x)}
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        return {c: {"count": self.count(c), "mean": self.mean(c),
+                    "min": float(self.min[i]), "max": float(self.max[i])}
+                for i, c in enumerate(self.columns)}
+
+
+class Reservoir:
+    """Uniform random sample of at most ``size`` rows from a stream of chunks"""
+
+    def __init__(self, size: int = 5000, seed: int = 0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.sample: Optional[pd.DataFrame] = None
+        self._keys = np.empty(0)
+
+    def update(self, frame: pd.DataFrame, columns: Optional[List[str]] = None) -> None:
+        if columns is not None:
+            frame = frame[columns]
+        keys = self.rng.random(len(frame))
+        if self.sample is None:
+            merged, all_keys = frame, keys
+        else:
+            merged = pd.concat([self.sample, frame], ignore_index=True)
+            all_keys = np.concatenate([self._keys, keys])
+        if len(merged) > self.size:
+            keep = np.argpartition(all_keys, self.size)[:self.size]
+            merged, all_keys = merged.iloc[keep], all_keys[keep]
+        self.sample = merged.reset_index(drop=True)
+        self._keys = all_keys
+
+
+def _combine(a: Dict[str, np.ndarray], b: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Chan et al. pairwise update of two (per-group) Welford states"""
+    na, nb = a["n"], b["n"]
+    n = na + nb
+    both = (na > 0) & (nb > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(both, nb / np.where(n > 0, n, 1), 0.0)
+        cross = np.where(both, na * nb / np.where(n > 0, n, 1), 0.0)
+    out = {"n": n, "min_x": np.fmin(a["min_x"], b["min_x"]), "max_x": np.fmax(a["max_x"], b["max_x"])}
+    deltas = {}
+    for v in ("x", "y"):
+        if f"mean_{v}" not in a:
+            continue
+        delta = deltas[v] = np.where(both, b[f"mean_{v}"] - a[f"mean_{v}"], 0.0)
+        out[f"mean_{v}"] = np.where(na > 0, a[f"mean_{v}"], b[f"mean_{v}"]) + delta * weight
+        out[f"m2_{v}"] = a[f"m2_{v}"] + b[f"m2_{v}"] + delta * delta * cross
+    if "c_xy" in a:
+        out["c_xy"] = a["c_xy"] + b["c_xy"] + deltas["x"] * deltas["y"] * cross
+    return out
+
+
+class _Accumulator:
+    """Per-group Welford state over ``x`` (and ``y`` when bivariate)"""
+    bivariate = False
+
+    def __init__(self):
+        self.keys: List[Hashable] = []
+        self._ids: Dict[Hashable, int] = {}
+        self.state = self._empty(0)
+
+    def _empty(self, groups: int) -> Dict[str, np.ndarray]:
+        state = {"n": np.zeros(groups), "mean_x": np.zeros(groups), "m2_x": np.zeros(groups),
+                 "min_x": np.full(groups, np.nan), "max_x": np.full(groups, np.nan)}
+        if self.bivariate:
+            state.update(mean_y=np.zeros(groups), m2_y=np.zeros(groups), c_xy=np.zeros(groups))
+        return state
+
+    def _group_ids(self, keys: Sequence[Hashable]) -> np.ndarray:
+        """Map keys to stable group ids, registering new keys (missing keys get -1)"""
+        codes, uniques = pd.factorize(np.asarray(keys), use_na_sentinel=True)
+        ids = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques.tolist()):
+            if key not in self._ids:
+                self._ids[key] = len(self.keys)
+                self.keys.append(key)
+            ids[i] = self._ids[key]
+        return np.where(codes >= 0, ids[codes] if len(ids) else codes, -1)
+
+    def _grow(self) -> None:
+        missing = len(self.keys) - len(self.state["n"])
+        if missing:
+            extra = self._empty(missing)
+            self.state = {k: np.concatenate([v, extra[k]]) for k, v in self.state.items()}
+
+    def _update(self, groups: np.ndarray, x, y=None) -> None:
+        x = np.asarray(x, dtype="float64")
+        valid = np.isfinite(x) & (groups >= 0)
+        if self.bivariate:
+            y = np.asarray(y, dtype="float64")
+            valid &= np.isfinite(y)
+        self._grow()
+        size = len(self.keys)
+        if not valid.any() or not size:
+            return
+        if not valid.all():
+            groups, x = groups[valid], x[valid]
+            y = y[valid] if self.bivariate else None
+
+        # Reduce the chunk per group with a two-pass (mean, then deviations) pass
+        n = np.bincount(groups, minlength=size).astype("float64")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_x = np.bincount(groups, weights=x, minlength=size) / n
+        dx = x - mean_x[groups]
+        chunk = {"n": n, "mean_x": np.nan_to_num(mean_x),
+                 "m2_x": np.bincount(groups, weights=dx * dx, minlength=size),
+                 "min_x": np.full(size, np.nan), "max_x": np.full(size, np.nan)}
+        np.fmin.at(chunk["min_x"], groups, x)
+        np.fmax.at(chunk["max_x"], groups, x)
+        if self.bivariate:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_y = np.bincount(groups, weights=y, minlength=size) / n
+            dy = y - mean_y[groups]
+            chunk.update(mean_y=np.nan_to_num(mean_y), m2_y=np.bincount(groups, weights=dy * dy, minlength=size),
+                         c_xy=np.bincount(groups, weights=dx * dy, minlength=size))
+        self.state = _combine(self.state, chunk)
+
+    def _merge(self, other: "_Accumulator") -> None:
+        ids = np.empty(len(other.keys), dtype=np.int64)
+        for i, key in enumerate(other.keys):
+            if key not in self._ids:
+                self._ids[key] = len(self.keys)
+                self.keys.append(key)
+            ids[i] = self._ids[key]
+        self._grow()
+        aligned = self._empty(len(self.keys))
+        for k, v in other.state.items():
+            aligned[k][ids] = v
+        self.state = _combine(self.state, aligned)
+
+    # -- results (arrays over groups) ----------------------------------------
+
+    def _ratio(self, num: np.ndarray, den: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+
+    def _var(self, v: str, ddof: int) -> np.ndarray:
+        return self._ratio(self.state[f"m2_{v}"], self.state["n"] - ddof)
+
+    def _means(self, v: str) -> np.ndarray:
+        return np.where(self.state["n"] > 0, self.state[f"mean_{v}"], np.nan)
+
+    def _slopes(self) -> np.ndarray:
+        return self._ratio(self.state["c_xy"], self.state["m2_x"])
+
+    def _corrs(self) -> np.ndarray:
+        r = self._ratio(self.state["c_xy"], np.sqrt(self.state["m2_x"] * self.state["m2_y"]))
+        return np.clip(r, -1.0, 1.0)
+
+
+class Moments(_Accumulator):
+    """Count, mean, variance, min and max of a stream of values"""
+
+    def __init__(self):
+        super().__init__()
+        self._ids[None] = 0
+        self.keys.append(None)
+        self._grow()
+
+    def update(self, x) -> "Moments":
+        x = np.asarray(x, dtype="float64").ravel()
+        self._update(np.zeros(len(x), dtype=np.int64), x)
+        return self
+
+    def merge(self, other: "Moments") -> "Moments":
+        self.state = _combine(self.state, other.state)
+        return self
+
+    @property
+    def count(self) -> int:
+        return int(self.state["n"][0])
+
+    @property
+    def mean(self) -> float:
+        return float(self._means("x")[0])
+
+    def var(self, ddof: int = 1) -> float:
+        return float(self._var("x", ddof)[0])
+
+    def std(self, ddof: int = 1) -> float:
+        return float(np.sqrt(self.var(ddof)))
+
+    @property
+    def min(self) -> float:
+        return float(self.state["min_x"][0])
+
+    @property
+    def max(self) -> float:
+        return float(self.state["max_x"][0])
+
+
+class Bivariate(Moments):
+    """Moments of ``x`` and ``y`` plus their covariance, Pearson r and OLS fit"""
+    bivariate = True
+
+    def update(self, x, y) -> "Bivariate":  # type: ignore[override]
+        x = np.asarray(x, dtype="float64").ravel()
+        self._update(np.zeros(len(x), dtype=np.int64), x, np.asarray(y, dtype="float64").ravel())
+        return self
+
+    @property
+    def mean_y(self) -> float:
+        return float(self._means("y")[0])
+
+    def var_y(self, ddof: int = 1) -> float:
+        return float(self._var("y", ddof)[0])
+
+    def cov(self, ddof: int = 1) -> float:
+        return float(self._ratio(self.state["c_xy"], self.state["n"] - ddof)[0])
+
+    def corr(self) -> float:
+        """Pearson correlation coefficient"""
+        return float(self._corrs()[0]) if self.count >= 2 else float("nan")
+
+    def regression(self) -> Tuple[float, float]:
+        """Least-squares ``(slope, intercept)`` of ``y`` on ``x``"""
+        slope = float(self._slopes()[0]) if self.count >= 2 else float("nan")
+        return slope, self.mean_y - slope * self.mean
+
+
+class GroupedMoments(_Accumulator):
+    """``Moments`` per group key, updated for every group of a chunk at once"""
+
+    def update(self, keys: Sequence[Hashable], x) -> "GroupedMoments":
+        self._update(self._group_ids(keys), x)
+        return self
+
+    def merge(self, other: "GroupedMoments") -> "GroupedMoments":
+        self._merge(other)
+        return self
+
+    def frame(self, ddof: int = 1) -> pd.DataFrame:
+        """One row per group: count, mean, var, min, max"""
+        present = self.state["n"] > 0
+        result: Dict[str, Any] = {"count": self.state["n"].astype("int64"), "mean": self._means("x"),
+                                  "var": self._var("x", ddof), "min": self.state["min_x"],
+                                  "max": self.state["max_x"]}
+        return pd.DataFrame(result, index=pd.Index(self.keys, name="key"))[present]
+
+
+class GroupedBivariate(GroupedMoments):
+    """``Bivariate`` per group key"""
+    bivariate = True
+
+    def update(self, keys: Sequence[Hashable], x, y) -> "GroupedBivariate":  # type: ignore[override]
+        self._update(self._group_ids(keys), x, y)
+        return self
+
+    def frame(self, ddof: int = 1) -> pd.DataFrame:
+        """One row per group: x moments, mean of y, covariance, Pearson r and the OLS fit"""
+        df = super().frame(ddof)
+        present = self.state["n"] > 0
+        slope = self._slopes()
+        df["mean_y"] = self._means("y")[present]
+        df["cov"] = self._ratio(self.state["c_xy"], self.state["n"] - ddof)[present]
+        df["corr"] = self._corrs()[present]
+        df["slope"] = slope[present]
+        df["intercept"] = (self._means("y") - slope * self._means("x"))[present]
+        return df
@@ -0,0 +1,269 @@
+"""
+Single-pass HTML table extraction
+
+The page is parsed once with lxml and the chosen ``<table>`` is walked row by
+row, writing cell text straight into per-column lists. Compared with
+BeautifulSoup -> ``str(table)`` -> ``pd.read_html`` this avoids a second full
+HTML parse and the serialised copy of the table in between.
+
+When the wanted table is not known by position, ``read_best_table`` scores
+every candidate's header row against the words of the questions and only
+expands the winner, so losing tables cost a header scan, not a conversion.
+``read_candidates`` also returns those header rows, so a table for other
+questions can be chosen later without parsing the page again.
+"""
+
+import re
+from typing import AbstractSet, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import lxml.html
+import pandas as pd
+
+from analyst.intents import keywords as words_of
+from analyst.metrics import span
+
+# Elements that only carry citations or hidden sort keys
+NOISE_XPATH = (
+    ".//sup[contains(concat(' ', normalize-space(@class), ' '), ' reference ')]"
+    " | .//span[contains(translate(@style, ' ', ''), 'display:none')]"
+    " | .//style | .//script"
+)
+FOOTNOTE_RE = re.compile(r"\[(?:\d+|[a-z]|[a-z]\s?\d+|note \d+|citation needed|nb \d+)\]", re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+ROWS_XPATH = "./tr | ./thead/tr | ./tbody/tr | ./tfoot/tr"
+
+
+def _cell_text(cell) -> str:
+    text = WHITESPACE_RE.sub(" ", cell.text_content().replace("\xa0", " "))
+    return FOOTNOTE_RE.sub("", text).strip()
+
+
+def _span(cell, attr: str) -> int:
+    try:
+        return max(1, int(cell.get(attr, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _caption(table) -> str:
+    caption = table.find("caption")
+    return _cell_text(caption) if caption is not None else ""
+
+
+def _header_row(table) -> List[str]:
+    rows = table.xpath(ROWS_XPATH)
+    if not rows:
+        return []
+    return [_cell_text(cell) for cell in rows[0] if cell.tag in ("th", "td")]
+
+
+def parse_html(html: Union[str, bytes]):
+    """Parse a document once"""
+    return lxml.html.document_fromstring(html)
+
+
+def find_tables(doc, css_class: Optional[str] = "wikitable", fallback: bool = True) -> list:
+    """Return candidate table elements, preferring those with ``css_class``"""
+    tables = list(doc.iter("table"))
+    if css_class:
+        classed = [t for t in tables if css_class in (t.get("class") or "").split()]
+        if classed or not fallback:
+            return classed
+    return tables
+
+
+def select_table(tables: Sequence, index: int = 0, caption: Optional[str] = None,
+                 match: Optional[Union[str, Sequence[str]]] = None):
+    """
+    Pick a table by caption substring, header match, or position.
+
+    ``match`` may be a regex or a list of column names; with a list, the table
+    whose header row contains the most of them wins.
+    """
+    candidates = list(tables)
+    if caption:
+        needle = caption.lower()
+        candidates = [t for t in candidates if needle in _caption(t).lower()]
+    if match is not None and candidates:
+        if isinstance(match, str):
+            pattern = re.compile(match, re.IGNORECASE)
+            candidates = [t for t in candidates
+                          if pattern.search(" ".join(_header_row(t)) + " " + _caption(t))]
+        else:
+            wanted = {m.lower() for m in match}
+
+            def score(t) -> int:
+                return len(wanted & {h.lower() for h in _header_row(t)})
+
+            best = max((score(t) for t in candidates), default=0)
+            if best:
+                candidates = [t for t in candidates if score(t) == best]
+    if not candidates:
+        raise ValueError("No table matched the requested selection")
+    if index >= len(candidates):
+        raise ValueError(f"Table index {index} out of range ({len(candidates)} candidates)")
+    return candidates[index]
+
+
+def _column_names(header: List[List[Optional[str]]], width: int) -> List[str]:
+    columns: List[str] = []
+    for i in range(width):
+        parts: List[str] = []
+        for r in header:
+            part = r[i] if i < len(r) else None
+            if part and part not in parts:
+                parts.append(part)
+        columns.append(" ".join(parts) if parts else str(i))
+    # Make duplicate names unique the way pandas does
+    seen: Dict[str, int] = {}
+    for i, name in enumerate(columns):
+        if name in seen:
+            seen[name] += 1
+            columns[i] = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+    return columns
+
+
+def _expand_rows(table) -> Iterator[Tuple[bool, List[Optional[str]]]]:
+    """Yield ``(is_header, cells)`` per row with row/colspans already expanded"""
+    pending: Dict[int, Tuple[int, str]] = {}  # column -> (rows left, text)
+    for tr in table.xpath(ROWS_XPATH):
+        cells = [c for c in tr if c.tag in ("th", "td")]
+        if not cells and not pending:
+            continue
+        row: List[Optional[str]] = []
+        col = 0
+        it = iter(cells)
+        cell = next(it, None)
+        while cell is not None or any(c >= col for c in pending):
+            if col in pending:
+                left, text = pending[col]
+                row.append(text)
+                if left > 1:
+                    pending[col] = (left - 1, text)
+                else:
+                    del pending[col]
+                col += 1
+                continue
+            if cell is None:
+                # Gap before a rowspan further right
+                row.append(None)
+                col += 1
+                continue
+            text = _cell_text(cell)
+            rowspan = _span(cell, "rowspan")
+            for _ in range(_span(cell, "colspan")):
+                row.append(text)
+                if rowspan > 1:
+                    pending[col] = (rowspan - 1, text)
+                col += 1
+            cell = next(it, None)
+        yield bool(cells) and all(c.tag == "th" for c in cells), row
+
+
+def table_to_frame(table) -> pd.DataFrame:
+    """Expand a table element (rowspan/colspan aware) into a DataFrame of strings"""
+    # Footnote markers and hidden sort keys would otherwise leak into cell text
+    for el in table.xpath(NOISE_XPATH):
+        el.drop_tree()
+    header: List[List[Optional[str]]] = []
+    arrays: List[List[Optional[str]]] = []
+    nrows = 0
+
+    for is_header, row in _expand_rows(table):
+        if is_header and not arrays and not nrows:
+            header.append(row)
+            continue
+        # Body row: write cells straight into their column arrays
+        while len(arrays) < len(row):
+            arrays.append([None] * nrows)
+        for i, array in enumerate(arrays):
+            value = row[i] if i < len(row) else None
+            array.append(value if value else None)
+        nrows += 1
+
+    if not nrows and header:
+        # Header-only table: treat the extra header rows as data
+        header, body = header[:1], header[1:]
+        width = max(len(r) for r in header + body)
+        arrays = [[(r[i] if i < len(r) else None) or None for r in body] for i in range(width)]
+    width = max([len(arrays)] + [len(r) for r in header])
+    while len(arrays) < width:
+        arrays.append([None] * nrows)
+    columns = _column_names(header, width)
+    return pd.DataFrame(dict(zip(columns, arrays)), columns=columns)
+
+
+def read_table(html: Union[str, bytes], index: int = 0, caption: Optional[str] = None,
+               match: Optional[Union[str, Sequence[str]]] = None,
+               css_class: Optional[str] = "wikitable", fallback: bool = True) -> pd.DataFrame:
+    """Parse ``html`` once and return the selected table as a DataFrame"""
+    with span("parse", bytes=len(html)) as attrs:
+        doc = parse_html(html)
+        tables = find_tables(doc, css_class=css_class, fallback=fallback)
+        if not tables:
+            raise ValueError("No tables found on the page")
+        df = table_to_frame(select_table(tables, index=index, caption=caption, match=match))
+        attrs["shape"] = list(df.shape)
+        return df
+
+
+def header_score(header: Sequence[str], keywords: AbstractSet[str]) -> int:
+    """
+    Number of header cells that share a word with ``keywords``.
+
+    A header word also matches keywords it is a prefix of, so "Worldwide
+    gross" scores for a question about films that "grossed".
+    """
+    score = 0
+    for cell in header:
+        for word in words_of(cell):
+            if word in keywords or (len(word) >= 4 and any(k.startswith(word) for k in keywords)):
+                score += 1
+                break
+    return score
+
+
+def best_header(headers: Sequence[Sequence[str]], keywords: AbstractSet[str]) -> Tuple[int, int]:
+    """``(index, score)`` of the header row that best matches ``keywords``; ties go to the earlier table"""
+    scores = [header_score(h, keywords) for h in headers] if keywords else [0]
+    best = max(range(len(scores)), key=lambda i: (scores[i], -i))
+    return best, scores[best]
+
+
+def read_candidates(html: Union[str, bytes], keywords: AbstractSet[str] = frozenset(), index: Optional[int] = None,
+                    css_class: Optional[str] = "wikitable",
+                    fallback: bool = True) -> Tuple[List[List[str]], int, pd.DataFrame]:
+    """
+    Parse ``html`` once and return ``(headers, index, frame)``: the header row
+    of every candidate table and the chosen table, the one at ``index`` if
+    given, else the one whose header best matches ``keywords``.
+
+    The headers let a caller pick a table for other keywords later without
+    parsing the page again.
+    """
+    with span("parse", bytes=len(html)) as attrs:
+        tables = find_tables(parse_html(html), css_class=css_class, fallback=fallback)
+        if not tables:
+            raise ValueError("No tables found on the page")
+        headers = [_header_row(t) for t in tables]
+        if index is None:
+            index = best_header(headers, keywords)[0]
+        elif index >= len(tables):
+            raise ValueError(f"Table index {index} out of range ({len(tables)} candidates)")
+        df = table_to_frame(tables[index])
+        attrs.update(candidates=len(tables), table=index, shape=list(df.shape))
+        return headers, index, df
+
+
+def read_best_table(html: Union[str, bytes], keywords: AbstractSet[str], css_class: Optional[str] = "wikitable",
+                    fallback: bool = True) -> Tuple[int, pd.DataFrame]:
+    """
+    Parse ``html`` once and return ``(score, frame)`` for the candidate table
+    whose header best matches ``keywords``.
+
+    Ties go to the earlier table, so without keywords this is ``read_table``.
+    """
+    headers, index, df = read_candidates(html, keywords, css_class=css_class, fallback=fallback)
+    return header_score(headers[index], keywords), df
@@ -0,0 +1,56 @@
+"""
+Optional background pre-import of the heavy analysis libraries
+
+The entry points import pandas, numpy, lxml and matplotlib lazily so a cold
+start only pays for FastAPI. When ``ANALYST_WARMUP=1`` is set, ``start_warmup``
+imports them on a daemon thread right after boot, so an instance that is
+warm by the time real traffic arrives doesn't pay on the first request either.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ANALYST_WARMUP", "0").lower() in ("1", "true", "yes")
+
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "lxml.html",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "PIL.Image",
+    "analyst.tables",
+    "analyst.clean",
+    "analyst.render",
+)
+
+_thread: Optional[threading.Thread] = None
+
+
+def warm_up(modules: Sequence[str] = HEAVY_MODULES) -> float:
+    """Import ``modules`` now and return the time it took"""
+    start = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Warm-up could not import {name}: {e}")
+    elapsed = time.perf_counter() - start
+    logger.info(f"Warm-up imported {len(modules)} modules in {elapsed:.2f}s")
+    return elapsed
+
+
+def start_warmup(force: bool = False) -> Optional[threading.Thread]:
+    """Start the background warm-up once, if enabled"""
+    global _thread
+    if not (ENABLED or force) or _thread is not None:
+        return _thread
+    _thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    _thread.start()
+    return _thread
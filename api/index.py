@@ -2,32 +2,54 @@
 """
 Data Analyst Agent for Vercel Deployment
 Minimal version for maximum compatibility
+
+Heavy libraries (pandas, numpy, lxml, matplotlib) are imported inside the
+functions that need them so that cold starts and /health stay cheap; set
+ANALYST_WARMUP=1 to pre-import them in the background on instance boot.
 """
 
-import base64
-import io
+from __future__ import annotations
+
+import asyncio
 import json
 import logging
-import re
-import time
-from typing import Any, List, Optional
-
-import matplotlib
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from fastapi import FastAPI, File, HTTPException, UploadFile
+import os
+import sys
+from typing import Any, Callable, List, Optional
+
+from fastapi import FastAPI, File, Header, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+
+# Make the shared ``analyst`` package importable when run from api/
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from analyst.batch import parse_items, run_batch, source_key
+from analyst.cache import page_cache
+from analyst.deadline import TIMEOUT_PLACEHOLDER, Deadline
+from analyst.executor import PoolSaturated, cpu_pool
+from analyst.fetch import close_client
+from analyst.handlers import engine
+from analyst.jobs import (BUDGET as JOB_BUDGET, ENABLED as JOBS_ENABLED, JobQueueFull, SpooledUpload, job_queue,
+                          report_answers)
+from analyst.metrics import PROFILING_ENABLED, Profile, register_collector, render, span
+from analyst.pipeline import Request
+from analyst.responses import digest_key, request_key, response_cache, upload_digest
+from analyst.serialize import JSONBytesResponse, dumps, respond
+from analyst.warmup import start_warmup
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configure matplotlib for non-interactive backend
-matplotlib.use('Agg')
+# Per-request time budget (seconds), minus headroom to serialize the response
+REQUEST_BUDGET = 180
+RESPONSE_RESERVE = 2.0
+
+# Optionally pre-import the heavy libraries while the instance is idle
+start_warmup()
 
 # Initialize FastAPI app
 app = FastAPI(title="Data Analyst Agent", version="1.0.0")
@@ -41,278 +63,215 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def scrape_wikipedia_table(url: str) -> pd.DataFrame:
-    """Scrape data from Wikipedia tables"""
-    try:
-        response = requests.get(url, timeout=20)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        tables = soup.find_all('table', {'class': 'wikitable'})
-        
-        if not tables:
-            tables = soup.find_all('table')
-        
-        if not tables:
-            raise ValueError("No tables found on the page")
-        
-        # Try to parse the first table
-        try:
-            df = pd.read_html(str(tables[0]))[0]
-            return df
-        except Exception as e:
-            logger.error(f"Failed to parse table: {e}")
-            raise ValueError("Could not parse table data")
-        
-    except Exception as e:
-        logger.error(f"Error scraping Wikipedia: {e}")
-        raise
-
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean and preprocess data"""
-    # Remove completely empty rows and columns
-    df = df.dropna(how='all').dropna(axis=1, how='all')
-    
-    # Convert numeric columns
-    for col in df.columns:
-        try:
-            df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[^\d.-]', '', regex=True), errors='coerce')
-        except:
-            pass
-    
-    return df
-
-def analyze_data(df: pd.DataFrame, questions: List[str]) -> List[Any]:
-    """Analyze data and answer questions"""
-    results = []
-    
-    for question in questions:
-        try:
-            if "correlation" in question.lower():
-                # Find numeric columns for correlation
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                if len(numeric_cols) >= 2:
-                    corr = df[numeric_cols].corr().iloc[0, 1]
-                    results.append(corr)
-                else:
-                    results.append("Insufficient numeric data for correlation")
-            
-            elif "count" in question.lower() or "how many" in question.lower():
-                # Handle counting questions
-                if "before 2000" in question.lower():
-                    if 'Year' in df.columns:
-                        count = len(df[df['Year'] < 2000])
-                        results.append(count)
-                    else:
-                        results.append("Year column not found")
-                else:
-                    results.append("Question not understood")
-            
-            elif "earliest" in question.lower() or "first" in question.lower():
-                # Handle temporal questions
-                if 'Year' in df.columns:
-                    earliest = df.loc[df['Year'].idxmin()]
-                    results.append(earliest['Title'] if 'Title' in df.columns else str(earliest))
-                else:
-                    results.append("Year column not found")
-            
-            else:
-                results.append("Question not understood")
-                
-        except Exception as e:
-            logger.error(f"Error analyzing question '{question}': {e}")
-            results.append(f"Error: {str(e)}")
-    
-    return results
-
-def create_scatterplot(df: pd.DataFrame, x_col: str, y_col: str) -> str:
-    """Create a scatterplot with regression line"""
-    try:
-        # Find numeric columns if specific columns not found
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        if x_col not in df.columns and len(numeric_cols) >= 1:
-            x_col = numeric_cols[0]
-        if y_col not in df.columns and len(numeric_cols) >= 2:
-            y_col = numeric_cols[1]
-        
-        if x_col not in df.columns or y_col not in df.columns:
-            raise ValueError(f"Columns {x_col} or {y_col} not found")
-        
-        # Create the plot
-        fig, ax = plt.subplots(figsize=(8, 5))
-        
-        # Scatter plot
-        ax.scatter(df[x_col], df[y_col], alpha=0.6, s=20)
-        
-        # Add regression line
-        z = np.polyfit(df[x_col], df[y_col], 1)
-        p = np.poly1d(z)
-        ax.plot(df[x_col], p(df[x_col]), "r--", alpha=0.8, linewidth=2)
-        
-        # Labels and title
-        ax.set_xlabel(x_col)
-        ax.set_ylabel(y_col)
-        ax.set_title(f'{y_col} vs {x_col}')
-        ax.grid(True, alpha=0.3)
-        
-        # Convert to base64
-        img_data = io.BytesIO()
-        fig.savefig(img_data, format='png', dpi=80, bbox_inches='tight')
-        img_data.seek(0)
-        
-        img_base64 = base64.b64encode(img_data.getvalue()).decode()
-        plt.close(fig)
-        
-        return f"data:image/png;base64,{img_base64}"
-        
-    except Exception as e:
-        logger.error(f"Error creating scatterplot: {e}")
-        raise
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Release pooled HTTP connections and analysis workers"""
+    await close_client()
+    cpu_pool.shutdown()
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "Data Analyst Agent", "deployment": "vercel"}
+    return {
+        "status": "healthy",
+        "service": "Data Analyst Agent",
+        "deployment": "vercel",
+        "cache": page_cache.stats(),
+        "workers": cpu_pool.stats(),
+        "responses": response_cache.stats(),
+        "jobs": job_queue.stats(),
+    }
+
+async def profiled(mode: str, compute: Callable) -> Response:
+    """Run ``compute`` uncached under a profiler and return the answers with the profile"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (set ANALYST_PROFILING=1)")
+    try:
+        session = Profile(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with session:
+        body, _ = await compute()
+    return JSONBytesResponse(content={"answers": json.loads(body), "profile": session.report()},
+                             headers={"X-Cache": "BYPASS"})
+
+async def run_analysis(questions_text: str, data_file: Optional[UploadFile],
+                       image_file: Optional[UploadFile], deadline: Deadline) -> List[Any]:
+    """Parse the questions file and run it through the shared pipeline engine"""
+    logger.info(f"Received analysis request: {questions_text[:200]}...")
+    request = Request.parse(questions_text, [data_file, image_file], deadline)
+    logger.info(f"Found {len(request.questions)} questions")
+    result = await engine.run(request)
+    return result.as_list()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, fetch bytes, frame/plot sizes, cache and pool counters"""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/api/")
 async def analyze_data_endpoint(
     questions: UploadFile = File(..., description="Questions file (always required)"),
     data_file: Optional[UploadFile] = File(None, description="Data file (optional)"),
-    image_file: Optional[UploadFile] = File(None, description="Image file (optional)")
+    image_file: Optional[UploadFile] = File(None, description="Image file (optional)"),
+    profile: Optional[str] = Query(None, description="Return a stages/cprofile/pyinstrument profile "
+                                                     "with the answers (needs ANALYST_PROFILING=1)"),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
 ):
     """
     Main endpoint for data analysis
     """
     try:
-        start_time = time.time()
+        deadline = Deadline(REQUEST_BUDGET - RESPONSE_RESERVE)
         
         # Read the questions
         questions_content = await questions.read()
-        questions_text = questions_content.decode('utf-8')
-        
-        logger.info(f"Received analysis request: {questions_text[:200]}...")
-        
-        # Parse questions
-        lines = questions_text.strip().split('\n')
-        task_description = ""
-        questions_list = []
-        
-        for line in lines:
-            if line.strip().startswith(('1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.')):
-                questions_list.append(line.strip())
-            else:
-                task_description += line + "\n"
-        
-        logger.info(f"Found {len(questions_list)} questions")
-        
-        # Handle different types of analysis
-        if "wikipedia" in task_description.lower() or "wikipedia.org" in task_description:
-            # Wikipedia scraping analysis
-            results = await handle_wikipedia_analysis(task_description, questions_list)
-        else:
-            # Generic analysis
-            results = await handle_generic_analysis(task_description, questions_list, data_file, image_file)
-        
-        # Check time limit (3 minutes)
-        elapsed_time = time.time() - start_time
-        if elapsed_time > 180:
-            raise HTTPException(status_code=408, detail="Analysis took too long (>3 minutes)")
-        
-        logger.info(f"Analysis completed in {elapsed_time:.2f} seconds")
-        return JSONResponse(content=results)
+
+        async def compute():
+            with span("request"):
+                results = await run_analysis(questions_content.decode('utf-8'), data_file, image_file, deadline)
+            logger.info(f"Analysis completed in {deadline.elapsed():.2f} seconds")
+            # Answers cut short by the time budget are served but never cached
+            return dumps(results), TIMEOUT_PLACEHOLDER not in results
+
+        if profile is not None:
+            return await profiled(profile, compute)
+
+        key = await request_key(questions_content, [("data_file", data_file), ("image_file", image_file)])
+        body, cache_status = await response_cache.get_or_compute(key, compute)
+        return respond(body, accept_encoding, headers={"X-Cache": cache_status})
         
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        logger.warning("Rejecting analysis request: worker pool saturated")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=408, detail=f"Analysis took too long (>{REQUEST_BUDGET} seconds)")
     except Exception as e:
         logger.error(f"Error in analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def handle_wikipedia_analysis(task_description: str, questions: List[str]) -> List[Any]:
-    """Handle Wikipedia scraping analysis"""
-    # Extract URL from task description
-    url_match = re.search(r'https://[^\s]+', task_description)
-    if not url_match:
-        raise ValueError("No URL found in task description")
-    
-    url = url_match.group(0)
-    
-    # Scrape the data
-    df = scrape_wikipedia_table(url)
-    df = clean_data(df)
-    
-    logger.info(f"Scraped data shape: {df.shape}")
-    
-    # Analyze the questions
-    results = analyze_data(df, questions)
-    
-    # Handle visualization question
-    for i, question in enumerate(questions):
-        if "scatterplot" in question.lower() and "rank" in question.lower() and "peak" in question.lower():
-            try:
-                plot_data_uri = create_scatterplot(df, "Rank", "Peak")
-                results[i] = plot_data_uri
-            except Exception as e:
-                logger.error(f"Error creating plot: {e}")
-                results[i] = f"Error creating plot: {str(e)}"
-    
-    return results
-
-async def handle_generic_analysis(task_description: str, questions: List[str], 
-                                data_file: Optional[UploadFile], 
-                                image_file: Optional[UploadFile]) -> List[Any]:
-    """Handle generic data analysis"""
-    results = []
-    
-    # Process uploaded files if any
-    df = None
-    
-    if data_file:
+@app.post("/api/batch")
+async def analyze_batch_endpoint(
+    questions: List[UploadFile] = File(default=[], description="Question files, one batch item each"),
+    items: Optional[UploadFile] = File(None, description='More items as JSON Lines: {"id": ..., "questions": "..."}'),
+    data_file: Optional[UploadFile] = File(None, description="Data file shared by every item (optional)"),
+    image_file: Optional[UploadFile] = File(None, description="Image file shared by every item (optional)"),
+):
+    """
+    Answer many question files in one request.
+
+    Items about the same data source load and clean it once; each item's
+    answers are streamed back as a JSON line as soon as they are ready.
+    """
+    try:
+        batch = parse_items([(q.filename, await q.read()) for q in questions],
+                            await items.read() if items is not None else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not batch:
+        raise HTTPException(status_code=400, detail="No question files given")
+
+    # The request's uploads are closed once it returns, so the stream reads its own copies
+    uploads = {name: await SpooledUpload.copy(f)
+               for name, f in (("data_file", data_file), ("image_file", image_file)) if f}
+    # One budget for the whole batch, as for a single request
+    deadline = Deadline(REQUEST_BUDGET - RESPONSE_RESERVE)
+    digests = [(name, upload.filename, await upload_digest(upload)) for name, upload in uploads.items()]
+    for item in batch:
+        item.source = source_key(item.questions.decode("utf-8", errors="replace"), [d for _, _, d in digests])
+
+    async def run_item(item) -> bytes:
+        # Every item reads the shared copies through its own file handles
+        views = {name: upload.view() for name, upload in uploads.items()}
+
+        async def compute():
+            with span("request"):
+                results = await run_analysis(item.questions.decode("utf-8"), views.get("data_file"),
+                                             views.get("image_file"), deadline)
+            return dumps(results), TIMEOUT_PLACEHOLDER not in results
+
         try:
-            content = await data_file.read()
-            file_extension = data_file.filename.split('.')[-1].lower()
-            
-            if file_extension == 'csv':
-                df = pd.read_csv(io.BytesIO(content))
-            elif file_extension in ['xlsx', 'xls']:
-                df = pd.read_excel(io.BytesIO(content))
-            elif file_extension == 'json':
-                df = pd.read_json(io.BytesIO(content))
-            
-            if df is not None:
-                df = clean_data(df)
-        
-        except Exception as e:
-            logger.error(f"Error processing data file: {e}")
-    
-    # Analyze each question
-    for question in questions:
+            body, _ = await response_cache.get_or_compute(digest_key(item.questions, digests), compute)
+            return body
+        finally:
+            for view in views.values():
+                view.close()
+
+    async def stream():
         try:
-            if df is not None and "correlation" in question.lower():
-                # Handle correlation analysis
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                if len(numeric_cols) >= 2:
-                    corr = df[numeric_cols].corr().iloc[0, 1]
-                    results.append(corr)
-                else:
-                    results.append("Insufficient numeric data for correlation")
-            
-            elif df is not None and "plot" in question.lower():
-                # Handle plotting
-                numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-                if len(numeric_cols) >= 2:
-                    plot_data_uri = create_scatterplot(df, numeric_cols[0], numeric_cols[1])
-                    results.append(plot_data_uri)
-                else:
-                    results.append("Insufficient numeric data for plotting")
-            
-            else:
-                # Generic response for other questions
-                results.append("Analysis completed successfully")
-        
-        except Exception as e:
-            logger.error(f"Error analyzing question: {e}")
-            results.append(f"Error: {str(e)}")
-    
-    return results
+            async for line in run_batch(batch, run_item, deadline=deadline, grace=RESPONSE_RESERVE):
+                yield line
+        finally:
+            for upload in uploads.values():
+                upload.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def require_jobs():
+    """Refuse job requests where jobs cannot run (see ``analyst.jobs``)"""
+    if not JOBS_ENABLED:
+        raise HTTPException(status_code=501, detail="Background jobs need a long-running server (set ANALYST_JOBS=1)")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    questions: UploadFile = File(..., description="Questions file (always required)"),
+    data_file: Optional[UploadFile] = File(None, description="Data file (optional)"),
+    image_file: Optional[UploadFile] = File(None, description="Image file (optional)"),
+):
+    """
+    Queue an analysis in the background and return its job ID at once.
+
+    Identical payloads map to the same job; poll ``GET /api/jobs/{id}``.
+    """
+    require_jobs()
+    questions_content = await questions.read()
+    key = await request_key(questions_content, [("data_file", data_file), ("image_file", image_file)])
+    job = job_queue.find(key)
+    if job is None:
+        # The request's uploads are closed once it returns, so the job gets its own copies
+        uploads = {name: await SpooledUpload.copy(f)
+                   for name, f in (("data_file", data_file), ("image_file", image_file)) if f}
+        # The job's progress lists the questions of the very request it runs
+        request = Request.parse(questions_content.decode('utf-8'),
+                                [uploads.get("data_file"), uploads.get("image_file")])
+
+        async def compute():
+            # The budget starts when the job does, not when it was queued
+            request.deadline = Deadline(JOB_BUDGET)
+            with span("request"):
+                results = (await engine.run(request)).as_list()
+            return dumps(results), TIMEOUT_PLACEHOLDER not in results
+
+        async def run():
+            # Shares the response cache (and in-flight requests) with /api/
+            body, _ = await response_cache.get_or_compute(key, compute)
+            results = json.loads(body)
+            # A cached or coalesced result never went through the pipeline here
+            if isinstance(results, list):
+                report_answers(results)
+            return results
+
+        def cleanup():
+            for upload in uploads.values():
+                upload.close()
+
+        try:
+            job, _ = job_queue.submit(key, engine.questions(request), run, cleanup)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return JSONBytesResponse(status_code=202, content=job.to_dict(include_result=False),
+                             headers={"Location": f"/api/jobs/{job.id}"})
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status, per-question progress and (once finished) the answers of a background job"""
+    require_jobs()
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return JSONBytesResponse(content=job.to_dict())
 
 # For Vercel serverless deployment
 if __name__ == "__main__":
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Benchmark: load test both /api/ apps on representative workloads
+
+Drives ``api/index.py`` (root) and ``tds-project-2/api/index.py`` (tds)
+in-process through httpx's ASGI transport, each workload in a fresh
+process so peak RSS is comparable:
+
+- ``wiki-root`` / ``wiki-tds``: the highest-grossing films task. Outbound
+  fetches of en.wikipedia.org are redirected to a local HTTP fixture server
+  serving a synthetic page; pages are revalidated on every request.
+- ``csv-root`` / ``json-root`` / ``excel-root``: correlation + scatterplot
+  questions against an uploaded file of ``--upload-rows`` rows (Excel needs
+  openpyxl and is skipped without it).
+- ``court-tds``: the High Court task on a synthetic Parquet file, once per
+  ``--court-rows`` size (1e5 .. 1e8). ``--court-source url`` passes the file
+  as an http:// URL (read by DuckDB's httpfs) instead of uploading it.
+
+Each workload reports throughput, latency percentiles and peak RSS. Results
+are compared with ``benchmarks/baseline.json`` (recorded on the machine that
+ran ``--save-baseline``); a workload that is slower, or heavier, than its
+baseline by more than ``--tolerance`` fails the run. Response caching is
+off unless ``--response-cache`` is given, so every request does the work.
+
+Usage: python benchmarks/bench_api.py [--workloads wiki-root,court-tds] [--requests 20] [--concurrency 4] [--court-rows 1e5,1e6] [--save-baseline]
+"""
+
+import argparse
+import asyncio
+import functools
+import http.server
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TDS_ROOT = os.path.join(ROOT, "tds-project-2")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from bench_court import make_dataset
+
+WIKI_PATH = "/wiki/List_of_highest-grossing_films"
+WORKLOADS = ("wiki-root", "wiki-tds", "csv-root", "json-root", "excel-root", "court-tds")
+# Higher is better for throughput, lower for everything else
+GATED = {"rps": -1, "p50_ms": 1, "p90_ms": 1, "rss_mb": 1}
+
+WIKI_TASK = f"""Scrape the list of highest grossing films from Wikipedia. It is at the URL:
+https://en.wikipedia.org{WIKI_PATH}
+
+Answer the following questions and respond with a JSON array of strings containing the answer.
+
+1. How many $2 bn movies were released before 2000?
+2. Which is the earliest film that grossed over $1.5 bn?
+3. What's the correlation between the Rank and Peak?
+4. Draw a scatterplot of Rank and Peak along with a dotted red regression line through it.
+"""
+
+UPLOAD_TASK = """Analyze the attached dataset.
+
+1. What's the correlation between x and y?
+2. Draw a scatterplot of x and y along with a dotted red regression line through it.
+"""
+
+COURT_TASK = """The Indian High Court judgement dataset is attached{source}.
+
+1. Which high court disposed the most cases from 2019 - 2022?
+2. What's the regression slope of the date_of_registration - decision_date by year in the court=33_10?
+3. Plot the year and # of days of delay from the above question as a scatterplot with a regression line.
+"""
+
+
+def rows_label(rows: int) -> str:
+    for size, suffix in ((1_000_000_000, "G"), (1_000_000, "M"), (1_000, "k")):
+        if rows >= size and rows % size == 0:
+            return f"{rows // size}{suffix}"
+    return str(rows)
+
+
+# --- fixtures ---------------------------------------------------------------
+
+def films_page(rows: int) -> str:
+    """A Wikipedia-like wikitable of ``rows`` films"""
+    rng = np.random.default_rng(0)
+    gross = np.sort(rng.uniform(0.3e9, 2.95e9, rows))[::-1]
+    years = rng.integers(1975, 2024, rows)
+    lines = ['<html><body><table class="wikitable sortable">',
+             "<tr><th>Rank</th><th>Peak</th><th>Title</th><th>Worldwide gross</th><th>Year</th><th>Ref</th></tr>"]
+    for rank in range(1, rows + 1):
+        peak = int(rng.integers(1, rank + 1))
+        lines.append(f"<tr><td>{rank}</td><td>{peak}</td><td><i>Film {rank}</i></td>"
+                     f"<td>${int(gross[rank - 1]):,}</td><td>{years[rank - 1]}</td><td>[{rank}]</td></tr>")
+    lines.append("</table></body></html>")
+    return "\n".join(lines)
+
+
+def upload_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=rows)
+    return pd.DataFrame({
+        "x": x.round(6),
+        "y": (0.8 * x + rng.normal(scale=0.6, size=rows)).round(6),
+        "year": rng.integers(1990, 2025, rows),
+        "category": rng.choice(["alpha", "beta", "gamma", "delta"], rows),
+    })
+
+
+def prepare_fixtures(directory: str, args) -> Dict[str, str]:
+    """Write (or reuse) every fixture file; returns name -> path"""
+    os.makedirs(os.path.join(directory, "wiki"), exist_ok=True)
+    paths = {"wiki": os.path.join(directory, WIKI_PATH.lstrip("/"))}
+    if not os.path.exists(paths["wiki"]):
+        with open(paths["wiki"], "w") as f:
+            f.write(films_page(args.films))
+
+    label = rows_label(args.upload_rows)
+    frame = None
+    for fmt, ext in (("csv", "csv"), ("json", "json"), ("excel", "xlsx")):
+        path = paths[fmt] = os.path.join(directory, f"upload-{label}.{ext}")
+        if os.path.exists(path):
+            continue
+        frame = upload_frame(args.upload_rows) if frame is None else frame
+        if fmt == "csv":
+            frame.to_csv(path, index=False)
+        elif fmt == "json":
+            frame.to_json(path, orient="records")
+        else:
+            try:
+                frame.to_excel(path, index=False)
+            except ImportError:
+                del paths[fmt]
+
+    for rows in args.court_rows:
+        paths[f"court-{rows}"] = make_dataset(os.path.join(directory, f"court-{rows_label(rows)}.parquet"),
+                                              rows, partitioned=False)
+    return paths
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def serve_fixtures(directory: str) -> str:
+    """Serve ``directory`` over HTTP on a background thread; returns the base URL"""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                             functools.partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# --- one workload, run in a fresh process -----------------------------------
+
+def load_app(which: str):
+    import importlib.util
+
+    if which == "tds":
+        sys.path.insert(0, TDS_ROOT)
+        path = os.path.join(TDS_ROOT, "api", "index.py")
+    else:
+        path = os.path.join(ROOT, "api", "index.py")
+    spec = importlib.util.spec_from_file_location(f"bench_{which}_index", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def redirect_fetches(fixture_url: str) -> None:
+    """Send the shared fetch client's requests to the fixture server, keeping the path"""
+    import httpx
+
+    from analyst import fetch
+
+    base = httpx.URL(fixture_url)
+
+    class FixtureTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request):
+            request.url = request.url.copy_with(scheme=base.scheme, host=base.host, port=base.port)
+            return await super().handle_async_request(request)
+
+    client = httpx.AsyncClient(transport=FixtureTransport(), headers={"User-Agent": fetch.USER_AGENT})
+    fetch.get_client = lambda: client
+
+
+def build_request(spec: Dict[str, Any]) -> Callable:
+    """Return ``send(client) -> response`` for the workload"""
+    name, fixture = spec["name"].split(":")[0], spec.get("fixture")
+    data = b""
+    if fixture and not spec.get("by_url"):
+        with open(fixture, "rb") as f:
+            data = f.read()
+
+    if name in ("wiki-root", "csv-root", "json-root", "excel-root"):
+        text = WIKI_TASK if name == "wiki-root" else UPLOAD_TASK
+        files = {"questions": ("questions.txt", text.encode())}
+        if data:
+            files["data_file"] = (os.path.basename(fixture), data)
+    elif name == "wiki-tds":
+        files = {"question_file": ("question.txt", WIKI_TASK.encode())}
+    else:
+        if spec.get("by_url"):
+            text = COURT_TASK.format(source=f" and published at {spec['fixture_url']}/{os.path.basename(fixture)}")
+            files = {"question_file": ("question.txt", text.encode())}
+        else:
+            files = [("question_file", ("question.txt", COURT_TASK.format(source="").encode())),
+                     ("attachments", (os.path.basename(fixture), data))]
+
+    async def send(client):
+        return await client.post("/api/", files=files)
+
+    return send
+
+
+def succeeded(response) -> bool:
+    if response.status_code != 200:
+        return False
+    body = response.json()
+    return not (isinstance(body, dict) and "error" in body)
+
+
+async def drive(app, send: Callable, requests: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    import httpx
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        for _ in range(warmup):
+            response = await send(client)
+            if not succeeded(response):
+                raise RuntimeError(f"warm-up request failed: {response.status_code} {response.text[:300]}")
+
+        latencies: List[float] = []
+        errors = 0
+        pending = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for _ in pending:
+                start = time.perf_counter()
+                response = await send(client)
+                latencies.append(time.perf_counter() - start)
+                errors += not succeeded(response)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    return {"requests": requests, "errors": errors, "rps": round(requests / wall, 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 1), "p90_ms": round(float(np.percentile(ms, 90)), 1),
+            "p99_ms": round(float(np.percentile(ms, 99)), 1), "max_ms": round(float(ms.max()), 1)}
+
+
+def run_workload(spec: Dict[str, Any]) -> Dict[str, Any]:
+    os.environ.update(spec["env"])
+    app = load_app(spec["app"])
+    logging.disable(logging.INFO)
+    send = build_request(spec)
+
+    async def main():
+        redirect_fetches(spec["fixture_url"])
+        return await drive(app, send, spec["requests"], spec["concurrency"], spec["warmup"])
+
+    result = asyncio.run(main())
+    # ru_maxrss is in kilobytes on Linux
+    result["rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+# --- baseline ----------------------------------------------------------------
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of ``results`` against ``baseline`` beyond ``tolerance``"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("workloads", {}).get(name)
+        if base is None or base.get("params") != result.get("params"):
+            continue
+        for metric, direction in GATED.items():
+            old, new = base[metric], result[metric]
+            worse = (new - old) / old * direction if old else 0.0
+            if worse > tolerance:
+                regressions.append(f"{name}: {metric} {old:.1f} -> {new:.1f} ({worse:+.0%})")
+    return regressions
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(float(v)) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured requests per workload")
+    parser.add_argument("--films", type=int, default=200, help="rows in the films table")
+    parser.add_argument("--upload-rows", type=int, default=100_000)
+    parser.add_argument("--court-rows", type=parse_sizes, default=[100_000], help="e.g. 1e5,1e6,1e8")
+    parser.add_argument("--court-source", choices=("upload", "url"), default="upload")
+    parser.add_argument("--fixtures", default="/tmp/bench-api", help="fixture directory (reused)")
+    parser.add_argument("--response-cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    fixtures = prepare_fixtures(args.fixtures, args)
+    fixture_url = serve_fixtures(args.fixtures)
+    print(f"fixtures ready in {time.perf_counter() - start:.1f} s, served at {fixture_url}")
+
+    env = {"RESPONSE_CACHE": "memory" if args.response_cache else "off",
+           "PAGE_CACHE_DIR": os.path.join(args.fixtures, "page-cache"), "PAGE_CACHE_TTL": "0",
+           "ANALYST_WARMUP": "0"}
+    specs = []
+    for name in args.workloads.split(","):
+        spec = {"name": name, "app": name.rsplit("-", 1)[1], "env": env, "fixture_url": fixture_url,
+                "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+                "params": {"requests": args.requests, "concurrency": args.concurrency,
+                           "response_cache": args.response_cache}}
+        if name.startswith("wiki"):
+            specs.append(dict(spec, fixture=None, params=dict(spec["params"], films=args.films)))
+        elif name == "court-tds":
+            for rows in args.court_rows:
+                specs.append(dict(spec, name=f"{name}:{rows_label(rows)}", fixture=fixtures[f"court-{rows}"],
+                                  by_url=args.court_source == "url",
+                                  params=dict(spec["params"], rows=rows, source=args.court_source)))
+        elif name.split("-")[0] in fixtures:
+            specs.append(dict(spec, name=f"{name}:{rows_label(args.upload_rows)}",
+                              fixture=fixtures[name.split("-")[0]],
+                              params=dict(spec["params"], rows=args.upload_rows)))
+        else:
+            print(f"{name:18s}: skipped (fixture unavailable)")
+
+    results = {}
+    print(f"{'workload':18s} {'req/s':>8s} {'p50':>9s} {'p90':>9s} {'p99':>9s} {'peak RSS':>10s}  errors")
+    for spec in specs:
+        with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+            result = pool.apply(run_workload, (spec,))
+        result["params"] = spec["params"]
+        results[spec["name"]] = result
+        print(f"{spec['name']:18s} {result['rps']:8.2f} {result['p50_ms']:7.0f}ms {result['p90_ms']:7.0f}ms "
+              f"{result['p99_ms']:7.0f}ms {result['rss_mb']:8.0f}MB  {result['errors']}")
+
+    record = {"machine": {"python": platform.python_version(), "cpus": os.cpu_count(),
+                          "platform": platform.platform()},
+              "workloads": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(record, f, indent=2)
+
+    failed = [f"{name}: {r['errors']} failed requests" for name, r in results.items() if r["errors"]]
+    if args.save_baseline:
+        baseline = {"workloads": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline["machine"] = record["machine"]
+        baseline["workloads"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != record["machine"]:
+            print("note: baseline was recorded on a different machine")
+        failed += compare(results, baseline, args.tolerance)
+
+    if failed:
+        print("REGRESSION:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
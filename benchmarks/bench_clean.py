@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dtype-inferring clean_data vs the original per-column to_numeric loop
+
+Usage: python benchmarks/bench_clean.py [--rows 1000000] [--cols 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from analyst.clean import clean_data
+
+
+def legacy_clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    """The loop clean_data used to run on every column"""
+    df = df.dropna(how='all').dropna(axis=1, how='all')
+    for col in df.columns:
+        try:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[^\d.-]', '', regex=True), errors='coerce')
+        except Exception:
+            pass
+    return df
+
+
+def make_frame(rows: int, cols: int) -> pd.DataFrame:
+    """Scraped-style frame: numbers as strings, currency, years, labels and free text"""
+    rng = np.random.default_rng(0)
+    data = {}
+    for i in range(cols):
+        kind = i % 5
+        if kind == 0:
+            data[f"int{i}"] = rng.integers(0, 10_000, rows).astype(str)
+        elif kind == 1:
+            data[f"money{i}"] = np.char.add("$", rng.integers(1, 5_000, rows).astype(str))
+        elif kind == 2:
+            data[f"year{i}"] = rng.integers(1950, 2024, rows).astype(str)
+        elif kind == 3:
+            data[f"label{i}"] = np.array(["north", "south", "east", "west"])[rng.integers(0, 4, rows)]
+        else:
+            data[f"float{i}"] = rng.random(rows).round(3).astype(str)
+    return pd.DataFrame(data).astype(object)
+
+
+def measure(fn, df: pd.DataFrame):
+    # Time and memory are taken in separate runs; tracemalloc skews timings
+    start = time.perf_counter()
+    fn(df.copy())
+    elapsed = time.perf_counter() - start
+    data = df.copy()
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--cols", type=int, default=50)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.cols)
+    print(f"frame: {args.rows:,} rows x {args.cols} cols")
+    for name, fn in (("typed clean_data", clean_data),
+                     ("typed clean_data (cached)", lambda d: clean_data(d, source="bench")),
+                     ("legacy loop", legacy_clean_data)):
+        if "cached" in name:
+            clean_data(df.head(1000), source="bench")
+        elapsed, peak = measure(fn, df)
+        print(f"{name:28s}: {elapsed:8.2f} s   peak {peak / 1e6:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: DuckDB pushed-down court analytics vs the original pandas path
+
+Generates a synthetic court-judgments Parquet dataset (the default 50M rows
+is a few GB on disk; it is reused between runs) and answers the busiest
+court / yearly delay questions both ways, each in a fresh process so peak
+RSS is comparable. Without pyarrow the pandas path loads the file through
+DuckDB's reader instead. The court × year summary index is measured too:
+the one-off build (a scan of the whole dataset) and then answering both
+questions from the built index, which is what every later request costs.
+
+Usage: python benchmarks/bench_court.py [--rows 50000000] [--path /tmp/bench-court.parquet] [--partitioned]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from analyst.court import busiest_court, open_dataset, yearly_delay
+from analyst.court_index import CourtIndex
+
+
+def make_dataset(path: str, rows: int, partitioned: bool) -> str:
+    """Write ``rows`` synthetic judgments (with a wide text column, like the real data)"""
+    source = f"{path}/*/*.parquet" if partitioned else path
+    if os.path.exists(path):
+        return source
+    query = f"""
+        SELECT (['33_10', '1_12', '7_26', '9_13', '20_7'])[1 + (hash(i) % 5)::INTEGER] AS court,
+               strftime(DATE '2012-01-01' + (hash(i * 3) % 3650)::INTEGER, '%d-%m-%Y') AS date_of_registration,
+               DATE '2012-01-01' + (hash(i * 3) % 3650)::INTEGER + (hash(i * 7) % 900)::INTEGER AS decision_date,
+               'judgment text ' || md5(i::VARCHAR) || md5((i + 1)::VARCHAR) AS description,
+               hash(i * 11) % 1000 AS bench
+        FROM range({rows}) t(i)
+        ORDER BY decision_date
+    """
+    con = duckdb.connect()
+    if partitioned:
+        con.execute(f"COPY (SELECT *, year(decision_date) AS year FROM ({query})) TO '{path}' "
+                    "(FORMAT parquet, PARTITION_BY (year))")
+    else:
+        con.execute(f"COPY ({query}) TO '{path}' (FORMAT parquet)")
+    return source
+
+
+def pandas_answers(path: str):
+    """The original handler: load everything, then filter and group in pandas"""
+    try:
+        df = pd.read_parquet(path)
+    except ImportError:
+        df = duckdb.connect(config={"enable_progress_bar": False}).execute(f"SELECT * FROM read_parquet('{path}')").df()
+    df['delay'] = pd.to_datetime(df['decision_date']) - pd.to_datetime(df['date_of_registration'], format="%d-%m-%Y")
+    df['delay_days'] = df['delay'].dt.days
+    df['year'] = pd.to_datetime(df['decision_date']).dt.year
+    most_cases = df[df['year'].between(2019, 2022)].groupby("court").size().idxmax()
+    yearly = df[df['court'] == "33_10"].groupby("year")["delay_days"].mean().reset_index()
+    return most_cases, np.polyfit(yearly['year'], yearly['delay_days'], 1)[0]
+
+
+def duckdb_answers(source: str):
+    dataset = open_dataset(source)
+    return busiest_court(dataset, 2019, 2022), yearly_delay(dataset, "33_10")[2]
+
+
+def index_answers(source: str):
+    """Build the summary index from scratch, then time answering from it"""
+    with tempfile.TemporaryDirectory() as directory:
+        index = CourtIndex(source, directory)
+        start = time.perf_counter()
+        index.refresh()
+        built = time.perf_counter() - start
+        repeat = 1000
+        start = time.perf_counter()
+        for _ in range(repeat):
+            busiest, slope = index.busiest_court(2019, 2022), index.yearly_delay("33_10")[2]
+        answered = (time.perf_counter() - start) / repeat
+    return busiest, slope, f"   (build {built:.2f} s, answer {answered * 1e6:.0f} µs)"
+
+
+def measure(name: str, source: str) -> str:
+    start = time.perf_counter()
+    note = ""
+    if name == "index":
+        busiest, slope, note = index_answers(source)
+    elif name == "pandas":
+        busiest, slope = pandas_answers(source)
+    else:
+        busiest, slope = duckdb_answers(source)
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return f"{elapsed:8.2f} s   peak RSS {rss:8.1f} MB   busiest={busiest} slope={slope:.4f}{note}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--path", default="/tmp/bench-court.parquet")
+    parser.add_argument("--partitioned", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    source = make_dataset(args.path, args.rows, args.partitioned)
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(args.path) for f in files) \
+        if os.path.isdir(args.path) else os.path.getsize(args.path)
+    print(f"dataset: {args.rows:,} rows, {size / 1e9:.2f} GB ({time.perf_counter() - start:.1f} s to prepare)")
+
+    runs = [("duckdb", "duckdb pushdown"), ("index", "summary index")]
+    if not args.partitioned:
+        runs.append(("pandas", "pandas full load"))
+
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for name, label in runs:
+            print(f"{label:18s}: {pool.apply(measure, (name, args.path if name == 'pandas' else source))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: compiled intent router vs the original substring if/elif chain
+
+Classifies a synthetic corpus of questions (with a share of exact repeats,
+as in real traffic) and reports throughput for the legacy chain, the router
+with its cache cleared per pass, and the router with a warm cache.
+
+Usage: python benchmarks/bench_intents.py [--questions 200000] [--unique 0.01]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyst.intents import IntentRouter, router
+
+TEMPLATES = [
+    "How many {noun} grossed over ${amount} bn before {year}?",
+    "Which is the earliest {noun} that grossed over ${amount} bn?",
+    "What's the correlation between the {a} and {b}?",
+    "Draw a scatterplot of {a} and {b} along with a dotted red regression line.",
+    "Count the {noun} released after {year} in each country.",
+    "Which {noun} has the highest {a} in the account ledger?",
+    "What is the number of {noun} with {a} above {amount}?",
+]
+WORDS = ["films", "courts", "cases", "players", "songs", "cities", "companies"]
+COLUMNS = ["Rank", "Peak", "Year", "Title", "Gross", "Population", "Score", "Delay"]
+
+
+def legacy_route(question: str) -> str:
+    """The chain the handlers used before the router"""
+    if "correlation" in question.lower():
+        return "correlation"
+    elif "count" in question.lower() or "how many" in question.lower():
+        return "count"
+    elif "earliest" in question.lower() or "first" in question.lower():
+        return "earliest"
+    elif "plot" in question.lower():
+        return "plot"
+    return None
+
+
+def make_corpus(size: int, unique: float):
+    rng = random.Random(0)
+    distinct = [rng.choice(TEMPLATES).format(noun=rng.choice(WORDS), amount=rng.randint(1, 30) / 10,
+                                             year=rng.randint(1950, 2024), a=rng.choice(COLUMNS),
+                                             b=rng.choice(COLUMNS)) + f" #{i}"
+                for i in range(max(1, int(size * unique)))]
+    return [rng.choice(distinct) for _ in range(size)]
+
+
+def timed(label: str, fn, corpus):
+    start = time.perf_counter()
+    for question in corpus:
+        fn(question)
+    elapsed = time.perf_counter() - start
+    print(f"{label:26s}: {elapsed:7.3f} s   {len(corpus) / elapsed / 1e3:8.1f} k questions/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200_000)
+    parser.add_argument("--unique", type=float, default=0.01, help="share of distinct question texts")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.questions, args.unique)
+    print(f"corpus: {len(corpus):,} questions, {len(set(corpus)):,} distinct, "
+          f"{sum(len(i.phrases) for i in router.intents)} phrases in {len(router.intents)} intents")
+
+    timed("legacy substring chain", legacy_route, corpus)
+    uncached = IntentRouter(cache_size=0)
+    for intent in router.intents:
+        uncached.register(intent.name, *intent.phrases, priority=intent.priority)
+    timed("router, no cache", lambda q: uncached.classify(q, COLUMNS), corpus)
+    timed("router, cached", lambda q: router.classify(q, COLUMNS), corpus)
+    print(f"cache: {router.cache_info()}")
+
+    wrong = sum(legacy_route(q) != router.classify(q).intent for q in set(corpus))
+    print(f"legacy chain disagrees with the router on {wrong:,} of {len(set(corpus)):,} distinct questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sniffing readers vs the extension-based pandas readers
+
+Writes a synthetic table (an id, a year, three numeric measures, a label
+and a free-text note) as CSV, JSON Lines, a JSON array of records and, when
+an xlsx writer is installed, xlsx, at each requested size. Every file is
+then parsed by the reader the generic handler used to call for its
+extension (``pd.read_csv`` / ``pd.read_json`` / ``pd.read_excel`` with
+default engines), by ``read_frame`` on every column and by ``read_frame``
+projected onto the two columns a correlation question names. Throughput is
+file MB per second (best of ``--repeat``). Which engines ``read_frame`` can
+use (pyarrow, orjson, python-calamine) is printed first. The run stops when
+a fast engine a measured format needs is missing, since it would only time
+the pandas fallback; ``--allow-fallback`` measures the fallback anyway.
+
+Usage: python benchmarks/bench_readers.py [--rows 10000,100000,1000000] [--formats csv,jsonl,json,xlsx] [--repeat 3]
+       [--allow-fallback]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from analyst.readers import available, read_frame, sniff_path
+
+PROJECTED = ["x", "y"]
+FAST_ENGINES = {"csv": "pyarrow", "jsonl": "pyarrow", "json": "orjson", "xlsx": "python_calamine"}
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=rows)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "year": rng.integers(1990, 2024, rows),
+        "x": x.round(6),
+        "y": (0.5 * x + rng.normal(size=rows)).round(6),
+        "z": rng.random(rows).round(6),
+        "label": np.array(["north", "south", "east", "west"])[rng.integers(0, 4, rows)],
+        "note": [f"row {i} of the synthetic upload" for i in range(rows)],
+    })
+
+
+def write(df: pd.DataFrame, fmt: str, directory: str) -> str:
+    path = os.path.join(directory, f"data-{len(df)}.{fmt}")
+    if not os.path.exists(path):
+        if fmt == "csv":
+            df.to_csv(path, index=False)
+        elif fmt == "jsonl":
+            df.to_json(path, orient="records", lines=True)
+        elif fmt == "json":
+            df.to_json(path, orient="records")
+        elif fmt == "xlsx":
+            df.to_excel(path, index=False)
+    return path
+
+
+def legacy(path: str, fmt: str) -> pd.DataFrame:
+    """What the generic handler ran for the file's extension"""
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "jsonl":
+        return pd.read_json(path, lines=True)
+    if fmt == "json":
+        return pd.read_json(path)
+    return pd.read_excel(path)
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000,1000000", help="comma-separated sizes, e.g. 1e4,1e6")
+    parser.add_argument("--formats", default="csv,jsonl,json,xlsx")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "bench-readers"),
+                        help="fixture directory (reused)")
+    parser.add_argument("--allow-fallback", action="store_true",
+                        help="measure formats whose fast engine is not installed")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    engines = {m: available(m) for m in ("pyarrow", "orjson", "python_calamine", "openpyxl")}
+    print("engines: " + ", ".join(f"{m}={'yes' if ok else 'no'}" for m, ok in engines.items()))
+    formats = [f for f in args.formats.split(",") if f]
+    if "xlsx" in formats and not engines["openpyxl"]:
+        print("xlsx: skipped (no xlsx writer installed)")
+        formats.remove("xlsx")
+    missing = sorted({FAST_ENGINES[f] for f in formats if f in FAST_ENGINES and not engines[FAST_ENGINES[f]]})
+    if missing and not args.allow_fallback:
+        sys.exit(f"Not installed: {', '.join(missing)} (see requirements.txt); "
+                 "pass --allow-fallback to measure the pandas fallback")
+
+    print(f"{'file':18s} {'MB':>8s} {'legacy MB/s':>12s} {'sniffed MB/s':>13s} {'projected MB/s':>15s}")
+    for rows in (int(float(r)) for r in args.rows.split(",")):
+        df = make_frame(rows)
+        for fmt in formats:
+            path = write(df, fmt, args.dir)
+            size = os.path.getsize(path) / 1e6
+            sniffed = sniff_path(path)
+            timings = [
+                best_of(lambda: legacy(path, fmt), args.repeat),
+                best_of(lambda: read_frame(path, sniffed), args.repeat),
+                best_of(lambda: read_frame(path, sniffed, PROJECTED), args.repeat),
+            ]
+            print(f"{fmt + ':' + f'{rows:,}':18s} {size:8.1f} " + " ".join(
+                f"{size / t:{w}.1f}" for t, w in zip(timings, (12, 13, 15))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Agg-canvas scatterplot renderer vs the original pyplot path
+
+Reports renders per second and data URI size for several point counts.
+
+Usage: python benchmarks/bench_render.py [--repeat 10]
+"""
+
+import argparse
+import base64
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from analyst.render import scatterplot_uri
+
+
+def legacy_scatterplot(x: np.ndarray, y: np.ndarray) -> str:
+    """The pyplot + bbox_inches='tight' path create_scatterplot used to take"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.scatter(x, y, alpha=0.6, s=20)
+    z = np.polyfit(x, y, 1)
+    ax.plot(x, np.poly1d(z)(x), "r--", alpha=0.8, linewidth=2)
+    ax.set_xlabel("x")
+    ax.set_ylabel("y")
+    ax.set_title("y vs x")
+    ax.grid(True, alpha=0.3)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=80, bbox_inches="tight")
+    plt.close(fig)
+    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+
+def run(fn, x, y, repeat: int):
+    fn(x, y)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        uri = fn(x, y)
+    elapsed = time.perf_counter() - start
+    return repeat / elapsed, len(uri)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'points':>10} {'renderer':>10} {'renders/s':>10} {'uri bytes':>10}")
+    for n in (50, 10_000, 200_000):
+        x = rng.random(n) * 100
+        y = 2 * x + rng.normal(0, 20, n)
+        for name, fn in (("agg", lambda a, b: scatterplot_uri(a, b, "x", "y")),
+                         ("pyplot", legacy_scatterplot)):
+            rate, size = run(fn, x, y, args.repeat if n < 100_000 else max(1, args.repeat // 5))
+            print(f"{n:>10,} {name:>10} {rate:>10.1f} {size:>10,}")
+
+
+if __name__ == "__main__":
+    main()
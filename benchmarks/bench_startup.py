@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start cost of the Vercel entry point
+
+Imports api/index.py in fresh interpreters and reports import time, peak
+RSS after import and the latency of the first /health call. With
+``--max-import-ms`` / ``--max-rss-mb`` the run exits non-zero on regression.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--warmup] [--max-import-ms 800]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {api!r})
+start = time.perf_counter()
+import index
+imported = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+from fastapi.testclient import TestClient
+client = TestClient(index.app)
+t = time.perf_counter()
+client.get("/health")
+health = time.perf_counter() - t
+print(json.dumps({{"import_ms": (imported - start) * 1000, "rss_mb": rss / 1024, "health_ms": health * 1000}}))
+"""
+
+
+def run_once(warmup: bool) -> dict:
+    env = dict(os.environ, ANALYST_WARMUP="1" if warmup else "0")
+    out = subprocess.run([sys.executable, "-c", PROBE.format(api=os.path.join(ROOT, "api"))],
+                         capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="boot with ANALYST_WARMUP=1")
+    parser.add_argument("--max-import-ms", type=float)
+    parser.add_argument("--max-rss-mb", type=float)
+    args = parser.parse_args()
+
+    samples = [run_once(args.warmup) for _ in range(args.runs)]
+    summary = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+    print(f"import: {summary['import_ms']:.0f} ms   rss: {summary['rss_mb']:.0f} MB   "
+          f"first /health: {summary['health_ms']:.1f} ms   (median of {args.runs})")
+
+    failed = []
+    if args.max_import_ms is not None and summary["import_ms"] > args.max_import_ms:
+        failed.append(f"import time {summary['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_rss_mb is not None and summary["rss_mb"] > args.max_rss_mb:
+        failed.append(f"RSS {summary['rss_mb']:.0f} MB > {args.max_rss_mb:.0f} MB")
+    if failed:
+        print("REGRESSION: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
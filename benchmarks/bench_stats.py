@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming statistics kernels vs materialised numpy/pandas
+
+Computes what the court and scatterplot answers need on synthetic
+(year, x, y) data: the global OLS slope/intercept and Pearson r of y on x,
+and per-year means with the slope of those yearly means. The kernel path
+generates and folds 1M-row chunks into ``Bivariate``/``GroupedBivariate``
+(optionally split over worker processes and merged); the baseline path
+materialises every column, then calls ``np.polyfit``, ``np.corrcoef`` and a
+pandas groupby. Each path runs in a fresh process so peak RSS is comparable,
+and the answers are checked against each other. The default 100M rows need
+about 6 GB of RAM for the baseline path (``--skip-numpy`` to leave it out).
+
+Usage: python benchmarks/bench_stats.py [--rows 100000000] [--chunk 1000000] [--processes 1] [--skip-numpy]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from analyst.stats import Bivariate, GroupedBivariate
+
+
+def chunk(start: int, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows ``start .. start + size`` of the synthetic dataset (deterministic per chunk)"""
+    rng = np.random.default_rng(start)
+    year = rng.integers(2012, 2023, size)
+    x = rng.gamma(2.0, 150.0, size)
+    y = 0.4 * x + 12.0 * (year - 2012) + rng.normal(0, 40, size)
+    return year, x, y
+
+
+def summarize(slope: float, intercept: float, r: float, yearly: pd.Series) -> Dict[str, float]:
+    trend = np.polyfit(yearly.index.to_numpy(dtype="float64"), yearly.to_numpy(), 1)[0]
+    return {"slope": slope, "intercept": intercept, "r": r, "yearly_trend": float(trend),
+            **{f"mean_{year}": float(v) for year, v in yearly.items()}}
+
+
+def fold(bounds: Tuple[int, int, int]) -> Tuple[Bivariate, GroupedBivariate]:
+    begin, end, size = bounds
+    overall, by_year = Bivariate(), GroupedBivariate()
+    for start in range(begin, end, size):
+        year, x, y = chunk(start, min(size, end - start))
+        overall.update(x, y)
+        by_year.update(year, x, y)
+    return overall, by_year
+
+
+def kernels(rows: int, size: int, processes: int) -> Dict[str, float]:
+    if processes > 1:
+        step = -(-rows // processes // size) * size
+        parts = [(b, min(b + step, rows), size) for b in range(0, rows, step)]
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(fold, parts))
+        overall, by_year = results[0]
+        for other, grouped in results[1:]:
+            overall.merge(other)
+            by_year.merge(grouped)
+    else:
+        overall, by_year = fold((0, rows, size))
+    slope, intercept = overall.regression()
+    # Mean delay per year is the mean of y within each year group
+    yearly = by_year.frame()["mean_y"].sort_index()
+    return summarize(slope, intercept, overall.corr(), yearly)
+
+
+def materialised(rows: int, size: int) -> Dict[str, float]:
+    parts = [chunk(start, min(size, rows - start)) for start in range(0, rows, size)]
+    year, x, y = (np.concatenate(column) for column in zip(*parts))
+    del parts
+    slope, intercept = np.polyfit(x, y, 1)
+    r = np.corrcoef(x, y)[0, 1]
+    yearly = pd.DataFrame({"year": year, "y": y}).groupby("year")["y"].mean()
+    return summarize(float(slope), float(intercept), float(r), yearly)
+
+
+def measure(name: str, rows: int, size: int, processes: int):
+    start = time.perf_counter()
+    result = kernels(rows, size, processes) if name == "kernels" else materialised(rows, size)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux; worker processes are reported separately
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return elapsed, max(rss, children), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=lambda v: int(float(v)), default=100_000_000)
+    parser.add_argument("--chunk", type=lambda v: int(float(v)), default=1_000_000)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes for the kernel path")
+    parser.add_argument("--skip-numpy", action="store_true")
+    args = parser.parse_args()
+
+    runs = [("kernels", f"streaming kernels ({args.processes} proc)")]
+    if not args.skip_numpy:
+        runs.append(("numpy", "materialised numpy"))
+    results = {}
+    print(f"{args.rows:,} rows in chunks of {args.chunk:,}")
+    for name, label in runs:
+        # A fresh (non-daemonic) process per path, so it may start its own workers
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            elapsed, rss, results[name] = pool.submit(measure, name, args.rows, args.chunk, args.processes).result()
+        print(f"{label:28s}: {elapsed:8.2f} s   peak RSS {rss:8.1f} MB   "
+              f"slope={results[name]['slope']:.6f} r={results[name]['r']:.6f} "
+              f"yearly trend={results[name]['yearly_trend']:.4f}")
+
+    if len(results) == 2:
+        worst = max(abs(results["kernels"][k] - v) / max(1.0, abs(v)) for k, v in results["numpy"].items())
+        print(f"largest relative difference between the paths: {worst:.2e}")
+
+
+if __name__ == "__main__":
+    main()
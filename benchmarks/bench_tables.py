@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-pass lxml table extraction vs BeautifulSoup + read_html
+
+Usage: python benchmarks/bench_tables.py [--tables 20] [--rows 2000] [--cols 8] [--repeat 5]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from analyst.tables import read_table
+
+
+def make_page(tables: int, rows: int, cols: int) -> str:
+    """Build a Wikipedia-like page with many footnoted tables; the last one is the target"""
+    parts = ["<html><body>"]
+    for t in range(tables):
+        cls = "wikitable" if t == tables - 1 else "infobox"
+        parts.append(f'<table class="{cls}"><caption>Table {t}</caption><tr>')
+        parts.extend(f"<th>Col{c}</th>" for c in range(cols))
+        parts.append("</tr>")
+        for r in range(rows):
+            parts.append("<tr>")
+            for c in range(cols):
+                if c == 0:
+                    parts.append(f'<th scope="row">Item {r}<sup class="reference">[{r % 9}]</sup></th>')
+                else:
+                    parts.append(f"<td>${r * c:,}</td>")
+            parts.append("</tr>")
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def legacy(html: str) -> pd.DataFrame:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    tables = soup.find_all("table", {"class": "wikitable"}) or soup.find_all("table")
+    return pd.read_html(io.StringIO(str(tables[0])))[0]
+
+
+def timed(fn, html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    html = make_page(args.tables, args.rows, args.cols)
+    print(f"page: {len(html) / 1e6:.1f} MB, {args.tables} tables x {args.rows} rows x {args.cols} cols")
+
+    new = timed(read_table, html, args.repeat)
+    print(f"lxml single pass      : {new * 1000:8.1f} ms")
+    try:
+        old = timed(legacy, html, args.repeat)
+    except ImportError:
+        print("BeautifulSoup not installed; skipping legacy path")
+        return
+    print(f"bs4 + read_html       : {old * 1000:8.1f} ms")
+    print(f"speedup               : {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -88,10 +88,10 @@ def test_deployment(url):
     print(f"🧪 Testing deployed API at {url}...")
     
     try:
-        import requests
+        import httpx
         
         # Test health endpoint
-        health_response = requests.get(f"{url}/health", timeout=10)
+        health_response = httpx.get(f"{url}/health", timeout=10)
         if health_response.status_code == 200:
             print("✅ Health check passed")
         else:
@@ -113,7 +113,7 @@ Answer the following questions and respond with a JSON array of strings containi
 """
         
         files = {"questions": ("questions.txt", test_question, "text/plain")}
-        api_response = requests.post(f"{url}/api/", files=files, timeout=180)
+        api_response = httpx.post(f"{url}/api/", files=files, timeout=180)
         
         if api_response.status_code == 200:
             result = api_response.json()
@@ -1,15 +1,47 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+import os
+import sys
+from typing import Optional
+
+from fastapi import FastAPI, File, Header, UploadFile
+from fastapi.responses import PlainTextResponse
+
+# Deployed from the repository root (see tds-project-2/vercel.json): make
+# this app's ``app`` package and the shared ``analyst`` package importable
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (APP_DIR, os.path.dirname(APP_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
 from app.agent import process_question_file
+from analyst.fetch import close_client
+from analyst.metrics import render
+from analyst.responses import request_key, response_cache
+from analyst.serialize import dumps, respond
 
 app = FastAPI()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_client()
+
 @app.get("/")
 def home():
     return {"message": "Vercel is working and FastAPI is live!"}
 
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/")
-async def analyze(question_file: UploadFile = File(...), attachments: list[UploadFile] = File(default=[])):
+async def analyze(question_file: UploadFile = File(...), attachments: list[UploadFile] = File(default=[]),
+                  accept_encoding: Optional[str] = Header(None, include_in_schema=False)):
     content = await question_file.read()
-    answers = await process_question_file(content.decode(), attachments)
-    return JSONResponse(content=answers)
+    # Answers are a dict keyed by question, so they are cached apart from the root app's lists
+    key = await request_key(content, [("attachments", f) for f in attachments], namespace="tds")
+
+    async def compute():
+        answers = await process_question_file(content.decode(), attachments)
+        return dumps(answers), "error" not in answers
+
+    body, cache_status = await response_cache.get_or_compute(key, compute)
+    return respond(body, accept_encoding, headers={"X-Cache": cache_status})
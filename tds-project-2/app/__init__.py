@@ -0,0 +1,3 @@
+"""
+Agent package; the shared ``analyst`` package it uses lives at the repository root
+"""
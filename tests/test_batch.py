@@ -0,0 +1,77 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from analyst import handlers
+from analyst.batch import BatchItem, parse_items, run_batch, schedule, source_key
+from analyst.deadline import TIMEOUT_PLACEHOLDER, Deadline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_items_from_files_and_json_lines_are_grouped_by_source():
+    items = parse_items([("a.txt", b"Scrape https://example.org/films.\n1. Q?")],
+                        b'{"id": "b", "questions": "See https://example.org/films\\n1. Other?"}\n\n'
+                        b'{"questions": "Local data\\n1. Q?"}\n')
+    assert [item.id for item in items] == ["a.txt", "b", "2"]
+    keys = [source_key(item.questions.decode()) for item in items]
+    assert keys[0] == keys[1] != keys[2]
+    assert source_key("x", [b"digest"]) != source_key("x")
+    with pytest.raises(ValueError):
+        parse_items([], b'{"id": 1}')
+
+    batch = [BatchItem(str(n), b"", source) for n, source in enumerate("aaab")]
+    assert [item.id for item in schedule(batch)] == ["0", "3", "1", "2"]
+
+
+def test_batch_deadline_is_shared_and_bounds_the_stream():
+    async def collect(items, run_item, grace):
+        lines = [json.loads(line) async for line in run_batch(items, run_item, concurrency=1,
+                                                               deadline=Deadline(0.05), grace=grace)]
+        return {line["id"]: line for line in lines}
+
+    async def slow(item):
+        await asyncio.sleep(0.1 if item.id == "a" else 10)
+        return b"[1]"
+
+    # "a" outlives the budget but finishes within the grace; "b" is never started
+    lines = asyncio.run(collect([BatchItem("a", b""), BatchItem("b", b"")], slow, grace=1.0))
+    assert lines["a"]["answers"] == [1]
+    assert lines["b"]["status"] == 408 and lines["b"]["error"] == TIMEOUT_PLACEHOLDER
+
+    # Nothing finishes in time: the stream still ends, with a line per item
+    lines = asyncio.run(collect([BatchItem("c", b""), BatchItem("d", b"")], slow, grace=0.0))
+    assert {line["status"] for line in lines.values()} == {408} and set(lines) == {"c", "d"}
+
+
+def test_batch_endpoint_loads_a_shared_upload_once(monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(ROOT, "api"))
+    monkeypatch.delitem(sys.modules, "index", raising=False)
+    import index
+
+    calls = []
+    read = handlers.read_data_file
+
+    def counting_read(path, filename, questions=()):
+        calls.append(questions)
+        return read(path, filename, questions)
+
+    monkeypatch.setattr(handlers, "read_data_file", counting_read)
+    variants = [f"Analyse the data (variant {n})\n1. What is the correlation between x and y?" for n in range(6)]
+    files = [("questions", (f"q{n}.txt", text.encode())) for n, text in enumerate(variants[:5])]
+    files.append(("items", ("items.jsonl", json.dumps({"id": "last", "questions": variants[5]}).encode())))
+    files.append(("data_file", ("data.csv", b"x,y\n1,2\n2,4\n3,7\n")))
+
+    response = TestClient(index.app).post("/api/batch", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["id"] for line in lines) == ["last", "q0.txt", "q1.txt", "q2.txt", "q3.txt", "q4.txt"]
+    assert len({line["source"] for line in lines}) == 1
+    assert all(line["answers"][0] == pytest.approx(0.9933, abs=1e-4) for line in lines)
+    # One load for the whole batch, without a per-item column projection
+    assert calls == [()]
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_api import compare, rows_label
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    params = {"requests": 20}
+    base = {"rps": 10.0, "p50_ms": 100.0, "p90_ms": 200.0, "rss_mb": 100.0, "params": params}
+    baseline = {"workloads": {"w": base, "other": dict(base, params={"requests": 5})}}
+    faster = dict(base, rps=20.0, p50_ms=50.0)
+    assert compare({"w": faster}, baseline, 0.3) == []
+    slower = dict(base, rps=6.0, p90_ms=300.0, rss_mb=120.0)
+    regressions = compare({"w": slower}, baseline, 0.3)
+    assert [r.split()[1] for r in regressions] == ["rps", "p90_ms"]
+    # Runs with different parameters are not comparable
+    assert compare({"other": slower}, baseline, 0.3) == []
+
+
+def test_rows_label():
+    assert [rows_label(n) for n in (100_000, 1_000_000, 100_000_000, 1234)] == ["100k", "1M", "100M", "1234"]
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import stat
+import threading
+
+import pandas as pd
+import pytest
+
+from analyst import cache
+from analyst.fetch import FetchResult
+
+
+def _responses(monkeypatch, results):
+    calls = []
+
+    async def fake_fetch(url, headers=None, timeout=None):
+        calls.append(headers)
+        return results.pop(0)
+
+    monkeypatch.setattr(cache, "fetch", fake_fetch)
+    return calls
+
+
+def test_memory_hit_skips_network(monkeypatch, tmp_path):
+    calls = _responses(monkeypatch, [FetchResult("u", 200, {"etag": '"v1"'}, b"<table/>")])
+    pc = cache.PageCache(directory=str(tmp_path))
+    asyncio.run(pc.get_page("u"))
+    asyncio.run(pc.get_page("u"))
+    assert len(calls) == 1
+    assert pc.stats()["memory_hits"] == 1
+
+
+def test_stale_entry_revalidates_and_keeps_frames(monkeypatch, tmp_path):
+    calls = _responses(monkeypatch, [
+        FetchResult("u", 200, {"etag": '"v1"'}, b"<table/>"),
+        FetchResult("u", 304, {}, b""),
+    ])
+    pc = cache.PageCache(directory=str(tmp_path), ttl=0)
+    page = asyncio.run(pc.get_page("u"))
+    asyncio.run(pc.put_frame(page, pd.DataFrame({"a": [1, 2]})))
+    page = asyncio.run(pc.get_page("u"))
+    assert calls[1] == {"If-None-Match": '"v1"'}
+    assert pc.get_frame(page)["a"].tolist() == [1, 2]
+    assert pc.stats()["revalidated"] == 1
+
+
+def test_disk_tier_survives_new_instance(monkeypatch, tmp_path):
+    _responses(monkeypatch, [FetchResult("u", 200, {}, b"<table/>")])
+    pc = cache.PageCache(directory=str(tmp_path))
+    asyncio.run(pc.get_page("u"))
+
+    fresh = cache.PageCache(directory=str(tmp_path))
+    assert asyncio.run(fresh.get_page("u")).content == b"<table/>"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_frames_are_stored_as_parquet(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    _responses(monkeypatch, [FetchResult("u", 200, {}, b"<table/>")])
+    pc = cache.PageCache(directory=str(tmp_path))
+    page = asyncio.run(pc.get_page("u"))
+    asyncio.run(pc.put_frame(page, pd.DataFrame({"a": [1]}), headers=[["a"]]))
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".parquet")]
+
+    fresh = cache.PageCache(directory=str(tmp_path))
+    page = asyncio.run(fresh.get_page("u"))
+    assert page.headers == [["a"]]
+    assert fresh.get_frame(page)["a"].tolist() == [1]
+
+
+def test_cache_directory_is_private(monkeypatch, tmp_path):
+    _responses(monkeypatch, [FetchResult("u", 200, {}, b"<table/>"), FetchResult("u", 200, {}, b"<table/>")])
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    os.chmod(shared, 0o777)
+    asyncio.run(cache.PageCache(directory=str(shared)).get_page("u"))
+    assert stat.S_IMODE(os.stat(shared).st_mode) == 0o700
+
+    # Someone else's directory is never read or written
+    monkeypatch.setattr(cache.os, "getuid", lambda: os.stat(shared).st_uid + 1)
+    pc = cache.PageCache(directory=str(shared))
+    asyncio.run(pc.get_page("u"))
+    assert pc.directory is None and pc.stats()["disk_hits"] == 0
+
+
+def test_disk_tier_runs_off_the_loop_and_trims_by_a_running_total(monkeypatch, tmp_path):
+    pages = {f"u{n}": FetchResult(f"u{n}", 200, {}, b"x" * 1000) for n in range(6)}
+
+    async def fake_fetch(url, headers=None, timeout=None):
+        return pages[url]
+
+    monkeypatch.setattr(cache, "fetch", fake_fetch)
+    pc = cache.PageCache(directory=str(tmp_path), max_disk_bytes=3000)
+    threads, scans = [], []
+    store, scan = pc._store, pc._scan_disk
+    monkeypatch.setattr(pc, "_store", lambda *args: threads.append(threading.current_thread()) or store(*args))
+    monkeypatch.setattr(pc, "_scan_disk", lambda: scans.append(1) or scan())
+
+    async def main():
+        for url in pages:
+            await pc.get_page(url)
+
+    asyncio.run(main())
+    assert threads and threading.main_thread() not in threads
+    on_disk = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    assert on_disk <= 3000 and pc._disk_bytes == on_disk
+    # Listed once to count, then only when a write went over the cap
+    assert 1 < len(scans) < len(pages) * 2
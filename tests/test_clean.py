@@ -0,0 +1,37 @@
+import pandas as pd
+
+from analyst import clean
+from analyst.clean import clean_data, infer_schema
+
+
+def _frame():
+    return pd.DataFrame({
+        "Rank": ["1", "2", "3", None],
+        "Title": ["Avatar", "Titanic", "Frozen", None],
+        "Worldwide gross": ["$2,923,706,026", "$2,257,844,554[a]", "$1,290,000,000", None],
+        "Year": ["2009", "1997", "2013", None],
+        "Released": ["2009-12-18", "1997-12-19", "2013-11-27", None],
+        "Studio": ["Fox", "Fox", "Fox", None],
+    })
+
+
+def test_infers_types_and_keeps_text():
+    df = clean_data(_frame())
+    assert df.attrs["schema"] == {
+        "Rank": "integer", "Title": "text", "Worldwide gross": "currency",
+        "Year": "year", "Released": "date", "Studio": "categorical",
+    }
+    assert len(df) == 3
+    assert df["Title"].tolist() == ["Avatar", "Titanic", "Frozen"]
+    assert df["Year"].dtype == "int32"
+    assert df["Worldwide gross"].tolist() == [2923706026.0, 2257844554.0, 1290000000.0]
+    assert str(df["Studio"].dtype) == "category"
+
+
+def test_schema_cached_per_source(monkeypatch):
+    clean_data(_frame(), source="https://example.org/films")
+    calls = []
+    monkeypatch.setattr(clean, "infer_schema", lambda df: calls.append(df) or infer_schema(df))
+    df = clean_data(_frame(), source="https://example.org/films")
+    assert not calls
+    assert df["Rank"].tolist() == [1, 2, 3]
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyst.clean import clean_data
+from analyst.compact import compact_column, compact_frame
+
+
+def test_numbers_narrow_only_when_exact():
+    assert compact_column(pd.Series([1, 2009, -5])).dtype == "int32"
+    assert compact_column(pd.Series([1, 2 ** 40])).dtype == "int64"
+    assert compact_column(pd.Series([0.5, 1.25, np.nan])).dtype == "float32"
+    assert compact_column(pd.Series([0.1, 2.0])).dtype == "float64"
+    assert compact_column(pd.Series([2923706026.0])).dtype == "float64"
+
+
+def test_text_becomes_categorical_or_stays_text():
+    studios = pd.Series(["Fox", "Disney", "Fox", "Fox", None, "Disney"], dtype=object)
+    assert isinstance(compact_column(studios).dtype, pd.CategoricalDtype)
+    titles = pd.Series(["Avatar", "Titanic", "Frozen"], dtype=object)
+    assert compact_column(titles).tolist() == ["Avatar", "Titanic", "Frozen"]
+
+
+def test_unique_text_becomes_arrow_strings():
+    pytest.importorskip("pyarrow")
+    titles = pd.DataFrame({"title": [f"Film {i}" for i in range(100)]}, dtype=object)
+    compacted = compact_frame(titles)
+    assert compacted["title"].dtype == pd.StringDtype("pyarrow")
+    assert compacted["title"].dtype.storage == "pyarrow"
+    assert compacted["title"].tolist() == titles["title"].tolist()
+
+
+def test_compact_frame_saves_memory_and_keeps_results():
+    rng = np.random.default_rng(0)
+    n = 20000
+    df = pd.DataFrame({"year": rng.integers(1990, 2024, n), "score": rng.integers(0, 100, n) / 4,
+                       "x": rng.normal(size=n), "genre": rng.choice(["drama", "comedy", "horror"], n).astype(object)})
+    df.attrs["schema"] = {"year": "year"}
+    small = compact_frame(df)
+    assert small.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum() / 2
+    assert small.attrs["schema"] == {"year": "year"}
+    assert small[["year", "score", "x"]].corr().round(12).equals(df[["year", "score", "x"]].corr().round(12))
+    assert (small["year"] + 100).max() == df["year"].max() + 100
+    assert (small["genre"] == "drama").sum() == (df["genre"] == "drama").sum()
+
+
+def test_clean_data_can_skip_compaction():
+    df = clean_data(pd.DataFrame({"n": ["1", "2", "3"]}), compact=False)
+    assert df["n"].dtype == "int64"
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import threading
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyst import handlers, render
+from analyst.court import MissingColumns, busiest_court, open_dataset, yearly_delay
+from analyst.readers import Sniffed
+
+
+@pytest.fixture
+def court_frame():
+    rng = np.random.default_rng(0)
+    n = 5_000
+    registered = pd.Timestamp("2016-01-01") + pd.to_timedelta(rng.integers(0, 2_000, n), unit="D")
+    decided = registered + pd.to_timedelta(rng.integers(0, 700, n), unit="D")
+    return pd.DataFrame({
+        "court": rng.choice(["33_10", "1_12", "7_26"], n, p=[0.3, 0.5, 0.2]),
+        "date_of_registration": registered.strftime("%d-%m-%Y"),
+        "decision_date": decided.date,
+    })
+
+
+def write_parquet(df, path, partitioned=False):
+    con = duckdb.connect()
+    con.register("frame", df)
+    if partitioned:
+        con.execute(f"COPY (SELECT *, year(decision_date) AS year FROM frame) TO '{path}' "
+                    "(FORMAT parquet, PARTITION_BY (year))")
+    else:
+        con.execute(f"COPY frame TO '{path}' (FORMAT parquet, ROW_GROUP_SIZE 1000)")
+
+
+def expected(df):
+    df = df.copy()
+    decided = pd.to_datetime(df["decision_date"])
+    df["delay_days"] = (decided - pd.to_datetime(df["date_of_registration"], format="%d-%m-%Y")).dt.days
+    df["year"] = decided.dt.year
+    busiest = df[df["year"].between(2019, 2022)].groupby("court").size().idxmax()
+    yearly = df[df["court"] == "33_10"].groupby("year")["delay_days"].mean().reset_index()
+    return busiest, yearly, np.polyfit(yearly["year"], yearly["delay_days"], 1)[0]
+
+
+@pytest.mark.parametrize("partitioned", [False, True])
+def test_matches_pandas(court_frame, tmp_path, partitioned):
+    if partitioned:
+        source = tmp_path / "dataset"
+        write_parquet(court_frame, source, partitioned=True)
+        source = f"{source}/*/*.parquet"
+    else:
+        source = tmp_path / "court.parquet"
+        write_parquet(court_frame, source)
+    dataset = open_dataset(str(source))
+
+    busiest, yearly, slope = expected(court_frame)
+    assert busiest_court(dataset, 2019, 2022) == busiest
+    years, delays, fitted = yearly_delay(dataset, "33_10")
+    assert years == yearly["year"].tolist()
+    assert np.allclose(delays, yearly["delay_days"])
+    assert fitted == pytest.approx(slope)
+
+
+def test_year_column_in_the_data_is_not_a_partition(court_frame, tmp_path):
+    # A "year" stored in the file (here the registration year) must not filter decisions
+    df = court_frame.assign(year=pd.to_datetime(court_frame["date_of_registration"], format="%d-%m-%Y").dt.year)
+    write_parquet(df, tmp_path / "court.parquet")
+    dataset = open_dataset(str(tmp_path / "court.parquet"))
+    assert dataset.partitions == ()
+    assert busiest_court(dataset, 2019, 2022) == expected(court_frame)[0]
+    assert busiest_court(dataset, 2022, 2022) == expected(court_frame[
+        pd.to_datetime(court_frame["decision_date"]).dt.year == 2022])[0]
+
+    write_parquet(court_frame, tmp_path / "dataset", partitioned=True)
+    assert open_dataset(f"{tmp_path / 'dataset'}/*/*.parquet").partitions == ("year",)
+
+
+def test_missing_columns(court_frame, tmp_path):
+    source = tmp_path / "court.parquet"
+    write_parquet(court_frame.drop(columns="court"), source)
+    with pytest.raises(MissingColumns):
+        open_dataset(str(source))
+
+
+def test_parquet_and_csv_shards_are_one_table(court_frame, tmp_path):
+    shards = [court_frame.iloc[i::3] for i in range(3)]
+    write_parquet(shards[0], tmp_path / "a.parquet")
+    write_parquet(shards[1], tmp_path / "b.parquet")
+    shards[2].to_csv(tmp_path / "c.csv", index=False)
+    dataset = open_dataset([str(tmp_path / "a.parquet"), str(tmp_path / "b.parquet")],
+                           csv=[str(tmp_path / "c.csv")])
+
+    busiest, yearly, slope = expected(court_frame)
+    assert busiest_court(dataset, 2019, 2022) == busiest
+    years, delays, fitted = yearly_delay(dataset, "33_10")
+    assert years == yearly["year"].tolist()
+    assert np.allclose(delays, yearly["delay_days"])
+    assert fitted == pytest.approx(slope)
+
+
+
+def test_court_plot_is_drawn_off_the_event_loop(court_frame, tmp_path, monkeypatch):
+    write_parquet(court_frame, tmp_path / "court.parquet")
+    upload = type("Upload", (), {"filename": "court.parquet",
+                                 "file": io.BytesIO((tmp_path / "court.parquet").read_bytes())})
+    threads = []
+    scatterplot_image = render.scatterplot_image
+    monkeypatch.setattr(render, "scatterplot_image", lambda *args, **kwargs: threads.append(
+        threading.current_thread()) or scatterplot_image(*args, **kwargs))
+
+    busiest, _, slope = expected(court_frame)
+    answers = asyncio.run(handlers.court_answers([(upload, Sniffed("parquet"))], None))
+    assert answers[:2] == [busiest, round(slope, 4)]
+    assert answers[2].uri.startswith("data:image/png;base64,")
+    assert threads and threads[0] is not threading.main_thread()
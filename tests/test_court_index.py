@@ -0,0 +1,89 @@
+import os
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyst import court_index
+from analyst.court import busiest_court, open_dataset, yearly_delay
+from analyst.court_index import CourtIndex
+
+
+def judgments(n, seed, years=(2016, 2022)):
+    rng = np.random.default_rng(seed)
+    decided = pd.Timestamp(f"{years[0]}-01-01") + pd.to_timedelta(
+        rng.integers(0, 365 * (years[1] - years[0] + 1), n), unit="D")
+    registered = decided - pd.to_timedelta(rng.integers(0, 900, n), unit="D")
+    return pd.DataFrame({
+        "court": rng.choice(["33_10", "1_12", "7_26"], n, p=[0.4, 0.35, 0.25]),
+        "date_of_registration": registered.strftime("%d-%m-%Y"),
+        "decision_date": decided.date,
+    })
+
+
+def write_partitions(df, directory):
+    con = duckdb.connect()
+    con.register("frame", df)
+    con.execute(f"COPY (SELECT *, year(decision_date) AS year FROM frame) TO '{directory}' "
+                "(FORMAT parquet, PARTITION_BY (year), OVERWRITE_OR_IGNORE, FILENAME_PATTERN 'part-{uuid}')")
+
+
+def assert_same_answers(index, source):
+    dataset = open_dataset(source)
+    assert index.busiest_court(2019, 2022) == busiest_court(dataset, 2019, 2022)
+    years, delays, slope = yearly_delay(dataset, "33_10")
+    indexed_years, indexed_delays, indexed_slope = index.yearly_delay("33_10")
+    assert indexed_years == years
+    assert np.allclose(indexed_delays, delays)
+    assert indexed_slope == pytest.approx(slope)
+
+
+def test_index_matches_scan_and_refreshes_new_partitions(tmp_path):
+    data = tmp_path / "data"
+    source = f"{data}/*/*.parquet"
+    write_partitions(judgments(4_000, 0), data)
+    index = CourtIndex(source, str(tmp_path / "index"))
+    assert index.refresh() == 7
+    assert_same_answers(index, source)
+
+    # A later year arrives as a new partition; only it is scanned
+    write_partitions(judgments(1_000, 1, years=(2023, 2023)), data)
+    assert index.refresh() == 0
+    assert index.refresh(force=True) == 1
+    assert_same_answers(index, source)
+
+    # A fresh process starts from disk and scans nothing
+    reloaded = CourtIndex(source, str(tmp_path / "index"))
+    assert reloaded.refresh() == 0 and reloaded.counters["scanned_files"] == 0
+    assert_same_answers(reloaded, source)
+
+    # Removed partitions drop out of the index
+    for name in os.listdir(data / "year=2023"):
+        os.remove(data / "year=2023" / name)
+    reloaded.refresh(force=True)
+    assert reloaded.counters["dropped_files"] == 1
+    assert 2023 not in reloaded.yearly_delay("33_10")[0]
+
+
+def test_lookup_falls_back_when_the_index_cannot_be_built(tmp_path, monkeypatch):
+    monkeypatch.setattr(court_index, "_indexes", {})
+    before = court_index.counters["fallbacks"]
+    assert court_index.lookup(f"{tmp_path}/missing/*.parquet") is None
+    assert court_index.counters["fallbacks"] == before + 1
+
+
+def test_court_handler_answers_named_datasets_from_the_index(tmp_path, monkeypatch):
+    from analyst.handlers import court_queries
+
+    monkeypatch.setattr(court_index, "_indexes", {})
+    monkeypatch.setattr(court_index, "INDEX_DIR", str(tmp_path / "index"))
+    data = tmp_path / "data"
+    source = f"{data}/*/*.parquet"
+    write_partitions(judgments(2_000, 2), data)
+
+    busiest, (years, delays, slope) = court_queries([source], indexed=True)
+    assert court_index.court_index(source).counters["scanned_files"] == 7
+    scanned_busiest, (scanned_years, scanned_delays, scanned_slope) = court_queries([source])
+    assert busiest == scanned_busiest and years == scanned_years
+    assert np.allclose(delays, scanned_delays) and slope == pytest.approx(scanned_slope)
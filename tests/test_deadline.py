@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from analyst.deadline import Deadline, DeadlineExceeded
+
+import pytest
+
+
+def test_remaining_and_cap():
+    deadline = Deadline(10)
+    assert 9 < deadline.remaining() <= 10
+    assert deadline.remaining(cap=2) == 2
+    assert not deadline.expired
+
+
+def test_check_raises_timeout_error_when_spent():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    assert deadline.expired and deadline.elapsed() >= 0.02
+    with pytest.raises(asyncio.TimeoutError):
+        deadline.check("plotting")
+    with pytest.raises(DeadlineExceeded):
+        deadline.check("plotting")
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+from analyst.executor import PoolSaturated, WorkerPool
+
+
+def test_runs_on_worker_thread():
+    pool = WorkerPool(workers=2, max_queue=0)
+    name = asyncio.run(pool.run(lambda: threading.current_thread().name))
+    assert name.startswith("analysis")
+    pool.shutdown()
+
+
+def test_rejects_when_saturated():
+    pool = WorkerPool(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturated):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["outstanding"] == 0
+    pool.shutdown()
+
+
+def test_timeout_frees_slot_when_work_finishes():
+    pool = WorkerPool(workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(release.wait, timeout=0.05)
+        # Still running in the worker, so the slot is held
+        assert pool.stats()["outstanding"] == 1
+        release.set()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert pool.stats()["outstanding"] == 0
+    pool.shutdown()
+
+
+def test_timeout_raised_by_the_work_itself_without_a_budget():
+    pool = WorkerPool(workers=1, max_queue=0)
+
+    def slow_socket():
+        raise asyncio.TimeoutError("read timed out")
+
+    with pytest.raises(asyncio.TimeoutError, match="read timed out"):
+        asyncio.run(pool.run(slow_socket))
+    assert pool.stats()["timed_out"] == 0
+    pool.shutdown()
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from analyst import fetch
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def do_GET(self):
+        _Handler.hits[self.path] = _Handler.hits.get(self.path, 0) + 1
+        if self.path == "/flaky" and _Handler.hits[self.path] < 2:
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path == "/slow":
+            time.sleep(0.3)
+        body = b"<html>ok</html>"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def _run(coro):
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await fetch.close_client()
+    return asyncio.run(wrapper())
+
+
+def test_fetch_text(server):
+    assert _run(fetch.fetch_text(f"{server}/page")) == "<html>ok</html>"
+
+
+def test_fetch_retries_transient_status(server, monkeypatch):
+    monkeypatch.setattr(fetch, "BACKOFF", 0.01)
+    result = _run(fetch.fetch(f"{server}/flaky"))
+    assert result.status_code == 200
+    assert _Handler.hits["/flaky"] == 2
+
+
+def test_concurrent_fetches_overlap(server):
+    async def many():
+        return await asyncio.gather(*(fetch.fetch_text(f"{server}/slow") for _ in range(4)))
+
+    start = time.perf_counter()
+    assert len(_run(many())) == 4
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from analyst.ingest import summarize_file
+from analyst.readers import file_format
+from analyst.stats import PairwiseMoments, Reservoir
+
+
+def make_frame(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"x": rng.normal(size=n), "label": rng.choice(["a", "b"], n)})
+    df["y"] = 2 * df["x"] + rng.normal(size=n)
+    df.loc[::5, "y"] = np.nan
+    return df
+
+
+def test_moments_match_pandas_across_chunks_and_merge():
+    df = make_frame()[["x", "y"]]
+    left, right = PairwiseMoments(["x", "y"]), PairwiseMoments(["x", "y"])
+    for start in range(0, 10_000, 3_000):
+        left.update(df.iloc[start:min(start + 3_000, 10_000)])
+    right.update(df.iloc[10_000:] + 100)
+    right.update(df.iloc[:0])
+    merged = left.merge(right)
+
+    full = pd.concat([df.iloc[:10_000], df.iloc[10_000:] + 100])
+    assert abs(merged.corr("x", "y") - full["x"].corr(full["y"])) < 1e-9
+    assert abs(merged.var("y") - full["y"].var()) < 1e-9
+    assert merged.count("y") == full["y"].count()
+    complete = full.dropna()
+    slope, intercept = np.polyfit(complete["x"], complete["y"], 1)
+    fit = merged.regression("x", "y")
+    assert abs(fit["slope"] - slope) < 1e-9
+    assert abs(fit["intercept"] - intercept) < 1e-6
+
+
+def test_reservoir_is_bounded():
+    reservoir = Reservoir(size=100)
+    for start in range(0, 1_000, 250):
+        reservoir.update(pd.DataFrame({"v": np.arange(start, start + 250)}))
+    assert len(reservoir.sample) == 100
+    assert reservoir.sample["v"].is_unique
+
+
+def test_summarize_file_streams_csv(tmp_path):
+    df = make_frame()
+    path = tmp_path / "data.csv"
+    df.to_csv(path, index=False)
+
+    summary = summarize_file(str(path), file_format(path.name), chunk_rows=4_000, sample_rows=500)
+    assert summary.rows == len(df)
+    assert summary.numeric == ["x", "y"]
+    assert len(summary.sample) == 500
+    assert abs(summary.moments.corr("x", "y") - df["x"].corr(df["y"])) < 1e-9
+
+
+def test_summaries_of_shards_merge(tmp_path):
+    df = make_frame()
+    paths = [tmp_path / "a.csv", tmp_path / "b.csv"]
+    df.iloc[:15_000].to_csv(paths[0], index=False)
+    df.iloc[15_000:].to_csv(paths[1], index=False)
+
+    a, b = (summarize_file(str(p), "csv", chunk_rows=4_000, sample_rows=500, columns=["x", "y"]) for p in paths)
+    assert a.columns == ["x", "y"]
+    merged = a.merge(b, sample_rows=500)
+    assert merged.rows == len(df) and len(merged.sample) == 500
+    assert abs(merged.moments.corr("x", "y") - df["x"].corr(df["y"])) < 1e-9
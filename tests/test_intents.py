@@ -0,0 +1,44 @@
+import pytest
+
+from analyst.intents import IntentRouter, parse_threshold, parse_year_range, router, tasks
+
+COLUMNS = ["Rank", "Peak", "Title", "Worldwide gross", "Year"]
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("How many $2 bn movies were released before 2000?", "count"),
+    ("Which is the earliest film that grossed over $1.5 bn?", "earliest"),
+    ("What's the correlation between the Rank and Peak?", "correlation"),
+    ("Draw a scatterplot of Rank and Peak along with a dotted red regression line", "plot"),
+    ("Which country has the highest GDP?", None),
+    ("Plot the correlation of x and y", "plot"),
+])
+def test_intents(question, intent):
+    assert router.classify(question).intent == intent
+
+
+def test_parameters():
+    route = router.classify("How many $2 bn movies were released before 2000?", COLUMNS)
+    assert route.threshold == (">=", 2e9)
+    assert route.year_range == (None, 1999)
+    assert router.classify("earliest film that grossed over $1.5 bn").threshold == (">", 1.5e9)
+    assert router.classify("correlation between the Rank and Peak", COLUMNS).columns == ("Rank", "Peak")
+    assert parse_threshold("films under $500,000") == ("<", 5e5)
+    assert parse_year_range("cases between 2019 and 2022") == (2019, 2022)
+    assert parse_year_range("released in 1997") == (1997, 1997)
+
+
+def test_registry_and_cache():
+    custom = IntentRouter(cache_size=8)
+    custom.register("latest", "latest", "most recent", priority=5)
+    custom.register("sum", "total", "sum of", priority=1)
+    assert custom.classify("the most recent total").intent == "latest"
+    custom.classify("the most recent total")
+    assert custom.cache_info().hits == 1
+    custom.register("sum", "grand total", priority=9)
+    assert custom.classify("the grand total").intent == "sum"
+
+
+def test_tasks():
+    assert tasks.classify("Scrape https://en.wikipedia.org/wiki/List").intent == "wikipedia"
+    assert tasks.classify("The Indian high court judgement dataset").intent == "court"
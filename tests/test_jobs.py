@@ -0,0 +1,176 @@
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from analyst.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobQueueFull, SpooledUpload, report_progress
+from analyst.responses import MemoryBackend, ResponseCache, request_key
+from analyst.serialize import dumps
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Upload:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.file = io.BytesIO(data)
+
+    async def read(self):
+        return self.file.read()
+
+
+def api(monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(ROOT, "api"))
+    monkeypatch.delitem(sys.modules, "index", raising=False)
+    import index
+
+    return index
+
+
+async def settle(queue):
+    while queue.stats()["running"] or queue.stats()["pending"]:
+        await asyncio.sleep(0.001)
+
+
+def test_jobs_run_with_bounded_concurrency_and_report_progress():
+    async def main():
+        queue = JobQueue(workers=2)
+        running, peak = [0], [0]
+
+        def work(n):
+            async def run():
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                await asyncio.sleep(0.01)
+                report_progress(0, n)
+                running[0] -= 1
+                return [n]
+            return run
+
+        jobs = [queue.submit(f"k{n}", ["1. q"], work(n))[0] for n in range(5)]
+        await asyncio.sleep(0)
+        assert [job.status for job in jobs] == [RUNNING, RUNNING, QUEUED, QUEUED, QUEUED]
+        await settle(queue)
+        assert peak[0] == 2
+        assert [job.result for job in jobs] == [[n] for n in range(5)]
+        assert jobs[3].to_dict()["progress"] == {
+            "done": 1, "total": 1, "questions": [{"question": "1. q", "done": True, "answer": 3}]}
+
+    asyncio.run(main())
+
+
+def test_identical_payloads_share_a_job_until_it_fails():
+    async def main():
+        queue = JobQueue()
+        calls, cleaned = [], []
+
+        async def fail():
+            calls.append(1)
+            raise ValueError("boom")
+
+        job, created = queue.submit("same", [], fail)
+        again, created_again = queue.submit("same", [], fail, cleanup=lambda: cleaned.append(1))
+        assert created and not created_again and again is job and cleaned == [1]
+        await settle(queue)
+        assert job.status == FAILED and job.to_dict()["error"] == "boom"
+
+        # A failed job is replaced on resubmission
+        retry, created = queue.submit("same", [], fail)
+        assert created and retry.id != job.id
+        await settle(queue)
+        assert len(calls) == 2 and queue.stats()["deduplicated"] == 1
+
+    asyncio.run(main())
+
+
+def test_full_queue_rejects_and_finished_jobs_expire():
+    async def main():
+        queue = JobQueue(workers=1, max_pending=1, max_finished=1)
+
+        async def run():
+            return "ok"
+
+        cleaned = []
+        first = queue.submit("a", [], run)[0]
+        queue.submit("b", [], run)
+        with pytest.raises(JobQueueFull) as e:
+            queue.submit("c", [], run, cleanup=lambda: cleaned.append(1))
+        assert e.value.retry_after > 0 and cleaned == [1]
+        await settle(queue)
+        # Only the most recently finished job is retained
+        assert queue.get(first.id) is None
+        assert queue.find("b").status == DONE and queue.find("a") is None
+
+        queue.retention = 0
+        await asyncio.sleep(0.01)
+        assert queue.stats()["retained"] == 1 and queue.find("b") is None
+        assert queue.stats()["retained"] == 0
+
+    asyncio.run(main())
+
+
+def test_spooled_upload_outlives_the_request_file():
+    async def main():
+        upload = Upload("data.csv", b"a,b\n1,2\n")
+        spooled = await SpooledUpload.copy(upload)
+        upload.file.close()
+        assert spooled.filename == "data.csv" and spooled.path.endswith(".csv")
+        assert await spooled.read() == b"a,b\n1,2\n"
+        await spooled.seek(0)
+        assert await spooled.read(1) == b"a"
+        spooled.close()
+        assert not os.path.exists(spooled.path)
+
+    asyncio.run(main())
+
+
+def test_cached_results_fill_in_job_progress(monkeypatch):
+    index = api(monkeypatch)
+    questions = b"Analyse the data\n1. How many rows?\n2. What is the mean?"
+    monkeypatch.setattr(index, "job_queue", JobQueue())
+    monkeypatch.setattr(index, "response_cache", ResponseCache(MemoryBackend()))
+
+    async def main():
+        key = await request_key(questions, [("data_file", None), ("image_file", None)])
+        index.response_cache.backend.set(key, dumps([3, 2.5]), 60)
+        response = await index.submit_job(Upload("questions.txt", questions), None, None)
+        await settle(index.job_queue)
+        return index.job_queue.get(response.headers["Location"].rsplit("/", 1)[1])
+
+    job = asyncio.run(main())
+    assert job.status == DONE and job.result == [3, 2.5]
+    assert job.to_dict()["progress"]["done"] == 2
+    assert [q["answer"] for q in job.to_dict()["progress"]["questions"]] == [3, 2.5]
+
+
+def test_court_job_progress_lists_the_court_questions(monkeypatch):
+    from analyst.handlers import COURT_QUESTIONS
+
+    index = api(monkeypatch)
+    # No numbered questions: the court handler answers its standard three
+    questions = b"The Indian high court judgments dataset is on S3. Answer the usual questions."
+    monkeypatch.setattr(index, "job_queue", JobQueue())
+    monkeypatch.setattr(index, "response_cache", ResponseCache(MemoryBackend()))
+
+    async def main():
+        key = await request_key(questions, [("data_file", None), ("image_file", None)])
+        index.response_cache.backend.set(key, dumps(["33_10", 0.5, "plot"]), 60)
+        response = await index.submit_job(Upload("questions.txt", questions), None, None)
+        await settle(index.job_queue)
+        return index.job_queue.get(response.headers["Location"].rsplit("/", 1)[1])
+
+    progress = asyncio.run(main()).to_dict()["progress"]
+    assert progress["total"] == progress["done"] == 3
+    assert [q["question"] for q in progress["questions"]] == COURT_QUESTIONS
+    assert [q["answer"] for q in progress["questions"]] == ["33_10", 0.5, "plot"]
+
+
+def test_jobs_are_refused_where_they_cannot_run(monkeypatch):
+    index = api(monkeypatch)
+    monkeypatch.setattr(index, "JOBS_ENABLED", False)
+    client = TestClient(index.app)
+    assert client.post("/api/jobs", files={"questions": ("q.txt", b"1. Q?")}).status_code == 501
+    assert client.get("/api/jobs/anything").status_code == 501
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import re
+
+import pytest
+
+from analyst.executor import WorkerPool
+from analyst.metrics import STAGE_SECONDS, Counter, Histogram, Profile, register_collector, render, span
+
+
+def test_histogram_exposition():
+    hist = Histogram("test_seconds", "help", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        hist.observe(value, stage="x")
+    lines = list(hist.samples())
+    assert 'test_seconds_bucket{stage="x",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="x",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="x",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="x"} 4' in lines
+    counter = Counter("test_total", "help")
+    counter.inc(2, status=200)
+    assert list(counter.samples()) == ['test_total{status="200"} 2']
+
+
+def test_span_records_latency_and_errors():
+    before = STAGE_SECONDS.count(stage="unit")
+    with span("unit"):
+        pass
+    with pytest.raises(KeyError):
+        with span("unit"):
+            raise KeyError()
+    assert STAGE_SECONDS.count(stage="unit") == before + 2
+    assert 'analyst_stage_errors_total{stage="unit"}' in render()
+
+
+def test_profile_collects_worker_spans():
+    pool = WorkerPool(workers=2, max_queue=0)
+
+    def work(n):
+        with span("analysis", step="work") as attrs:
+            attrs["n"] = n
+        return n
+
+    async def scenario():
+        with Profile("stages") as profile:
+            with span("request"):
+                await asyncio.gather(pool.run(work, 1), pool.run(work, 2))
+        with span("request"):
+            await pool.run(work, 3)
+        return profile
+
+    profile = asyncio.run(scenario())
+    pool.shutdown()
+    report = profile.report()
+    assert sorted(s.get("n", 0) for s in report["stages"]) == [0, 1, 2]
+    assert set(report["stage_totals"]) == {"analysis", "request"}
+    assert any(s["thread"].startswith("analysis") for s in report["stages"])
+
+
+def test_cprofile_dump_and_bad_mode():
+    with Profile("cprofile") as profile:
+        sum(range(1000))
+    assert "function calls" in profile.report()["dump"]
+    with pytest.raises(ValueError):
+        Profile("bogus")
+
+
+def test_collectors_are_exported():
+    register_collector("unit", lambda: {"hits": 3, "backend": "memory", "flag": True})
+    text = render()
+    assert "analyst_unit_hits 3" in text
+    assert "analyst_unit_backend" not in text and "analyst_unit_flag" not in text
+
+
+@pytest.mark.parametrize("app", ["", "tds-project-2"])
+def test_metrics_route_is_deployed(app):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, app, "vercel.json")) as f:
+        routes = json.load(f)["routes"]
+    assert any(re.fullmatch(route["src"], "/metrics") for route in routes)
@@ -0,0 +1,122 @@
+import asyncio
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from analyst import handlers
+from analyst.intents import IntentRouter
+from analyst.pipeline import Engine, Request, Result, UnknownTask
+from analyst.scrape import ScrapedTables
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Upload:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.file = io.BytesIO(data)
+
+
+def films():
+    return pd.DataFrame({"Rank": [1, 2, 3], "Peak": [1, 1, 2], "Title": ["Avatar", "Titanic", "Frozen"],
+                         "Worldwide gross": [2.9e9, 2.2e9, 1.3e9], "Year": [2009, 1997, 2013]})
+
+
+def test_request_splits_questions_and_picks_attachments():
+    image, data = Upload("chart.png", b""), Upload("data.csv", b"a,b\n")
+    request = Request.parse("Analyse this.\n1. First?\n2. Second?\n", [None, image, data])
+    assert request.description == "Analyse this.\n" and request.questions == ["1. First?", "2. Second?"]
+    assert request.attachments == [image, data]
+    assert request.attachment() is data and request.attachment("parquet") is None
+
+
+def test_engine_routes_by_task_and_falls_back_to_default():
+    classifier = IntentRouter()
+    classifier.register("films", "films")
+    engine = Engine(classifier)
+
+    @engine.task("films")
+    async def films_task(request):
+        return Result(["films"], request.questions)
+
+    request = Request.parse("Other data\n1. Q?")
+    with pytest.raises(UnknownTask):
+        asyncio.run(engine.run(request))
+
+    @engine.task()
+    async def default_task(request):
+        return Result(["default"], request.questions)
+
+    assert asyncio.run(engine.run(Request.parse("About films\n1. Q?"))).as_dict() == {"1. Q?": "films"}
+    assert asyncio.run(engine.run(request)).as_list() == ["default"]
+    with pytest.raises(UnknownTask):
+        asyncio.run(engine.run(request, fallback=False))
+
+
+def test_wikipedia_task_answers_standard_questions_by_default(monkeypatch):
+    async def fake_scrape(urls, keywords, deadline=None):
+        assert urls == ["https://en.wikipedia.org/wiki/Films"]
+        return ScrapedTables(frames={urls[0]: films()}, scores={urls[0]: 3})
+
+    monkeypatch.setattr(handlers, "scrape_tables", fake_scrape)
+    result = asyncio.run(handlers.engine.run(Request.parse("Scrape https://en.wikipedia.org/wiki/Films")))
+    answers = result.as_dict()
+    assert list(answers) == handlers.WIKIPEDIA_QUESTIONS
+    assert answers["How many movies grossed over $2B before 2000?"] == 1
+    assert answers["Which is the earliest movie that grossed over $1.5B?"] == "Titanic"
+    assert answers["Correlation between Rank and Peak"] == pytest.approx(0.866025, abs=1e-6)
+    assert answers["Scatterplot (base64 PNG)"].uri.startswith("data:image/png;base64,")
+
+
+def test_generic_task_reads_the_data_attachment():
+    data = Upload("data.csv", b"x,y\n1,2\n2,4\n3,7\n")
+    request = Request.parse("Analyse the data\n1. What is the correlation between x and y?",
+                            [Upload("notes.png", b""), data])
+    assert asyncio.run(handlers.engine.run(request)).as_list()[0] == pytest.approx(0.9933, abs=1e-4)
+
+
+def test_generic_task_reads_a_parquet_upload(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "data.parquet"
+    pd.DataFrame({"x": [1, 2, 3], "y": [2, 4, 7]}).to_parquet(path)
+    request = Request.parse("1. What is the correlation between x and y?", [Upload("data.parquet", path.read_bytes())])
+    assert asyncio.run(handlers.engine.run(request)).as_list()[0] == pytest.approx(0.9933, abs=1e-4)
+
+
+def test_generic_task_reports_unreadable_uploads(monkeypatch):
+    def broken(*args, **kwargs):
+        raise ImportError("Missing optional dependency 'pyarrow'")
+
+    monkeypatch.setattr(handlers, "read_data_file", broken)
+    request = Request.parse("1. What is the correlation between x and y?", [Upload("data.csv", b"x,y\n1,2\n")])
+    with pytest.raises(ValueError, match="Could not read data.csv: Missing optional dependency"):
+        asyncio.run(handlers.engine.run(request))
+
+
+def test_tds_agent_reports_errors_as_dicts(monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(ROOT, "tds-project-2"))
+    monkeypatch.delitem(sys.modules, "app", raising=False)
+    from app.agent import process_question_file
+
+    assert "Unknown task" in asyncio.run(process_question_file("Something else", []))["error"]
+    assert asyncio.run(process_question_file("Indian high court data", [])) == {
+        "error": "Missing .parquet attachment"}
+
+
+@pytest.mark.parametrize("stream_bytes", [None, 100])
+def test_generic_task_unions_shards_of_one_table(monkeypatch, stream_bytes):
+    from analyst import ingest
+
+    if stream_bytes is not None:
+        # Only the large first shard is streamed; the others are merged into its summary
+        monkeypatch.setattr(ingest, "STREAM_THRESHOLD", stream_bytes)
+    df = pd.DataFrame({"x": range(40), "y": [(i * 7) % 11 + i for i in range(40)]})
+    shards = [Upload(f"part-{i}.csv", df.iloc[start:stop].to_csv(index=False).encode())
+              for i, (start, stop) in enumerate([(0, 30), (30, 35), (35, 40)])]
+    other = Upload("other.csv", b"a,b\n1,2\n")
+    request = Request.parse("Analyse the data\n1. What is the correlation between x and y?",
+                            [shards[0], other, *shards[1:]])
+    assert asyncio.run(handlers.engine.run(request)).as_list()[0] == pytest.approx(df["x"].corr(df["y"]))
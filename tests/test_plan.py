@@ -0,0 +1,88 @@
+import threading
+
+import pandas as pd
+
+from analyst.plan import Filter, Plan, Step, answer
+
+
+def films():
+    return pd.DataFrame({
+        "Rank": [1, 2, 3, 4, 5],
+        "Peak": [1, 1, 3, 4, 4],
+        "Year": [2009, 2019, 1997, 2015, 2018],
+        "Gross": [2.9e9, 2.8e9, 2.2e9, 2.1e9, 1.9e9],
+        "Title": ["Avatar", "Endgame", "Titanic", "Force Awakens", "Infinity War"],
+    })
+
+
+def test_correlations_share_one_matrix():
+    plan = Plan(films())
+    plan.want_correlation("Rank", "Peak")
+    plan.want_correlation("Year", "Peak")
+    assert abs(plan.corr("Rank", "Peak") - films()["Rank"].corr(films()["Peak"])) < 1e-12
+    plan.corr("Year", "Peak")
+    plan.corr("Peak", "Rank")
+    assert plan.computations == 1
+
+
+def test_filters_are_computed_once():
+    plan = Plan(films())
+    before_2000_over_2bn = Filter("Year", (None, 1999), "Gross", (">=", 2e9))
+    assert plan.count(before_2000_over_2bn) == 1
+    assert plan.count(Filter("Year", (None, 1999), "Gross", (">=", 2e9))) == 1
+    over = Filter(money_column="Gross", threshold=(">", 2.15e9))
+    assert plan.data.loc[plan.argmin("Year", over), "Title"] == "Titanic"
+    assert plan.count(Filter()) == 5
+    # one mask per distinct filter (three), plus the subset and argmin for ``over``
+    assert plan.computations == 5
+
+
+def test_steps_deduplicate():
+    calls = []
+
+    def count(plan, flt):
+        calls.append(flt)
+        return plan.count(flt)
+
+    plan = Plan(films())
+    flt = Filter("Year", (2010, None))
+    steps = [Step(count, (flt,)), answer("n/a"), Step(count, (Filter("Year", (2010, None)),)), answer("n/a")]
+    distinct = list(dict.fromkeys(steps))
+    assert len(distinct) == 2
+    assert [step.known for step in distinct] == [False, True]
+    assert [step.run(plan) for step in distinct] == [3, "n/a"]
+    assert len(calls) == 1
+
+
+def test_shared_is_once_across_threads():
+    plan = Plan(None)
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def work():
+        barrier.wait()
+        plan.shared("key", lambda: calls.append(1) or len(calls))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+
+
+def test_answer_questions_on_a_process_pool(monkeypatch):
+    import asyncio
+
+    from analyst import handlers, pipeline
+    from analyst.executor import WorkerPool
+
+    pool = WorkerPool(workers=2, kind="process")
+    monkeypatch.setattr(pipeline, "cpu_pool", pool)
+    questions = ["1. What is the correlation between Rank and Peak?", "2. Plot Rank against Peak"]
+    try:
+        corr, plot = asyncio.run(pipeline.answer_questions(films(), questions, handlers.plan_generic_question))
+    finally:
+        pool.shutdown()
+    assert abs(corr - films()["Rank"].corr(films()["Peak"])) < 1e-12
+    assert plot.uri.startswith("data:image/png;base64,")
@@ -0,0 +1,118 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyst import readers
+from analyst.handlers import read_data_file, referenced_columns
+from analyst.readers import Sniffed, header, read_frame, sniff, sniff_path
+
+
+def frame(n=50):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({"x": rng.normal(size=n), "y": rng.normal(size=n), "label": rng.choice(["a", "b"], n)})
+
+
+def xlsx_bytes():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("[Content_Types].xml", "<Types/>")
+        z.writestr("xl/workbook.xml", "<workbook/>")
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("data, filename, expected", [
+    (b"a,b\n1,2\n3,4\n", "data.bin", Sniffed("csv", ",")),
+    (b"a;b\n1,5;2\n3,5;4\n", None, Sniffed("csv", ";")),
+    (b"a\tb\n1\t2\n", "data.csv", Sniffed("csv", "\t")),
+    (b'\xef\xbb\xbf[{"a": 1}, {"a": 2}]', "upload", Sniffed("json")),
+    (b'{"a": 1}\n{"a": 2}\n', "data.json", Sniffed("jsonl")),
+    (b'{"a": 1}', "rows.jsonl", Sniffed("jsonl")),
+    (b"PAR1\x15\x04", "noext", Sniffed("parquet")),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1\x00", "old.dat", Sniffed("excel")),
+    (xlsx_bytes(), "sheet", Sniffed("excel")),
+    (b"\x89PNG\r\n\x1a\n\x00", "chart.csv", None),
+    (b"", "notes.png", None),
+])
+def test_format_is_sniffed_from_content(data, filename, expected):
+    file = io.BytesIO(data)
+    file.seek(3 if len(data) > 3 else 0)
+    assert sniff(file, filename) == expected
+    assert file.tell() == (3 if len(data) > 3 else 0)
+
+
+def test_projection_needs_every_plot_or_correlation_question_to_name_columns():
+    columns = ["x", "y", "label"]
+    assert referenced_columns(["1. Correlation between x and y?", "2. How many rows?"], columns) == ["x", "y"]
+    assert referenced_columns(["1. Correlation between x and y?", "2. Plot the data"], columns) is None
+    assert referenced_columns(["1. Summarise it"], columns) is None
+
+
+@pytest.mark.parametrize("suffix, write", [
+    (".txt", lambda df, p: df.to_csv(p, sep=";", index=False)),
+    (".jsonl", lambda df, p: df.to_json(p, orient="records", lines=True)),
+    (".json", lambda df, p: df.to_json(p, orient="records")),
+])
+def test_readers_project_only_referenced_columns(tmp_path, suffix, write):
+    df = frame()
+    path = tmp_path / f"upload{suffix}"
+    write(df, path)
+    sniffed = sniff_path(str(path))
+    full = read_frame(str(path), sniffed)
+    assert list(full.columns) == ["x", "y", "label"]
+    assert np.allclose(full["x"], df["x"])
+    assert list(read_frame(str(path), sniffed, ["y", "x"]).columns) == ["y", "x"]
+
+    loaded = read_data_file(str(path), None, ("1. What is the correlation between y and x?",))
+    assert list(loaded.columns) == ["y", "x"]
+
+
+def test_header_is_read_without_parsing_rows(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("x|y|note\n1|2|a\n")
+    assert header(str(path), sniff_path(str(path))) == ["x", "y", "note"]
+    rows = tmp_path / "rows.jsonl"
+    rows.write_text(json.dumps({"a": 1, "b": 2}) + "\n")
+    assert header(str(rows), Sniffed("jsonl")) == ["a", "b"]
+    assert header(str(rows), Sniffed("json")) is None
+
+
+def test_json_falls_back_to_pandas_without_orjson(tmp_path, monkeypatch):
+    path = tmp_path / "data.json"
+    frame().to_json(path, orient="records")
+    fast = read_frame(str(path), Sniffed("json"))
+    monkeypatch.setattr(readers, "available", lambda module: False)
+    assert np.allclose(read_frame(str(path), Sniffed("json"))["y"], fast["y"])
+
+
+@pytest.mark.parametrize("module, fmt, write", [
+    ("pyarrow", "csv", lambda df, path: df.to_csv(path, index=False)),
+    ("pyarrow", "jsonl", lambda df, path: df.to_json(path, orient="records", lines=True)),
+])
+def test_fast_engines_bypass_pandas_parsers(tmp_path, monkeypatch, module, fmt, write):
+    pytest.importorskip(module)
+    path = tmp_path / f"data.{fmt}"
+    write(frame(), path)
+
+    def slow(*args, **kwargs):
+        raise AssertionError("parsed by the pandas fallback")
+
+    monkeypatch.setattr(pd, "read_csv", slow)
+    monkeypatch.setattr(pd, "read_json", slow)
+    assert np.allclose(read_frame(str(path), sniff_path(str(path)))["x"], frame()["x"])
+
+
+def test_excel_is_read_with_calamine(tmp_path, monkeypatch):
+    pytest.importorskip("python_calamine")
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "data.xlsx"
+    frame().to_excel(path, index=False)
+    engines = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, "read_excel", lambda *args, **kwargs: engines.append(kwargs.get("engine"))
+                        or read_excel(*args, **kwargs))
+    assert np.allclose(read_frame(str(path), Sniffed("excel"))["x"], frame()["x"])
+    assert engines == ["calamine"]
@@ -0,0 +1,36 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+from analyst.render import encode_image, fit_line, scatterplot_uri
+
+
+def _decode(uri):
+    header, payload = uri.split(",", 1)
+    return header, Image.open(io.BytesIO(base64.b64decode(payload)))
+
+
+def test_png_data_uri_under_limit():
+    rng = np.random.default_rng(1)
+    x = rng.random(100_000)
+    uri = scatterplot_uri(x, x + rng.normal(0, 0.1, len(x)), "Rank", "Peak")
+    header, image = _decode(uri)
+    assert header == "data:image/png;base64"
+    assert len(uri) <= 100_000
+    assert image.format == "PNG"
+
+
+def test_tight_limit_shrinks_image():
+    noise = Image.fromarray(np.random.default_rng(2).integers(0, 255, (400, 640, 3), dtype=np.uint8))
+    fmt, data = encode_image(noise, max_bytes=60_000)
+    assert fmt == "png"
+    assert len(base64.b64encode(data)) + len("data:image/png;base64,") <= 60_000
+    assert Image.open(io.BytesIO(data)).width < 640
+
+
+def test_fit_line_matches_polyfit():
+    x = np.array([1.0, 2.0, 3.0, 4.0])
+    y = np.array([2.0, 4.5, 5.5, 8.0])
+    assert np.allclose(fit_line(x, y), np.polyfit(x, y, 1))
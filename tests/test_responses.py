@@ -0,0 +1,152 @@
+import asyncio
+import importlib
+import io
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from analyst.responses import (COALESCED, HIT, MISS, DiskBackend, MemoryBackend, RedisBackend,
+                               ResponseCache, request_key)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Upload:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.file = io.BytesIO(data)
+
+
+class FakeRedis:
+    """Stand-in for a Redis server"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, 0))
+        return value if expires > time.time() else None
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, time.time() + ex)
+
+
+def test_request_key_covers_inputs():
+    async def keys():
+        base = await request_key(b"q", [("data_file", Upload("d.csv", b"a,b\n1,2"))])
+        same = await request_key(b"q", [("data_file", Upload("d.csv", b"a,b\n1,2"))])
+        other_bytes = await request_key(b"q", [("data_file", Upload("d.csv", b"a,b\n1,3"))])
+        other_version = await request_key(b"q", [("data_file", Upload("d.csv", b"a,b\n1,2"))], version="x")
+        no_file = await request_key(b"q", [("data_file", None)])
+        other_app = await request_key(b"q", [("data_file", Upload("d.csv", b"a,b\n1,2"))], namespace="tds")
+        return base, same, other_bytes, other_version, no_file, other_app
+
+    base, same, *others = asyncio.run(keys())
+    assert base == same
+    assert len({base, *others}) == 5
+
+
+def test_memory_backend_is_lru_bounded_by_bytes():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set("a", b"1234", 60)
+    backend.set("b", b"5678", 60)
+    backend.get("a")
+    backend.set("c", b"90ab", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1234" and backend.get("c") == b"90ab"
+    backend.set("d", b"x", -1)
+    assert backend.get("d") is None
+    assert backend.stats()["bytes"] <= 10
+
+
+@pytest.mark.parametrize("make", [lambda tmp: DiskBackend(str(tmp), max_bytes=1024),
+                                  lambda tmp: RedisBackend(client=FakeRedis())])
+def test_persistent_backends(tmp_path, make):
+    backend = make(tmp_path)
+    backend.set("k", b"[1,2]", 60)
+    assert backend.get("k") == b"[1,2]"
+    assert backend.get("missing") is None
+
+
+def test_disk_backend_expires_and_trims(tmp_path):
+    backend = DiskBackend(str(tmp_path), max_bytes=10)
+    backend.set("old", b"[3]", -1)
+    assert backend.get("old") is None
+    for key in "abcd":
+        backend.set(key, b"[1234]", 60)
+    assert sum(backend.get(key) is not None for key in "abcd") == 1
+
+
+def test_single_flight():
+    cache = ResponseCache(MemoryBackend())
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"[42]", True
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        again = await cache.get_or_compute("k", compute)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert calls == [1]
+    assert sorted(status for _, status in first) == [COALESCED] * 4 + [MISS]
+    assert {body for body, _ in first} == {b"[42]"}
+    assert again == (b"[42]", HIT)
+
+
+def test_uncacheable_and_failing_results_are_not_stored():
+    cache = ResponseCache(MemoryBackend())
+
+    async def partial():
+        return b"[\"timed out\"]", False
+
+    async def failing():
+        raise ValueError("boom")
+
+    async def scenario():
+        await cache.get_or_compute("p", partial)
+        assert (await cache.get_or_compute("p", partial))[1] == MISS
+        with pytest.raises(ValueError):
+            await cache.get_or_compute("f", failing)
+        with pytest.raises(ValueError):
+            await cache.get_or_compute("f", failing)
+
+    asyncio.run(scenario())
+    assert cache.stats()["stored"] == 0
+
+
+def test_the_two_apps_never_share_a_cached_response(monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(ROOT, "tds-project-2"))
+    monkeypatch.delitem(sys.modules, "app", raising=False)
+    apps = {}
+    for name, directory in (("root", "api"), ("tds", os.path.join("tds-project-2", "api"))):
+        monkeypatch.syspath_prepend(os.path.join(ROOT, directory))
+        monkeypatch.delitem(sys.modules, "index", raising=False)
+        apps[name] = importlib.import_module("index")
+    monkeypatch.delitem(sys.modules, "index")
+
+    # Both apps on one cache, as with a shared RESPONSE_CACHE_DIR or Redis server
+    shared = ResponseCache(MemoryBackend())
+    for module in apps.values():
+        monkeypatch.setattr(module, "response_cache", shared)
+
+    async def root_answers(*args):
+        return ["root"]
+
+    async def tds_answers(*args):
+        return {"1. Q?": "tds"}
+
+    monkeypatch.setattr(apps["root"], "run_analysis", root_answers)
+    monkeypatch.setattr(apps["tds"], "process_question_file", tds_answers)
+    for _ in range(2):
+        root = TestClient(apps["root"].app).post("/api/", files={"questions": ("q.txt", b"1. Q?")})
+        tds = TestClient(apps["tds"].app).post("/api/", files={"question_file": ("q.txt", b"1. Q?")})
+        assert root.json() == ["root"] and tds.json() == {"1. Q?": "tds"}
+    assert shared.backend.stats()["entries"] == 2 and shared.counters["hits"] == 2
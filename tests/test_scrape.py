@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from analyst import cache, scrape
+from analyst.fetch import FetchResult
+from analyst.intents import keywords
+from analyst.scrape import extract_urls, scrape_tables
+from analyst.tables import header_score, read_best_table
+
+NAV = '<table class="wikitable"><tr><th>Region</th><th>Notes</th></tr><tr><td>x</td><td>y</td></tr></table>'
+
+
+def films(rows):
+    body = "".join(f"<tr><td>{r}</td><td>{p}</td><td>${g:,}</td><td>{y}</td></tr>" for r, p, g, y in rows)
+    return ('<table class="wikitable"><tr><th>Rank</th><th>Peak</th><th>Worldwide gross</th>'
+            f"<th>Year</th></tr>{body}</table>")
+
+
+PAGES = {
+    "https://a.test/films": f"<html><body>{NAV}{films([(1, 1, 2923706026, 2009)])}</body></html>",
+    "https://b.test/films": f"<html><body>{films([(2, 1, 2797501328, 2019)])}</body></html>",
+    "https://c.test/nav": f"<html><body>{NAV}</body></html>",
+}
+QUESTIONS = "Which film grossed the most? What's the correlation between Rank and Peak?"
+
+
+def test_extract_urls_dedupes_and_strips_punctuation():
+    text = "See https://a.test/x, and (https://b.test/y). Again: https://a.test/x"
+    assert extract_urls(text) == ["https://a.test/x", "https://b.test/y"]
+
+
+def test_best_table_is_chosen_by_header_words():
+    words = keywords(QUESTIONS)
+    assert header_score(["Rank", "Peak", "Worldwide gross", "Year"], words) == 3
+    score, df = read_best_table(PAGES["https://a.test/films"], words)
+    assert score == 3 and df.columns.tolist() == ["Rank", "Peak", "Worldwide gross", "Year"]
+    # Without keywords the first table wins, as with read_table
+    assert read_best_table(PAGES["https://a.test/films"], frozenset())[1].columns.tolist() == ["Region", "Notes"]
+
+
+def test_pages_are_scraped_concurrently_and_merged(monkeypatch, tmp_path):
+    in_flight, peak = [0], [0]
+
+    async def fake_fetch(url, headers=None, timeout=None):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        if url not in PAGES:
+            raise ValueError("404")
+        return FetchResult(url, 200, {}, PAGES[url].encode())
+
+    monkeypatch.setattr(cache, "fetch", fake_fetch)
+    pages = cache.PageCache(directory=str(tmp_path))
+    urls = list(PAGES) + ["https://d.test/missing"]
+    scraped = asyncio.run(scrape_tables(urls, keywords(QUESTIONS), pages=pages))
+    assert peak[0] == len(urls)
+    assert scraped.scores == {"https://a.test/films": 3, "https://b.test/films": 3, "https://c.test/nav": 0}
+    assert list(scraped.errors) == ["https://d.test/missing"]
+    assert scraped.best()["Rank"].tolist() == [1, 2]
+
+    # Served from the frame cache the second time, scores included
+    again = asyncio.run(scrape_tables(urls[:1], keywords(QUESTIONS), pages=pages))
+    assert again.scores == {"https://a.test/films": 3}
+    assert pages.stats()["frame_hits"] == 1
+
+
+def test_cached_tables_serve_every_wording_of_the_questions(monkeypatch, tmp_path):
+    async def fake_fetch(url, headers=None, timeout=None):
+        return FetchResult(url, 200, {}, PAGES[url].encode())
+
+    parsed = []
+
+    def counting_parse(html, url, keywords, index=None):
+        parsed.append(index)
+        return parse_table(html, url, keywords, index)
+
+    parse_table = scrape.parse_table
+    monkeypatch.setattr(cache, "fetch", fake_fetch)
+    monkeypatch.setattr(scrape, "parse_table", counting_parse)
+    pages = cache.PageCache(directory=str(tmp_path))
+    url = ["https://a.test/films"]
+    for text in (QUESTIONS, "Correlation of the Peak and the Rank of films?", "Which year grossed most?"):
+        scraped = asyncio.run(scrape_tables(url, keywords(text), pages=pages))
+        assert scraped.frames[url[0]].columns.tolist() == ["Rank", "Peak", "Worldwide gross", "Year"]
+    # Another table of the page is parsed once, by index, from the cached headers
+    for _ in range(2):
+        scraped = asyncio.run(scrape_tables(url, keywords("List the notes of each region"), pages=pages))
+        assert scraped.frames[url[0]].columns.tolist() == ["Region", "Notes"]
+    assert parsed == [None, 0]
+    assert sorted(asyncio.run(pages.get_page(url[0])).frames) == ["table-0", "table-1"]
+
+
+def test_all_pages_failing_raises(monkeypatch, tmp_path):
+    async def fake_fetch(url, headers=None, timeout=None):
+        raise ValueError("unreachable")
+
+    monkeypatch.setattr(cache, "fetch", fake_fetch)
+    with pytest.raises(ValueError):
+        asyncio.run(scrape_tables(["https://a.test/"], frozenset(), pages=cache.PageCache(directory=str(tmp_path))))
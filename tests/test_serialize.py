@@ -0,0 +1,70 @@
+import asyncio
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from starlette.responses import StreamingResponse
+
+from analyst import serialize
+from analyst.serialize import EncodedImage, dumps, encode_chunks, negotiate, respond
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+def answers():
+    return [np.int64(3), np.float64(np.nan), float("inf"), np.float32(0.5), np.bool_(True),
+            EncodedImage("png", PNG), {"when": pd.Timestamp("2020-01-02"), "missing": pd.NA},
+            ("café", np.arange(3))]
+
+
+EXPECTED = [3, None, None, 0.5, True, EncodedImage("png", PNG).uri,
+            {"when": "2020-01-02T00:00:00", "missing": None}, ["café", [0, 1, 2]]]
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_numpy_values_non_finite_floats_and_images(monkeypatch, fast):
+    if not fast:
+        monkeypatch.setattr(serialize, "orjson", None)
+    elif serialize.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert json.loads(dumps(answers())) == EXPECTED
+
+
+def test_images_are_spliced_in_as_separate_chunks():
+    image = EncodedImage("webp", b"RIFF1234")
+    chunks = encode_chunks({"plot": image, "again": [image], "text": "x"})
+    assert image.chunk() in chunks and chunks.count(image.chunk()) == 2
+    assert json.loads(b"".join(chunks)) == {"plot": image.uri, "again": [image.uri], "text": "x"}
+    assert encode_chunks([1, "two"]) == [b'[1,"two"]']
+
+
+def test_negotiate_honours_q_values_and_availability(monkeypatch):
+    monkeypatch.setattr(serialize, "brotli", None)
+    assert negotiate("gzip, deflate, br") == "gzip"
+    assert negotiate("gzip;q=0, br") is None
+    assert negotiate("*") == "gzip"
+    assert negotiate(None) is None and negotiate("identity") is None
+
+
+def collect(response):
+    async def body():
+        return b"".join([bytes(chunk) async for chunk in response.body_iterator])
+    return asyncio.run(body())
+
+
+def test_large_bodies_are_streamed_and_compressed(monkeypatch):
+    monkeypatch.setattr(serialize, "STREAM_BYTES", 1000)
+    body = dumps([EncodedImage("png", PNG)] * 3)
+
+    plain = respond(body, headers={"X-Cache": "MISS"})
+    assert isinstance(plain, StreamingResponse) and "content-encoding" not in plain.headers
+    assert collect(plain) == body and plain.headers["x-cache"] == "MISS"
+
+    packed = respond(body, "gzip")
+    assert packed.headers["content-encoding"] == "gzip" and packed.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(collect(packed)) == body
+
+    small = respond(b"[1]", "gzip")
+    assert small.body == b"[1]" and "content-encoding" not in small.headers
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "numpy", "matplotlib", "lxml", "httpx")
+
+PROBE = """
+import sys
+sys.path.insert(0, {api!r})
+import index
+from fastapi.testclient import TestClient
+assert TestClient(index.app).get("/health").status_code == 200
+print(",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def test_cold_start_and_health_skip_heavy_imports():
+    env = dict(os.environ, ANALYST_WARMUP="0")
+    code = PROBE.format(api=os.path.join(ROOT, "api"), heavy=HEAVY)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=ROOT)
+    assert out.returncode == 0, out.stderr
+    # TestClient itself pulls in httpx, so only the analysis libraries are checked
+    loaded = set(filter(None, out.stdout.strip().split(","))) - {"httpx"}
+    assert not loaded
@@ -0,0 +1,65 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from analyst.stats import Bivariate, GroupedBivariate, GroupedMoments, Moments
+
+
+def make_data(n=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(1e6, 3.0, n)          # large offset: naive sum-of-squares would lose precision
+    y = -2.5 * x + rng.normal(size=n)
+    y[::9] = np.nan
+    keys = rng.choice(["a", "b", "c"], n).astype(object)
+    keys[::13] = None
+    return keys, x, y
+
+
+def test_moments_chunked_and_merged_match_numpy():
+    _, x, _ = make_data()
+    left = Moments()
+    for start in range(0, 20_000, 3_001):
+        left.update(x[start:min(start + 3_001, 20_000)])
+    merged = left.merge(pickle.loads(pickle.dumps(Moments().update(x[20_000:]))))
+    assert merged.count == len(x)
+    assert np.isclose(merged.mean, x.mean(), rtol=0, atol=1e-9)
+    assert np.isclose(merged.var(), x.var(ddof=1), rtol=1e-10)
+    assert (merged.min, merged.max) == (x.min(), x.max())
+    assert np.isnan(Moments().mean) and Moments().count == 0
+
+
+def test_bivariate_matches_polyfit_and_corrcoef():
+    _, x, y = make_data()
+    stats = Bivariate()
+    for start in range(0, len(x), 7_000):
+        stats.update(x[start:start + 7_000], y[start:start + 7_000])
+    keep = ~np.isnan(y)
+    xk, yk = x[keep], y[keep]
+    assert stats.count == keep.sum()
+    assert np.isclose(stats.regression()[0], np.polyfit(xk, yk, 1)[0], rtol=1e-8)
+    # The intercept itself is ill-conditioned this far from x = 0; the line must pass through the means
+    slope, intercept = stats.regression()
+    assert np.isclose(intercept + slope * xk.mean(), yk.mean(), rtol=1e-12)
+    assert np.isclose(stats.corr(), np.corrcoef(x[keep], y[keep])[0, 1], rtol=1e-10)
+    assert np.isclose(stats.cov(), np.cov(x[keep], y[keep])[0, 1], rtol=1e-8)
+    assert np.isnan(Bivariate().update([1.0, 1.0], [2.0, 3.0]).regression()[0])
+
+
+def test_grouped_match_pandas_groupby_and_merge():
+    keys, x, y = make_data()
+    half = len(x) // 2
+    grouped = GroupedBivariate().update(keys[:half], x[:half], y[:half])
+    grouped.merge(GroupedBivariate().update(keys[half:][::-1], x[half:][::-1], y[half:][::-1]))
+    df = pd.DataFrame({"k": keys, "x": x, "y": y}).dropna()
+    expected = df.groupby("k").agg(count=("x", "size"), mean=("x", "mean"), var=("x", "var"), mean_y=("y", "mean"))
+    result = grouped.frame().sort_index()
+    assert result.index.tolist() == ["a", "b", "c"]
+    assert result["count"].tolist() == expected["count"].tolist()
+    assert np.allclose(result[["mean", "var", "mean_y"]], expected[["mean", "var", "mean_y"]], rtol=1e-9)
+    for key, group in df.groupby("k"):
+        assert np.isclose(result.loc[key, "slope"], np.polyfit(group["x"], group["y"], 1)[0], rtol=1e-8)
+        assert np.isclose(result.loc[key, "corr"], group["x"].corr(group["y"]), rtol=1e-9)
+
+    counts = GroupedMoments().update([2019, 2020, 2019], [1.0, 5.0, 3.0]).frame()
+    assert counts.loc[2019, "mean"] == 2.0 and counts.loc[2020, "count"] == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from analyst.tables import read_table
+
+PAGE = """
+<html><body>
+<table class="infobox"><tr><th>Ignored</th></tr><tr><td>1</td></tr></table>
+<table class="wikitable"><caption>Scores</caption>
+  <tr><th rowspan="2">Name</th><th colspan="2">Score</th></tr>
+  <tr><th>A</th><th>B</th></tr>
+  <tr><td rowspan="2">x<sup class="reference">[1]</sup></td><td>1</td><td>2[a]</td></tr>
+  <tr><td>3</td><td>4</td></tr>
+  <tr><td>y<span style="display:none">sortkey</span></td><td colspan="2">5</td></tr>
+</table>
+<table class="wikitable"><tr><th>Rank</th><th>Title</th><th>Year</th></tr>
+  <tr><td>1</td><th scope="row">Avatar</th><td>2009</td></tr>
+</table>
+</body></html>
+"""
+
+
+def test_spans_and_footnotes():
+    df = read_table(PAGE)
+    assert df.columns.tolist() == ["Name", "Score A", "Score B"]
+    assert df["Name"].tolist() == ["x", "x", "y"]
+    assert df["Score A"].tolist() == ["1", "3", "5"]
+    assert df["Score B"].tolist() == ["2", "4", "5"]
+
+
+def test_select_by_header_caption_and_index():
+    assert read_table(PAGE, match=["title", "year"])["Title"].tolist() == ["Avatar"]
+    assert read_table(PAGE, caption="scores").shape == (3, 3)
+    assert read_table(PAGE, index=1).columns.tolist() == ["Rank", "Title", "Year"]
+
+
+def test_missing_class_without_fallback():
+    with pytest.raises(ValueError):
+        read_table("<table><tr><td>1</td></tr></table>", fallback=False)